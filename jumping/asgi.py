@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+Needed for the live dashboard updates (server-sent events on /live/<view>/),
+e.g. ``uvicorn jumping.asgi:application``. Under WSGI the dashboards fall
+back to htmx polling.
 """
 
 import os
@@ -147,6 +147,14 @@ SSH_PASSWORD = os.getenv('PASSWORD_SSH')
 TELNET_USER = os.getenv('USERNAME_TEL')
 TELNET_PASSWORD = os.getenv('PASSWORD_TEL')
 
+# Broker do Django Q: 'orm' (fila na tabela OrmQ do banco principal) ou 'redis'.
+# Com 'redis' a fila sai do MySQL e os resultados das tarefas vão para o cache (também Redis)
+# em vez da tabela Task; só os Schedule continuam no banco. Troca: manage.py migrate_broker
+Q_BROKER = os.getenv('Q_BROKER', 'orm')
+Q_REDIS_URL = os.getenv('Q_REDIS_URL', 'redis://127.0.0.1:6379/0')
+# Segundos que um resultado de tarefa fica no cache no modo redis
+Q_RESULT_TTL = int(os.getenv('Q_RESULT_TTL', 3600))
+
 Q_CLUSTER = {
     'name': 'NetworkMonitor',
     'workers': 13,
@@ -154,21 +162,18 @@ Q_CLUSTER = {
     'retry': 3600,
     'queue_limit': 100,
     'bulk': 10,
-    'orm': 'default',  # Force ORM backend
     'sync': False,
     'max_attempts': 3,
     'max_runtime': 600,
-    'redis': {
-        'host': '127.0.0.1',
-        'port': 6379,
-        'db': 0,
-        'password': None,  # Set password if configured
-        'charset': 'utf-8',
-        'socket_timeout': None,
-        'errors': 'strict',
-        'ssl': False,
-    }
+    # Sem poda a cada gravação (select_for_update em todos os Success); a retenção é do CleanupManager
+    'save_limit': 0,
+    # Usado pelo broker no modo redis e, no modo orm, só por migrate_broker/benchmark_broker
+    'redis': Q_REDIS_URL,
 }
+if Q_BROKER == 'redis':
+    Q_CLUSTER.update({'cached': Q_RESULT_TTL, 'cache': 'default'})
+else:
+    Q_CLUSTER['orm'] = 'default'
 
 LOGIN_REDIRECT_URL = '/'
 
@@ -177,4 +182,83 @@ EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = str(os.getenv('EMAIL_USER'))
-EMAIL_HOST_PASSWORD = str(os.getenv('EMAIL_PASSWORD'))
\ No newline at end of file
+EMAIL_HOST_PASSWORD = str(os.getenv('EMAIL_PASSWORD'))
+# Digest de alertas (AlertManager): destinatários separados por vírgula; vazio = sem e-mail
+ALERT_EMAIL_RECIPIENTS = [e.strip() for e in os.getenv('ALERT_EMAIL_RECIPIENTS', '').split(',') if e.strip()]
+ALERT_EMAIL_FROM = os.getenv('ALERT_EMAIL_FROM', EMAIL_HOST_USER)
+# Falhas seguidas (a última total) para "fora" e resultados sem falha seguidos para voltar a "ok"
+ALERT_DOWN_AFTER = int(os.getenv('ALERT_DOWN_AFTER', 3))
+ALERT_RECOVER_AFTER = int(os.getenv('ALERT_RECOVER_AFTER', 4))
+# Envia quando não há transição nova há ALERT_DEBOUNCE_SECONDS, ou quando a mais antiga espera ALERT_MAX_DELAY_SECONDS
+ALERT_DEBOUNCE_SECONDS = int(os.getenv('ALERT_DEBOUNCE_SECONDS', 120))
+ALERT_MAX_DELAY_SECONDS = int(os.getenv('ALERT_MAX_DELAY_SECONDS', 900))
+# Pool de conexões SSH com o jump host (por processo/worker)
+SSH_POOL_SIZE = int(os.getenv('SSH_POOL_SIZE', 2))
+SSH_POOL_IDLE_TIMEOUT = int(os.getenv('SSH_POOL_IDLE_TIMEOUT', 600))
+SSH_POOL_MAX_SESSIONS = int(os.getenv('SSH_POOL_MAX_SESSIONS', 10))
+SSH_KEEPALIVE_INTERVAL = int(os.getenv('SSH_KEEPALIVE_INTERVAL', 30))
+# Canais simultâneos por worker no modo multiplexado (NetworkTestScheduler.create_multiplexed_task)
+PING_MULTIPLEX_CHANNELS = int(os.getenv('PING_MULTIPLEX_CHANNELS', 20))
+# Agenda os cenários em lotes multiplexados (até PING_MULTIPLEX_CHANNELS por tarefa) em vez de uma tarefa por console
+PING_MULTIPLEX_SCHEDULES = os.getenv('PING_MULTIPLEX_SCHEDULES', 'False') == 'True'
+# Motor de execução dos testes: 'paramiko' (threads) ou 'asyncio' (requer o pacote asyncssh)
+PING_TEST_ENGINE = os.getenv('PING_TEST_ENGINE', 'paramiko')
+ASYNC_MAX_CONCURRENCY = int(os.getenv('ASYNC_MAX_CONCURRENCY', 200))
+# Sessões telnet já autenticadas mantidas entre execuções (0 desativa)
+TELNET_SESSION_MAX = int(os.getenv('TELNET_SESSION_MAX', 8))
+TELNET_SESSION_TTL = int(os.getenv('TELNET_SESSION_TTL', 600))
+# Modo adaptativo do ping: interrompe após PING_ADAPTIVE_SAMPLE pacotes com 0% ou 100% de perda
+PING_ADAPTIVE = os.getenv('PING_ADAPTIVE', 'False') == 'True'
+PING_ADAPTIVE_SAMPLE = int(os.getenv('PING_ADAPTIVE_SAMPLE', 100))
+# Gravação em lote dos resultados (BulkResultWriter)
+RESULT_BATCH_SIZE = int(os.getenv('RESULT_BATCH_SIZE', 50))
+RESULT_FLUSH_INTERVAL = int(os.getenv('RESULT_FLUSH_INTERVAL', 5))
+
+# Cache compartilhado entre o servidor web e os workers do Django Q: payloads e invalidação dos dashboards,
+# sequência/eventos das atualizações ao vivo e histogramas do /metrics. Redis com Q_BROKER=redis ou
+# CACHE_REDIS_URL definido; sem Redis, uma tabela no banco principal (criada pela migração 0016 do pingtest)
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+if Q_BROKER == 'redis' or CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL or 'redis://127.0.0.1:6379/1',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'pingtest_cache',
+        }
+    }
+# Cards por página no histórico de teste_individual (paginação por cursor)
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 30))
+# Agregados de longo prazo (TestRollup): dias mantidos por janela e quanto do passado é recalculado a cada execução
+ROLLUP_RETENTION_DAYS = {
+    '1m': int(os.getenv('ROLLUP_RETENTION_1M_DAYS', 2)),
+    '1h': int(os.getenv('ROLLUP_RETENTION_1H_DAYS', 90)),
+    '1d': int(os.getenv('ROLLUP_RETENTION_1D_DAYS', 730)),
+}
+ROLLUP_LOOKBACK_HOURS = int(os.getenv('ROLLUP_LOOKBACK_HOURS', 3))
+# Retenção dos resultados brutos e limpeza em lotes curtos (CleanupManager)
+RESULT_RETENTION_HOURS = int(os.getenv('RESULT_RETENTION_HOURS', 18))
+CLEANUP_BATCH_SIZE = int(os.getenv('CLEANUP_BATCH_SIZE', 5000))
+CLEANUP_BATCH_PAUSE = float(os.getenv('CLEANUP_BATCH_PAUSE', 0.2))
+CLEANUP_MAX_SECONDS = int(os.getenv('CLEANUP_MAX_SECONDS', 240))
+# 'delete' (padrão) ou 'partition': descarta partições diárias no MySQL (ver manage.py partition_results)
+CLEANUP_MODE = os.getenv('CLEANUP_MODE', 'delete')
+CLEANUP_PARTITIONS_AHEAD = int(os.getenv('CLEANUP_PARTITIONS_AHEAD', 3))
+# Registros de tarefas do django-q (só falhas e tarefas de manutenção; os pings de sucesso não são gravados)
+TASK_RETENTION_HOURS = int(os.getenv('TASK_RETENTION_HOURS', 72))
+# Escalonamento dos testes: limites de execuções simultâneas (intervalo e timeout vêm de cada cenário)
+SCHEDULE_JUMP_HOST_BUDGET = int(os.getenv('SCHEDULE_JUMP_HOST_BUDGET', SSH_POOL_SIZE * SSH_POOL_MAX_SESSIONS))
+SCHEDULE_SWITCH_BUDGET = int(os.getenv('SCHEDULE_SWITCH_BUDGET', 2))
+# Agrupa os cenários do mesmo console de switch em uma tarefa: um login, vários destinos
+PING_GROUP_BY_SWITCH = os.getenv('PING_GROUP_BY_SWITCH', 'True') == 'True'
+# Logins paralelos por grupo (1 = todos os pings em sequência na mesma sessão)
+PING_GROUP_SESSIONS = int(os.getenv('PING_GROUP_SESSIONS', 1))
+# Segundos estimados por pacote de um cenário ainda sem execução medida (dimensiona os grupos; o ping_timeout é o teto)
+PING_PACKET_INTERVAL = float(os.getenv('PING_PACKET_INTERVAL', 0.2))
+# /metrics (formato Prometheus): token Bearer do scraper; vazio = só usuários staff logados
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
@@ -1,11 +1,31 @@
 from django.contrib import admin
 from .models import NetworkTestResult
 from django.contrib import admin
-from pingtest.models import NetworkTestResult
+from pingtest.models import AlertTransition, LatestTestStatus, NetworkTestResult, TestRollup
 from django_q.models import Task, Schedule
 
 @admin.register(NetworkTestResult)
 class NetworkTestResultAdmin(admin.ModelAdmin):
     list_display = ('telnet_host', 'ping_destination', 'success')
     list_filter = ('success', 'telnet_host')
-    search_fields = ('statistics', 'error_message')
\ No newline at end of file
+    search_fields = ('statistics', 'error_message')
+
+@admin.register(LatestTestStatus)
+class LatestTestStatusAdmin(admin.ModelAdmin):
+    list_display = ('test_name', 'success', 'test_end', 'has_recent_failure', 'alert_state', 'alert_since')
+    list_filter = ('success', 'has_recent_failure', 'alert_state')
+    search_fields = ('test_name', 'sw_name')
+
+
+@admin.register(AlertTransition)
+class AlertTransitionAdmin(admin.ModelAdmin):
+    list_display = ('test_name', 'from_state', 'to_state', 'changed_at')
+    list_filter = ('to_state',)
+    search_fields = ('test_name',)
+
+
+@admin.register(TestRollup)
+class TestRollupAdmin(admin.ModelAdmin):
+    list_display = ('test_name', 'resolution', 'bucket_start', 'run_count', 'sf_count', 'fp_count', 'ft_count')
+    list_filter = ('resolution',)
+    search_fields = ('test_name',)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PingtestConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pingtest'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401 - registra o check e conecta os receivers
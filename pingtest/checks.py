@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends que não são vistos pelos outros processos
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """The web process reads what the django-q workers write to the default cache"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f"CACHES['default'] uses the process-local {backend.rsplit('.', 1)[-1]}",
+        hint="Dashboard invalidation, live updates and /metrics are written by the django-q workers and "
+             "read by the web process; use Redis (CACHE_REDIS_URL) or DatabaseCache.",
+        id='pingtest.W001',
+    )]
@@ -11,5 +11,20 @@ class NetworkTestScenarioForm(forms.ModelForm):
             'dest_ip',
             'device_name',
             'test_name',
+            'interval_minutes',
+            'packet_count',
+            'packet_size',
+            'ping_timeout',
+            'priority',
             'active',
-        ]
\ No newline at end of file
+        ]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        interval = cleaned_data.get('interval_minutes')
+        timeout = cleaned_data.get('ping_timeout')
+        if interval is not None and timeout is not None and timeout > interval * 60:
+            raise ValidationError("O timeout do ping não pode ser maior que o intervalo entre testes.")
+        if cleaned_data.get('packet_count') == 0:
+            self.add_error('packet_count', "Informe ao menos 1 pacote.")
+        return cleaned_data
@@ -0,0 +1,27 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand
+from pingtest.utils.broker import BROKERS, run_broker_benchmark
+
+
+class Command(BaseCommand):
+    help = "Compare django-q broker throughput and database queries per task for the ORM and Redis modes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=1000, help='Tasks pushed through each broker')
+        parser.add_argument('--broker', choices=BROKERS, nargs='+', default=list(BROKERS), help='Brokers to measure')
+
+    def handle(self, *args, **options):
+        for kind in options['broker']:
+            try:
+                report = run_broker_benchmark(kind, options['tasks'])
+            except ImproperlyConfigured as e:
+                self.stderr.write(self.style.WARNING(f"{kind}: skipped, {str(e)}"))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"{kind}: {report['processed']}/{report['tasks']} tasks, {report['tasks_per_second']:.0f} tasks/s"
+            ))
+            self.stdout.write(
+                f"  enqueue {report['enqueue_seconds']:.2f}s ({report['enqueue_queries']} queries), "
+                f"dequeue+save+ack {report['process_seconds']:.2f}s ({report['process_queries']} queries), "
+                f"{report['queries_per_task']:.1f} DB queries/task"
+            )
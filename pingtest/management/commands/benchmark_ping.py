@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from pingtest.utils.benchmark import MODES, delete_benchmark_results, run_benchmark
+from pingtest.utils.simulator import SwitchProfile
+
+
+class Command(BaseCommand):
+    help = "End-to-end throughput benchmark of the ping task path against a local jump host/switch simulator"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', type=int, nargs='+', default=[10, 100, 1000], help='Scenario counts to run')
+        parser.add_argument('--mode', choices=MODES, default='multiplex', help='Task path: create_task, create_group_task or create_multiplexed_task')
+        parser.add_argument('--workers', type=int, default=8, help='Worker threads for the task and group modes')
+        parser.add_argument('--per-switch', type=int, default=10, help='Destinations per simulated switch')
+        parser.add_argument('--packets', type=int, default=100, help='Packets per ping')
+        parser.add_argument('--ping-timeout', type=int, default=30, help='Seconds before a ping is aborted')
+        parser.add_argument('--loss', type=float, default=0.0, help='Probability of a lost packet (0-1)')
+        parser.add_argument('--loss-pattern', help="Repeating reply pattern, '!' reply and '.' lost (overrides --loss)")
+        parser.add_argument('--rtt', type=float, default=1.0, help='Mean RTT in ms')
+        parser.add_argument('--jitter', type=float, default=0.0, help='RTT standard deviation in ms')
+        parser.add_argument('--reply-delay', type=float, default=0.0, help='Seconds between ping replies')
+        parser.add_argument('--login-delay', type=float, default=0.0, help='Seconds before the telnet banner')
+        parser.add_argument('--hung', type=int, default=0, help='Switches whose session hangs on ping')
+        parser.add_argument('--seed', type=int, help='Random seed for loss and RTT')
+        parser.add_argument('--keep', action='store_true', help='Keep the bench-* results in the database')
+
+    def handle(self, *args, **options):
+        if options['per_switch'] < 1 or any(count < 1 for count in options['scenarios']):
+            raise CommandError("--scenarios and --per-switch must be positive")
+
+        profile = SwitchProfile(
+            loss=options['loss'],
+            loss_pattern=options['loss_pattern'],
+            rtt=options['rtt'],
+            jitter=options['jitter'],
+            reply_delay=options['reply_delay'],
+            login_delay=options['login_delay'],
+        )
+        ping_options = {'packet_count': options['packets'], 'ping_timeout': options['ping_timeout']}
+
+        delete_benchmark_results()
+        for count in options['scenarios']:
+            report = run_benchmark(
+                count,
+                mode=options['mode'],
+                workers=options['workers'],
+                per_switch=options['per_switch'],
+                profile=profile,
+                options=ping_options,
+                hung=options['hung'],
+                seed=options['seed'],
+            )
+            self._print_report(report)
+            if not options['keep']:
+                delete_benchmark_results()
+
+    def _print_report(self, report):
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['scenarios']} scenarios ({report['mode']}): {report['seconds']:.2f}s, "
+            f"{report['scenarios_per_minute']:.1f} scenarios/min"
+        ))
+        self.stdout.write(f"  outcomes {report['outcomes']}, errors {report['errors']}")
+        for phase, stats in report['phases'].items():
+            self.stdout.write(
+                f"  {phase:<10} n={stats['count']:<5} avg={stats['avg'] * 1000:.1f}ms "
+                f"p50<={self._bound(stats['p50'])} p95<={self._bound(stats['p95'])}"
+            )
+        self.stdout.write(f"  db         {report['db_rows']} rows, {report['db_writes_per_second']:.0f} rows/s")
+        self.stdout.write(f"  simulator  {report['simulator']}")
+        self.stdout.write(f"  pool       {report['pool']}")
+
+    @staticmethod
+    def _bound(seconds):
+        """Histogram bucket bound as text ('+Inf' past the last bucket)"""
+        return '+Inf' if seconds == float('inf') else f"{seconds * 1000:g}ms"
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from pingtest.utils.broker import BROKERS, move_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Move queued django-q tasks between the ORM and Redis brokers. Stop qcluster, run this, "
+        "set Q_BROKER to the target and start qcluster again; schedules need no migration"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', choices=BROKERS, required=True, help='Broker that receives the queued tasks')
+        parser.add_argument('--redis-url', help='Defaults to Q_REDIS_URL')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the tasks that would move')
+
+    def handle(self, *args, **options):
+        try:
+            moved = move_queue(options['to'], url=options['redis_url'], dry_run=options['dry_run'])
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        verb = "Would move" if options['dry_run'] else "Moved"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {moved} queued tasks to the {options['to']} broker"))
+        if settings.Q_BROKER != options['to']:
+            self.stdout.write(f"Now set Q_BROKER={options['to']} and restart qcluster")
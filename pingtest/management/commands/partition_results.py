@@ -0,0 +1,35 @@
+from datetime import timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+from django.utils import timezone
+from pingtest.models import NetworkTestResult
+from pingtest.utils.cleanup import partition_ddl, partitions
+
+
+class Command(BaseCommand):
+    help = "Print (or apply with --apply) the DDL that partitions the results table by day on MySQL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true', help='Execute the DDL instead of printing it')
+        parser.add_argument('--days-ahead', type=int, default=3, help='Daily partitions created after today')
+
+    def handle(self, *args, **options):
+        connection = connections[router.db_for_write(NetworkTestResult)]
+        if connection.vendor != 'mysql':
+            raise CommandError("Partitioning is only supported on MySQL")
+        if partitions():
+            raise CommandError("The results table is already partitioned")
+
+        retention_days = getattr(settings, 'RESULT_RETENTION_HOURS', 18) // 24 + 1
+        first_day = timezone.now().astimezone(dt_timezone.utc).date() - timedelta(days=retention_days)
+        statements = partition_ddl(first_day, retention_days + options['days_ahead'] + 1)
+
+        if not options['apply']:
+            for statement in statements:
+                self.stdout.write(f"{statement};")
+            return
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        self.stdout.write(self.style.SUCCESS("Results table partitioned; set CLEANUP_MODE=partition"))
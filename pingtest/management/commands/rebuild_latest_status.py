@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from pingtest.utils.latest_status import rebuild_latest_status
+
+
+class Command(BaseCommand):
+    help = "Recompute the LatestTestStatus table (dashboard cards and alert state) from the stored results"
+
+    def handle(self, *args, **options):
+        count = rebuild_latest_status()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt latest status for {count} tests"))
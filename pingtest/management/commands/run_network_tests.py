@@ -1,10 +1,8 @@
 from django.core.management.base import BaseCommand
-from pingtest.models import NetworkTestScenario
 from pingtest.utils.test_runner import NetworkTestScheduler
-from pingtest.utils.test_runner import CacheManager, CleanupManager
+from pingtest.utils.test_runner import AlertManager, CacheManager, CleanupManager, RollupManager
 import logging
 from django_q.cluster import Cluster
-import time
 from django_q.models import Schedule 
 
 logger = logging.getLogger(__name__)
@@ -24,11 +22,13 @@ class Command(BaseCommand):
             scheduler = NetworkTestScheduler()
             scheduler._cleanup_existing_schedules()
             CacheManager._cleanup_existing_cache()
-            Schedule.objects.filter(name='db_cleanup').delete()
+            Schedule.objects.filter(name__in=['db_cleanup', 'db_rollup', 'alert_digest']).delete()
             self.stdout.write(self.style.SUCCESS("All scheduled tests stopped"))
             return
 
         CleanupManager.schedule_cleanup()
+        RollupManager.schedule_rollups()
+        AlertManager.schedule_alerts()
         CacheManager.schedule_cache_refresh()
         
         self.stdout.write(self.style.SUCCESS(
@@ -36,23 +36,8 @@ class Command(BaseCommand):
             "python manage.py qcluster"
         ))      
     
-        test_scenarios = [
-            (
-                s.source_ip,
-                s.source_port,
-                s.dest_ip,
-                s.device_name,
-                s.test_name,
-            )
-            for s in NetworkTestScenario.objects.filter(active=True)]
-        
-        
+        # Os signals de NetworkTestScenario mantêm os schedules em dia;
+        # aqui só a reconciliação completa inicial + a de segurança (a cada hora)
         scheduler = NetworkTestScheduler()
-        scheduler.start_polling_scheduler(poll_interval=360) 
-        
-        try:
-            while True:
-                time.sleep(360)
-        except KeyboardInterrupt:
-            print("Shutting down polling scheduler...")
-    
\ No newline at end of file
+        scheduler.start_scheduler()
+        self.stdout.write(self.style.SUCCESS("Test schedules reconciled with the active scenarios"))
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.20 on 2026-10-17 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pingtest', '0006_networktestscenario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networktestresult',
+            name='packet_loss',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networktestresult',
+            name='packets_sent',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networktestresult',
+            name='rtt_avg',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networktestresult',
+            name='rtt_max',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networktestresult',
+            name='rtt_min',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networktestresult',
+            name='rtt_samples',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.20 on 2026-10-17 17:28
+
+from django.db import migrations, models
+from django.db.models import Max
+
+FIELDS = ('telnet_host', 'telnet_port', 'ping_destination', 'sw_name', 'test_start')
+
+
+def dedupe_runs(apps, schema_editor):
+    # Execuções repetidas já gravadas impediriam a constraint: mantém a mais recente (maior id)
+    NetworkTestResult = apps.get_model('pingtest', 'NetworkTestResult')
+    keep = NetworkTestResult.objects.values(*FIELDS).order_by().annotate(keep=Max('id')).values('keep')
+    NetworkTestResult.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pingtest', '0007_networktestresult_rtt_series'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_runs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='networktestresult',
+            constraint=models.UniqueConstraint(fields=FIELDS, name='unique_test_run'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.20 on 2026-10-17 17:29
+
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+# Cópia congelada de rebuild_latest_status: a migração não pode depender do código atual do app
+RECENT_WINDOW = 4
+SUCCESS = 'SF'
+
+
+def backfill_latest_status(apps, schema_editor):
+    NetworkTestResult = apps.get_model('pingtest', 'NetworkTestResult')
+    LatestTestStatus = apps.get_model('pingtest', 'LatestTestStatus')
+
+    named = NetworkTestResult.objects.exclude(test_name__isnull=True)
+    rank = Window(RowNumber(), partition_by=[F('test_name')], order_by=F('test_end').desc())
+    recent = named.annotate(rank=rank).filter(rank__lte=RECENT_WINDOW).order_by('test_name', 'rank')
+    failures = named.exclude(success=SUCCESS).annotate(rank=rank).filter(rank=1).values(
+        'test_name', 'test_start', 'test_end',
+    )
+    latest_failures = {row['test_name']: row for row in failures}
+
+    statuses = {}
+    for result in recent.only(
+        'test_name', 'sw_name', 'ping_destination', 'success', 'statistics',
+        'error_message', 'test_start', 'test_end',
+    ):
+        status = statuses.get(result.test_name)
+        if status is None:
+            failure = latest_failures.get(result.test_name, {})
+            status = statuses[result.test_name] = LatestTestStatus(
+                test_name=result.test_name,
+                sw_name=result.sw_name,
+                ping_destination=result.ping_destination,
+                success=result.success,
+                statistics=result.statistics,
+                error_message=result.error_message,
+                test_start=result.test_start,
+                test_end=result.test_end,
+                latest_failure_start=failure.get('test_start'),
+                latest_failure_end=failure.get('test_end'),
+                recent_results='',
+            )
+        status.recent_results += result.success
+        status.has_recent_failure = status.has_recent_failure or result.success != SUCCESS
+
+    LatestTestStatus.objects.bulk_create(statuses.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pingtest', '0008_networktestresult_unique_test_run'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestTestStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('test_name', models.CharField(max_length=100, unique=True)),
+                ('sw_name', models.CharField(blank=True, max_length=100)),
+                ('ping_destination', models.CharField(blank=True, max_length=100)),
+                ('success', models.CharField(choices=[('FT', 'Falha Total'), ('FP', 'Falha Parcial'), ('SF', 'Sem Falha')], default='SF', max_length=2)),
+                ('statistics', models.TextField(blank=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('test_start', models.DateTimeField(null=True)),
+                ('test_end', models.DateTimeField(null=True)),
+                ('latest_failure_start', models.DateTimeField(null=True)),
+                ('latest_failure_end', models.DateTimeField(null=True)),
+                ('recent_results', models.CharField(blank=True, max_length=8)),
+                ('has_recent_failure', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='networktestresult',
+            index=models.Index(fields=['test_name', '-test_end'], name='result_test_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='networktestresult',
+            index=models.Index(fields=['test_name', 'success', '-test_end'], name='result_test_success_idx'),
+        ),
+        migrations.RunPython(backfill_latest_status, migrations.RunPython.noop),
+    ]
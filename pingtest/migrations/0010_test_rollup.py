@@ -0,0 +1,39 @@
+# Generated by Django 4.2.20 on 2026-10-17 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pingtest', '0009_latest_test_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('test_name', models.CharField(max_length=100)),
+                ('resolution', models.CharField(choices=[('1m', '1 minuto'), ('1h', '1 hora'), ('1d', '1 dia')], max_length=2)),
+                ('bucket_start', models.DateTimeField()),
+                ('run_count', models.PositiveIntegerField(default=0)),
+                ('sf_count', models.PositiveIntegerField(default=0)),
+                ('fp_count', models.PositiveIntegerField(default=0)),
+                ('ft_count', models.PositiveIntegerField(default=0)),
+                ('loss_sum', models.FloatField(default=0)),
+                ('loss_runs', models.PositiveIntegerField(default=0)),
+                ('rtt_min', models.FloatField(blank=True, null=True)),
+                ('rtt_max', models.FloatField(blank=True, null=True)),
+                ('rtt_sum', models.FloatField(default=0)),
+                ('rtt_runs', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'bucket_start'], name='rollup_resolution_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='testrollup',
+            constraint=models.UniqueConstraint(fields=('test_name', 'resolution', 'bucket_start'), name='unique_test_rollup'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-17 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pingtest', '0010_test_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='networktestresult',
+            index=models.Index(fields=['test_start'], name='result_test_start_idx'),
+        ),
+    ]
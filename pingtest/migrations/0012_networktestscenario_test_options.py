@@ -0,0 +1,38 @@
+# Generated by Django 4.2.20 on 2026-10-17 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pingtest', '0011_networktestresult_test_start_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networktestscenario',
+            name='interval_minutes',
+            field=models.PositiveSmallIntegerField(default=7),
+        ),
+        migrations.AddField(
+            model_name='networktestscenario',
+            name='packet_count',
+            field=models.PositiveIntegerField(default=1000),
+        ),
+        migrations.AddField(
+            model_name='networktestscenario',
+            name='packet_size',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networktestscenario',
+            name='ping_timeout',
+            field=models.PositiveIntegerField(default=418),
+        ),
+        migrations.AddField(
+            model_name='networktestscenario',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Alta'), (2, 'Normal'), (3, 'Baixa')], default=2),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.20 on 2026-10-17 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Cópia congelada de pingtest.utils.alerts (advance/replay): a migração não pode depender do código atual do app
+OK, DEGRADED, DOWN, RECOVERING = 'ok', 'degraded', 'down', 'recovering'
+SUCCESS = 'SF'
+TOTAL_FAILURE = 'FT'
+
+
+def replay(recent_results, test_end):
+    """(alert_state, alert_streak, alert_since) from a recent_results string (newest first)"""
+    down_after = getattr(settings, 'ALERT_DOWN_AFTER', 3)
+    recover_after = getattr(settings, 'ALERT_RECOVER_AFTER', 4)
+    state, streak, since, previous = OK, 0, None, SUCCESS
+    codes = [recent_results[i:i + 2] for i in range(0, len(recent_results), 2)]
+    for code in reversed(codes):
+        failed = code != SUCCESS
+        streak = streak + 1 if streak and (previous != SUCCESS) == failed else 1
+        if failed:
+            down = code == TOTAL_FAILURE and streak >= down_after
+            new = DOWN if down or state in (DOWN, RECOVERING) else DEGRADED
+        elif state == OK or streak >= recover_after:
+            new = OK
+        elif state == DOWN:
+            new = RECOVERING
+        else:
+            new = state
+        if new != state:
+            state, since = new, test_end
+        previous = code
+    return state, streak, since
+
+
+def backfill_alert_state(apps, schema_editor):
+    LatestTestStatus = apps.get_model('pingtest', 'LatestTestStatus')
+    statuses = list(LatestTestStatus.objects.only('id', 'recent_results', 'test_end'))
+    for status in statuses:
+        status.alert_state, status.alert_streak, status.alert_since = replay(status.recent_results, status.test_end)
+    LatestTestStatus.objects.bulk_update(statuses, ['alert_state', 'alert_streak', 'alert_since'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pingtest', '0012_networktestscenario_test_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('test_name', models.CharField(max_length=100)),
+                ('from_state', models.CharField(choices=[('ok', 'OK'), ('degraded', 'Degradado'), ('down', 'Fora'), ('recovering', 'Recuperando')], max_length=10)),
+                ('to_state', models.CharField(choices=[('ok', 'OK'), ('degraded', 'Degradado'), ('down', 'Fora'), ('recovering', 'Recuperando')], max_length=10)),
+                ('changed_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='latestteststatus',
+            name='alert_since',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='latestteststatus',
+            name='alert_state',
+            field=models.CharField(choices=[('ok', 'OK'), ('degraded', 'Degradado'), ('down', 'Fora'), ('recovering', 'Recuperando')], default='ok', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='latestteststatus',
+            name='alert_streak',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='latestteststatus',
+            index=models.Index(fields=['alert_state'], name='status_alert_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alerttransition',
+            index=models.Index(fields=['created_at'], name='alert_created_idx'),
+        ),
+        migrations.RunPython(backfill_alert_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.20 on 2026-10-17 18:13
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def fix_zero_values(apps, schema_editor):
+    # Cenários salvos com 0 antes da validação quebrariam a reconciliação (divisão por zero)
+    NetworkTestScenario = apps.get_model('pingtest', 'NetworkTestScenario')
+    NetworkTestScenario.objects.filter(interval_minutes=0).update(interval_minutes=7)
+    NetworkTestScenario.objects.filter(ping_timeout=0).update(ping_timeout=418)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pingtest', '0013_alert_state'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='networktestscenario',
+            name='interval_minutes',
+            field=models.PositiveSmallIntegerField(default=7, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='networktestscenario',
+            name='ping_timeout',
+            field=models.PositiveIntegerField(default=418, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.RunPython(fix_zero_values, migrations.RunPython.noop),
+    ]
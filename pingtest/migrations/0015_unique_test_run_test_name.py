@@ -0,0 +1,34 @@
+# Generated by Django 4.2.20 on 2026-10-17 19:02
+
+from django.db import migrations, models
+from django.db.models import Max
+
+OLD_FIELDS = ('telnet_host', 'telnet_port', 'ping_destination', 'sw_name', 'test_start')
+NEW_FIELDS = ('telnet_host', 'telnet_port', 'ping_destination', 'sw_name', 'test_name', 'test_start')
+
+
+def dedupe_old_key(apps, schema_editor):
+    # A chave nova só acrescenta test_name (não há duplicatas na ida, 0008 já deduplicou);
+    # voltar para a chave sem test_name pode juntar execuções de testes diferentes
+    NetworkTestResult = apps.get_model('pingtest', 'NetworkTestResult')
+    keep = NetworkTestResult.objects.values(*OLD_FIELDS).order_by().annotate(keep=Max('id')).values('keep')
+    NetworkTestResult.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pingtest', '0014_scenario_min_values'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='networktestresult',
+            name='unique_test_run',
+        ),
+        migrations.RunPython(migrations.RunPython.noop, dedupe_old_key),
+        migrations.AddConstraint(
+            model_name='networktestresult',
+            constraint=models.UniqueConstraint(fields=NEW_FIELDS, name='unique_test_run'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.20 on 2026-10-17 19:40
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # Tabela do DatabaseCache (CACHES sem Redis); não faz nada para os outros backends ou se já existe
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pingtest', '0015_unique_test_run_test_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
+from types import SimpleNamespace
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
+from pingtest.utils.ping_parser import analyze_samples, unpack_samples
 
 
 class NetworkTestResult(models.Model):
@@ -12,6 +15,15 @@ class NetworkTestResult(models.Model):
     test_end = models.DateTimeField()
     statistics = models.TextField()
     error_message = models.TextField(blank=True, null=True)
+
+    # Valores numéricos extraídos do ping (PingStreamParser)
+    packets_sent = models.PositiveIntegerField(null=True, blank=True)
+    packet_loss = models.FloatField(null=True, blank=True)
+    rtt_min = models.FloatField(null=True, blank=True)
+    rtt_avg = models.FloatField(null=True, blank=True)
+    rtt_max = models.FloatField(null=True, blank=True)
+    # Série de respostas compactada (ping_parser.pack_samples): ~6 bytes por resposta
+    rtt_samples = models.BinaryField(null=True, blank=True, editable=False)
     
 
     def __str__(self):
@@ -27,6 +39,35 @@ class NetworkTestResult(models.Model):
         choices=escolhas_success.choices,
         default=escolhas_success.SEM_FALHA,
     )
+
+    class Meta:
+        indexes = [
+            # Cards dos dashboards: último resultado / última falha por teste
+            models.Index(fields=['test_name', '-test_end'], name='result_test_end_idx'),
+            models.Index(fields=['test_name', 'success', '-test_end'], name='result_test_success_idx'),
+            # Limpeza por retenção (CleanupManager): faixa de ids vencidos
+            models.Index(fields=['test_start'], name='result_test_start_idx'),
+        ]
+        constraints = [
+            # Chave natural de uma execução, usada pelo upsert em lote (BulkResultWriter)
+            models.UniqueConstraint(
+                fields=['telnet_host', 'telnet_port', 'ping_destination', 'sw_name', 'test_name', 'test_start'],
+                name='unique_test_run',
+            ),
+        ]
+
+    def rtt_series(self):
+        """[(seq, rtt_ms), ...] for every reply of the run"""
+        if not self.rtt_samples:
+            return []
+        seqs, rtts = unpack_samples(self.rtt_samples)
+        return list(zip(seqs, rtts))
+
+    def rtt_analysis(self):
+        """Jitter, RTT percentiles and loss bursts computed from rtt_samples"""
+        if not self.rtt_samples:
+            return None
+        return analyze_samples(self.rtt_samples, sent=self.packets_sent)
     
 class NetworkTestScenario(models.Model):
     source_ip = models.GenericIPAddressField()
@@ -35,3 +76,148 @@ class NetworkTestScenario(models.Model):
     device_name = models.CharField(max_length=50)
     test_name = models.CharField(max_length=75)
     active = models.BooleanField(default=True)
+
+    class Prioridade(models.IntegerChoices):
+        ALTA = 1, _("Alta")
+        NORMAL = 2, _("Normal")
+        BAIXA = 3, _("Baixa")
+
+    # Parâmetros do teste: enlaces críticos com intervalo curto e poucos pacotes, acessos o contrário
+    interval_minutes = models.PositiveSmallIntegerField(default=7, validators=[MinValueValidator(1)])
+    packet_count = models.PositiveIntegerField(default=1000)
+    packet_size = models.PositiveSmallIntegerField(null=True, blank=True)  # vazio = padrão do switch
+    ping_timeout = models.PositiveIntegerField(default=418, validators=[MinValueValidator(1)])  # segundos até interromper o ping (Ctrl-C)
+    priority = models.PositiveSmallIntegerField(choices=Prioridade.choices, default=Prioridade.NORMAL)
+
+    def ping_options(self):
+        """Options dict carried as the 6th element of the scenario tuple"""
+        return {
+            'packet_count': self.packet_count,
+            'packet_size': self.packet_size,
+            'ping_timeout': self.ping_timeout,
+            'priority': int(self.priority),
+        }
+
+    def as_scenario(self):
+        """(host, port, destination, sw_name, test_name, options) as scheduled and run by the workers"""
+        return (self.source_ip, self.source_port, self.dest_ip, self.device_name, self.test_name, self.ping_options())
+
+
+class LatestTestStatus(models.Model):
+    """Uma linha por teste: último resultado, última falha, janela dos resultados recentes e estado de alerta"""
+    RECENT_WINDOW = 4
+
+    class AlertState(models.TextChoices):
+        OK = "ok", _("OK")
+        DEGRADED = "degraded", _("Degradado")
+        DOWN = "down", _("Fora")
+        RECOVERING = "recovering", _("Recuperando")
+
+    test_name = models.CharField(max_length=100, unique=True)
+    sw_name = models.CharField(max_length=100, blank=True)
+    ping_destination = models.CharField(max_length=100, blank=True)
+    success = models.CharField(
+        max_length=2,
+        choices=NetworkTestResult.escolhas_success.choices,
+        default=NetworkTestResult.escolhas_success.SEM_FALHA,
+    )
+    statistics = models.TextField(blank=True)
+    error_message = models.TextField(blank=True, null=True)
+    test_start = models.DateTimeField(null=True)
+    test_end = models.DateTimeField(null=True)
+    latest_failure_start = models.DateTimeField(null=True)
+    latest_failure_end = models.DateTimeField(null=True)
+    # Códigos dos últimos RECENT_WINDOW resultados, do mais novo para o mais antigo ("SFFTSFSF")
+    recent_results = models.CharField(max_length=2 * RECENT_WINDOW, blank=True)
+    has_recent_failure = models.BooleanField(default=False)
+    # Máquina de estados atualizada na ingestão (pingtest.utils.alerts); a tela de falhas lê daqui
+    alert_state = models.CharField(max_length=10, choices=AlertState.choices, default=AlertState.OK)
+    # Resultados seguidos com o mesmo desfecho (falha ou sem falha) que o último
+    alert_streak = models.PositiveIntegerField(default=0)
+    alert_since = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['alert_state'], name='status_alert_state_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.test_name} = {self.success} [{self.test_end}]"
+
+    @property
+    def recent_codes(self):
+        return [self.recent_results[i:i + 2] for i in range(0, len(self.recent_results), 2)]
+
+    @property
+    def latest_failure(self):
+        """Same shape the card templates read from a NetworkTestResult (test_start/test_end)"""
+        if self.latest_failure_end is None:
+            return None
+        return SimpleNamespace(test_start=self.latest_failure_start, test_end=self.latest_failure_end)
+
+
+class AlertTransition(models.Model):
+    """Mudança de estado de alerta ainda não enviada; o digest agrupa e apaga estas linhas"""
+    test_name = models.CharField(max_length=100)
+    from_state = models.CharField(max_length=10, choices=LatestTestStatus.AlertState.choices)
+    to_state = models.CharField(max_length=10, choices=LatestTestStatus.AlertState.choices)
+    # test_end do resultado que causou a transição
+    changed_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='alert_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.test_name}: {self.from_state} -> {self.to_state} [{self.changed_at}]"
+
+
+class TestRollup(models.Model):
+    """Agregado de resultados por teste em janelas de 1 minuto, 1 hora ou 1 dia"""
+
+    class Resolution(models.TextChoices):
+        MINUTE = "1m", _("1 minuto")
+        HOUR = "1h", _("1 hora")
+        DAY = "1d", _("1 dia")
+
+    test_name = models.CharField(max_length=100)
+    resolution = models.CharField(max_length=2, choices=Resolution.choices)
+    bucket_start = models.DateTimeField()
+    run_count = models.PositiveIntegerField(default=0)
+    sf_count = models.PositiveIntegerField(default=0)
+    fp_count = models.PositiveIntegerField(default=0)
+    ft_count = models.PositiveIntegerField(default=0)
+    # Somas + quantidades (e não médias) para que as janelas maiores possam ser reagregadas sem perda
+    loss_sum = models.FloatField(default=0)
+    loss_runs = models.PositiveIntegerField(default=0)
+    rtt_min = models.FloatField(null=True, blank=True)
+    rtt_max = models.FloatField(null=True, blank=True)
+    rtt_sum = models.FloatField(default=0)
+    rtt_runs = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['test_name', 'resolution', 'bucket_start'], name='unique_test_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket_start'], name='rollup_resolution_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.test_name} [{self.resolution} {self.bucket_start}] = {self.sf_count}/{self.run_count}"
+
+    @property
+    def packet_loss(self):
+        return self.loss_sum / self.loss_runs if self.loss_runs else None
+
+    @property
+    def rtt_avg(self):
+        return self.rtt_sum / self.rtt_runs if self.rtt_runs else None
+
+    @property
+    def availability(self):
+        """Percentual de execuções sem falha"""
+        return 100.0 * self.sf_count / self.run_count if self.run_count else None
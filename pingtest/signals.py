@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from pingtest.models import NetworkTestScenario
+from pingtest.utils.latest_status import apply_results
+
+# Enviado pelo BulkResultWriter depois de cada lote gravado.
+# kwargs: results = lista de NetworkTestResult (sem pk garantido, bulk_create no MySQL não o retorna)
+results_saved = Signal()
+
+
+@receiver(results_saved)
+def update_latest_status(sender, results, **kwargs):
+    apply_results(results)
+
+
+@receiver(results_saved)
+def invalidate_dashboard_cache(sender, results, **kwargs):
+    from pingtest.utils.test_runner import CacheManager
+    CacheManager.invalidate({r.test_name for r in results if r.test_name})
+
+
+@receiver(results_saved)
+def publish_live_updates(sender, results, **kwargs):
+    from pingtest.utils.live_updates import publish_changes
+    publish_changes({r.test_name for r in results})
+
+
+@receiver(post_save, sender=NetworkTestScenario)
+@receiver(post_delete, sender=NetworkTestScenario)
+def reconcile_scenario_schedule(sender, instance, **kwargs):
+    """Cadastro/edição/remoção de cenário reflete no Schedule assim que a transação confirma"""
+    from pingtest.utils.test_runner import NetworkTestScheduler
+    # Só os schedules que mudaram; erros são logados e não chegam à requisição
+    transaction.on_commit(NetworkTestScheduler.reconcile_changed_schedules)
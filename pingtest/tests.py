@@ -1,3 +1,1226 @@
-from django.test import TestCase
+import json
+from io import StringIO
+import time
+from datetime import timedelta
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from socket import timeout as SocketTimeout
+from unittest import mock, skipIf
+from django.urls import reverse
+from django.utils import timezone
+from pingtest.forms import NetworkTestScenarioForm
+from pingtest.utils.dashboard import build_cards
+from pingtest.utils.cleanup import purge_results, purge_tasks
+from pingtest.utils.history import EXPORT_FIELDS, history_page, iter_history
+from pingtest.utils.placement import check_budgets, fill_offsets, gap_offset, overflow, peak_concurrency, peaks, phase, plan_offsets
+from pingtest.utils.rollups import availability, run_rollups
+from django_q.exceptions import TimeoutException
+from django_q.models import Schedule, Task
+from django_q.tasks import async_task
+from pingtest.models import AlertTransition, LatestTestStatus, NetworkTestResult, NetworkTestScenario, TestRollup
+from pingtest.utils.ssh_client import SSHClient
+from pingtest.utils.test_runner import NetworkTestScheduler
+from pingtest.utils.live_updates import SEQ_KEY, event_stream
+from pingtest.utils.result_writer import BulkResultWriter
+from pingtest.utils.benchmark import delete_benchmark_results, run_benchmark
+from pingtest.utils.simulator import JumpHostSimulator, SwitchProfile
+from pingtest.utils.multiplex import ChannelSession, MultiplexExecutor
+from pingtest.utils.ssh_pool import SSHConnectionPool
+from pingtest.utils.ping_parser import AdaptivePingPolicy, PingStreamParser, analyze_samples, pack_samples, unpack_samples
+from pingtest.utils.session_cache import TelnetSession, TelnetSessionCache
+from pingtest.utils import async_ssh_client
+from django.core.exceptions import ImproperlyConfigured
+from pingtest.utils import metrics
+from pingtest.utils.test_runner import CacheManager
+from pingtest.utils import alerts, broker
 
-# Create your tests here.
+
+def make_result(test_name, start, success='SF', destination='10.0.0.1'):
+    return {
+        'telnet_host': '10.0.0.254',
+        'telnet_port': 2001,
+        'ping_destination': destination,
+        'sw_name': f"SW-{test_name}",
+        'test_name': test_name,
+        'start_time': start,
+        'end_time': start + timedelta(minutes=7),
+        'success': success,
+        'statistics': '1000 packet(s) transmitted',
+        'error': '',
+    }
+
+
+def start_scheduling():
+    # O que schedule_reconcile cria, sem a validação de cron (croniter)
+    Schedule.objects.create(name='scenario_reconcile', func='pingtest.utils.test_runner.NetworkTestScheduler.reconcile_schedules',
+                            schedule_type='C', cron='0 * * * *', repeats=-1)
+
+
+# As contagens de queries medem o ORM, não o backend de cache (DatabaseCache também faz SQL)
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class SchedulingStarted:
+    """Scenario signals only touch schedules once run_network_tests started scheduling"""
+
+    def setUp(self):
+        super().setUp()
+        start_scheduling()
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class DashboardQueryCountTests(TestCase):
+    """The dashboard card builders must not issue per-test queries (N+1)"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('operador', password='senha-teste')
+        self.client.force_login(self.user)
+
+    def ingest(self, tests, prefix='teste', runs=6):
+        writer = BulkResultWriter(batch_size=1000)
+        start = timezone.now() - timedelta(hours=2)
+        for i in range(tests):
+            for run in range(runs):
+                success = 'FT' if (i + run) % 5 == 0 else 'SF'
+                writer.add(make_result(f"{prefix}-{i:04d}", start + timedelta(minutes=7 * run), success))
+        writer.flush()
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        return len(ctx.captured_queries)
+
+    def test_build_cards_query_count_is_flat(self):
+        self.ingest(5)
+        small = self.count_queries(build_cards)
+        self.ingest(200, prefix='grande')
+        large = self.count_queries(build_cards)
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(build_cards()), 205)
+
+    def test_views_query_count_is_flat(self):
+        urls = [
+            reverse('pingtest:index'),
+            reverse('pingtest:refresh_results'),
+            reverse('pingtest:falha'),
+            reverse('pingtest:partial_falha'),
+        ]
+        self.ingest(3)
+        small = {url: self.count_queries(lambda: self.client.get(url)) for url in urls}
+        self.ingest(60, prefix='grande')
+        large = {url: self.count_queries(lambda: self.client.get(url)) for url in urls}
+
+        self.assertEqual(small, large)
+
+    def test_cards_reflect_latest_and_recent_failures(self):
+        start = timezone.now() - timedelta(hours=1)
+        writer = BulkResultWriter()
+        for run, success in enumerate(['FT', 'SF', 'SF', 'SF', 'SF']):
+            writer.add(make_result('estavel', start + timedelta(minutes=7 * run), success))
+        for run, success in enumerate(['SF', 'SF', 'FP']):
+            writer.add(make_result('instavel', start + timedelta(minutes=7 * run), success))
+        writer.flush()
+
+        cards = {card['test_name']: card for card in build_cards()}
+        self.assertFalse(cards['estavel']['has_failure'])
+        self.assertIsNotNone(cards['estavel']['latest_failure'])
+        self.assertEqual(cards['estavel']['latest'].success, 'SF')
+        self.assertTrue(cards['instavel']['has_failure'])
+        self.assertEqual(cards['instavel']['latest'].get_success_display(), 'Falha Parcial')
+
+
+    def test_rebuild_command_matches_incremental_status(self):
+        self.ingest(4, runs=6)
+        fields = ['test_name', 'success', 'test_end', 'latest_failure_end', 'recent_results', 'has_recent_failure',
+                  'alert_state', 'alert_streak']
+        incremental = list(LatestTestStatus.objects.order_by('test_name').values(*fields))
+        LatestTestStatus.objects.filter(test_name='teste-0000').delete()
+        LatestTestStatus.objects.update(recent_results='')
+
+        call_command('rebuild_latest_status', stdout=StringIO())
+        self.assertEqual(list(LatestTestStatus.objects.order_by('test_name').values(*fields)), incremental)
+
+@override_settings(CACHES=LOCAL_CACHE)
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cards_are_served_from_cache_until_new_results(self):
+        writer = BulkResultWriter()
+        writer.add(make_result('cacheado', timezone.now() - timedelta(minutes=30)))
+        writer.flush()
+
+        self.assertEqual(len(CacheManager.get_cards('index')), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(CacheManager.get_cards('index')), 1)
+
+        writer.add(make_result('novo', timezone.now() - timedelta(minutes=20), success='FT'))
+        writer.flush()
+
+        self.assertEqual(len(CacheManager.get_cards('index')), 2)
+        self.assertEqual([c['test_name'] for c in CacheManager.get_cards('falha')], ['novo'])
+        self.assertGreater(CacheManager.stats()['hits'], 0)
+
+    def test_concurrent_rebuild_serves_stale_copy(self):
+        writer = BulkResultWriter()
+        writer.add(make_result('antigo', timezone.now() - timedelta(minutes=30)))
+        writer.flush()
+        CacheManager.get_cards('index')
+        CacheManager.invalidate()
+
+        # Another request holds the rebuild lock: this one must not hit the DB
+        cache.add(f"{CacheManager._key('index')}:lock", 1, 30)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(CacheManager.get_cards('index')), 1)
+
+
+class LiveUpdatesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_stream_pushes_only_changed_cards(self):
+        writer = BulkResultWriter()
+        writer.add(make_result('parado', timezone.now() - timedelta(minutes=30)))
+        writer.add(make_result('mudou', timezone.now() - timedelta(minutes=30)))
+        writer.flush()
+
+        def ingest_change():
+            writer.add(make_result('mudou', timezone.now() - timedelta(minutes=10), success='FT'))
+            writer.flush()
+
+        async def read_events():
+            stream = event_stream('index', last_seq=await cache.aget(SEQ_KEY))
+            try:
+                await stream.__anext__()  # retry hint
+                await sync_to_async(ingest_change)()
+                return await stream.__anext__()
+            finally:
+                await stream.aclose()
+
+        event = async_to_sync(read_events)()
+        self.assertIn('event: cards', event)
+        payload = json.loads(event.split('data: ', 1)[1])
+        self.assertEqual([c['id'] for c in payload['cards']], ['card-mudou'])
+        self.assertIn('Falha Total', payload['cards'][0]['html'])
+
+    def test_wsgi_request_falls_back_to_polling(self):
+        user = User.objects.create_user('operador', password='senha-teste')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('pingtest:live_updates', args=['index'])).status_code, 204)
+
+
+class HistoryPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('operador', password='senha-teste')
+        self.client.force_login(self.user)
+        writer = BulkResultWriter(batch_size=1000)
+        start = timezone.now() - timedelta(hours=10)
+        for run in range(75):
+            writer.add(make_result('historico', start + timedelta(minutes=7 * run), 'FT' if run % 10 == 0 else 'SF'))
+        writer.flush()
+
+    def test_cursor_walks_full_history_without_gaps(self):
+        seen, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                rows, cursor = history_page('historico', cursor, limit=20)
+            seen.extend(rows)
+            if not cursor:
+                break
+        ends = [row.test_end for row in seen]
+        self.assertEqual(len(seen), 75)
+        self.assertEqual(ends, sorted(ends, reverse=True))
+        self.assertEqual(len({row.id for row in seen}), 75)
+
+    def test_export_reads_history_in_keyset_chunks(self):
+        with self.assertNumQueries(4):
+            rows = list(iter_history('historico', chunk_size=25))
+        ends = [row[EXPORT_FIELDS.index('test_end')] for row in rows]
+        self.assertEqual(len(rows), 75)
+        self.assertEqual(len(set(ends)), 75)
+        self.assertEqual(ends, sorted(ends, reverse=True))
+
+    def test_infinite_scroll_and_export(self):
+        url = reverse('pingtest:partial_individual', args=['historico'])
+        first = self.client.get(url)
+        self.assertEqual(len(first.context['testes']), 30)
+        cursor = first.context['next_cursor']
+        self.assertContains(first, 'hx-trigger="revealed"')
+
+        second = self.client.get(url, {'cursor': cursor})
+        self.assertEqual(len(second.context['testes']), 30)
+        self.assertLess(second.context['testes'][0].test_end, first.context['testes'][-1].test_end)
+
+        export = self.client.get(reverse('pingtest:exportar_individual', args=['historico']), {'format': 'json'})
+        self.assertTrue(export.streaming)
+        self.assertEqual(len(json.loads(b''.join(export.streaming_content))), 75)
+        export = self.client.get(reverse('pingtest:exportar_individual', args=['historico']))
+        self.assertEqual(len(b''.join(export.streaming_content).decode().splitlines()), 76)
+
+
+class RollupTests(TestCase):
+    def ingest(self, start, codes):
+        writer = BulkResultWriter(batch_size=1000)
+        for run, success in enumerate(codes):
+            result = make_result('sla', start + timedelta(minutes=7 * run), success)
+            result.update(packet_loss={'SF': 0.0, 'FP': 10.0, 'FT': 100.0}[success], rtt_min=1.0 + run, rtt_avg=2.0, rtt_max=3.0 + run)
+            writer.add(result)
+        writer.flush()
+
+    def test_tiers_aggregate_and_answer_availability(self):
+        start = timezone.now() - timedelta(hours=2)
+        codes = ['SF'] * 12 + ['FP', 'FT', 'SF', 'SF']
+        self.ingest(start, codes)
+
+        run_rollups()
+        minutes = TestRollup.objects.filter(resolution='1m')
+        self.assertEqual(sum(r.run_count for r in minutes), 16)
+        days = TestRollup.objects.filter(resolution='1d')
+        self.assertEqual(sum(r.run_count for r in days), 16)
+        self.assertEqual(sum(r.ft_count for r in TestRollup.objects.filter(resolution='1h')), 1)
+
+        # Reexecutar não duplica janelas
+        run_rollups()
+        self.assertEqual(sum(r.run_count for r in TestRollup.objects.filter(resolution='1d')), 16)
+
+        sla = availability('sla', start - timedelta(minutes=1))
+        self.assertEqual(sla['resolution'], '1m')
+        self.assertEqual(sla['runs'], 16)
+        self.assertAlmostEqual(sla['availability'], 100.0 * 14 / 16)
+        self.assertAlmostEqual(sla['packet_loss'], 110.0 / 16)
+        self.assertEqual((sla['rtt_min'], sla['rtt_max']), (1.0, 3.0 + 15))
+
+    def test_rollups_survive_raw_cleanup(self):
+        from pingtest.utils.test_runner import CleanupManager
+        self.ingest(timezone.now() - timedelta(hours=20), ['SF', 'FT'])
+
+        run_rollups(lookback_hours=24)
+        CleanupManager.cleanup_old_results()
+        self.assertFalse(NetworkTestResult.objects.exists())
+        sla = availability('sla', timezone.now() - timedelta(days=1), resolution='1h')
+        self.assertEqual((sla['runs'], sla['ft']), (2, 1))
+
+
+class ResultWriterTests(TestCase):
+    def test_bad_row_falls_back_to_row_by_row_and_keeps_the_rest(self):
+        now = timezone.now()
+        writer = BulkResultWriter(batch_size=1000)
+        writer.add(make_result('bom', now - timedelta(minutes=14)))
+        writer.add({**make_result('ruim', now), 'start_time': None})  # NOT NULL em test_start
+        writer.add(make_result('bom', now - timedelta(minutes=7)))
+
+        self.assertEqual(writer.flush(), 2)
+        self.assertEqual(NetworkTestResult.objects.filter(test_name='bom').count(), 2)
+        self.assertFalse(NetworkTestResult.objects.filter(test_name='ruim').exists())
+        stats = writer.stats()
+        self.assertEqual((stats['results'], stats['dropped'], stats['buffered']), (2, 1, 0))
+        self.assertTrue(LatestTestStatus.objects.filter(test_name='bom').exists())
+
+
+    def test_runs_of_different_tests_on_the_same_path_are_kept_apart(self):
+        start = timezone.now()
+        writer = BulkResultWriter(batch_size=1000)
+        for name in ('pequeno', 'grande', 'grande'):  # a repetição da mesma execução vira upsert
+            writer.add({**make_result(name, start), 'sw_name': 'SW-1'})
+
+        self.assertEqual(writer.flush(), 2)
+        self.assertEqual(
+            sorted(NetworkTestResult.objects.values_list('test_name', flat=True)), ['grande', 'pequeno'],
+        )
+
+
+class CleanupTests(TestCase):
+    def test_purge_deletes_in_small_batches_and_keeps_recent_rows(self):
+        now = timezone.now()
+        writer = BulkResultWriter(batch_size=1000)
+        # Resultado recente gravado antes dos antigos: id baixo, mas fora da retenção
+        writer.add(make_result('limpeza', now - timedelta(hours=1)))
+        for run in range(120):
+            writer.add(make_result('limpeza', now - timedelta(hours=30) + timedelta(minutes=7 * run)))
+        writer.flush()
+
+        stats = purge_results(now - timedelta(hours=18), batch_size=25, pause=0)
+        self.assertEqual(stats['deleted'], 120 - sum(1 for run in range(120) if run * 7 >= 12 * 60))
+        self.assertGreater(stats['batches'], 1)
+        self.assertTrue(stats['complete'])
+        self.assertFalse(NetworkTestResult.objects.filter(test_start__lt=now - timedelta(hours=18)).exists())
+        self.assertTrue(NetworkTestResult.objects.filter(test_start=now - timedelta(hours=1)).exists())
+
+        self.assertEqual(purge_results(now - timedelta(hours=18), pause=0)['deleted'], 0)
+
+
+class TaskRecordTests(SchedulingStarted, TestCase):
+    def task(self, name, success, result, args=(), stopped=None):
+        stopped = stopped or timezone.now()
+        return Task(id=name, name=name, func='pingtest.utils.test_runner.NetworkTestScheduler.create_group_task',
+                    args=args, started=stopped, stopped=stopped, success=success, result=result)
+
+    def test_schedules_skip_saving_successes_and_pass_the_run_time(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            NetworkTestScenario.objects.create(source_ip='10.0.0.254', source_port=2001, dest_ip='10.0.0.1',
+                                               device_name='SW-01', test_name='leve')
+        row = Schedule.objects.get(name__startswith='network_test_schedule_')
+        self.assertFalse(eval(row.kwargs)['q_options']['save'])
+        self.assertIsNone(row.hook)
+        self.assertEqual(row.intended_date_kwarg, 'scheduled_for')
+
+    def test_timed_out_task_records_errors_once_with_either_broker(self):
+        scenarios = [('10.0.0.254', 2001, f"10.0.7.{i}", 'SW-07', f"morto-{i}", {}) for i in range(3)]
+        func = 'pingtest.utils.test_runner.NetworkTestScheduler.create_group_task'
+        timeout = TimeoutException('Task exceeded maximum timeout value (60 seconds)')
+        # 'cached' = resultado no cache (Q_BROKER='redis', sem linha em Task); save=False = modo ORM
+        for mode, q_options in (('orm', {'save': False}), ('redis', {'cached': 60})):
+            with self.subTest(mode=mode), mock.patch.object(SSHClient, 'run_group', side_effect=timeout):
+                NetworkTestResult.objects.all().delete()
+                scheduled_for = (timezone.now() - timedelta(minutes=5)).isoformat()
+                for attempt in range(2):  # retentativa da mesma execução agendada
+                    with self.assertRaises(TimeoutException):
+                        async_task(func, scenarios, scheduled_for=scheduled_for, sync=True, **q_options)
+
+                rows = NetworkTestResult.objects.order_by('test_name')
+                self.assertEqual([r.test_name for r in rows], ['morto-0', 'morto-1', 'morto-2'])
+                self.assertEqual({r.success for r in rows}, {'FT'})
+                self.assertIn('maximum timeout', rows[0].error_message)
+                self.assertEqual({r.test_start.isoformat() for r in rows}, {scheduled_for})
+
+    def test_compact_record_lists_only_failed_tests(self):
+        now = timezone.now()
+        results = [make_result('limpo', now, 'SF'), make_result('parcial', now, 'FP'), make_result('total', now, 'FT'), None]
+        self.assertEqual(
+            NetworkTestScheduler()._compact(results),
+            {'results': 3, 'ok': 1, 'failed': ['parcial', 'total']},
+        )
+        self.assertEqual(NetworkTestScheduler()._compact(make_result('limpo', now, 'SF'))['failed'], [])
+
+    def test_purge_tasks_keeps_recent_records(self):
+        now = timezone.now()
+        for i in range(7):
+            self.task(f"velha-{i}", False, 'erro', stopped=now - timedelta(days=4)).save()
+        self.task('recente', False, 'erro').save()
+
+        self.assertEqual(purge_tasks(now - timedelta(hours=72), batch_size=3, pause=0), 7)
+        self.assertEqual(list(Task.objects.values_list('name', flat=True)), ['recente'])
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ScheduleReconcileTests(SchedulingStarted, TestCase):
+    def create_scenario(self, **fields):
+        defaults = {'source_ip': '10.0.0.254', 'source_port': 2001, 'dest_ip': '10.0.0.1',
+                    'device_name': 'SW-01', 'test_name': 'agendado'}
+        with self.captureOnCommitCallbacks(execute=True):
+            return NetworkTestScenario.objects.create(**{**defaults, **fields})
+
+    def schedule_args(self):
+        return list(Schedule.objects.filter(name__startswith='network_test_schedule_').values_list('name', 'args'))
+
+    def test_signals_schedule_changes_immediately(self):
+        scenario = self.create_scenario()
+        self.assertEqual(self.schedule_args(), [
+            (f"network_test_schedule_{scenario.id}", str((scenario.as_scenario(),))),
+        ])
+
+        scenario.dest_ip = '10.0.0.2'
+        with self.captureOnCommitCallbacks(execute=True):
+            scenario.save()
+        self.assertIn("'10.0.0.2'", self.schedule_args()[0][1])
+        self.assertEqual(len(self.schedule_args()), 1)
+
+        scenario.active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            scenario.save()
+        self.assertEqual(self.schedule_args(), [])
+
+        other = self.create_scenario(test_name='removido')
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(self.schedule_args(), [])
+
+    def test_stopped_scheduling_and_reconcile_errors_stay_out_of_the_request(self):
+        Schedule.objects.filter(name='scenario_reconcile').delete()  # run_network_tests --stop
+        self.create_scenario()
+        self.assertEqual(self.schedule_args(), [])
+
+        start_scheduling()
+        with mock.patch.object(NetworkTestScheduler, '_desired_schedules', side_effect=ZeroDivisionError):
+            self.create_scenario(test_name='quebrado')  # não propaga para quem salvou
+        self.assertEqual(self.schedule_args(), [])
+
+    def test_full_reconcile_is_a_bulk_diff(self):
+        scenarios = [self.create_scenario(test_name=f"teste-{i}", dest_ip=f"10.0.1.{i}", source_port=2001 + i)
+                     for i in range(30)]
+        NetworkTestScheduler.reconcile_schedules()  # espaçamento uniforme depois das inclusões uma a uma
+        Schedule.objects.create(name='network_test_schedule_SW-01_10.0.0.9', func='x')  # nome antigo
+        Schedule.objects.filter(name=f"network_test_schedule_{scenarios[7].id}").delete()
+
+        with self.assertNumQueries(7):
+            summary = NetworkTestScheduler.reconcile_schedules()
+        self.assertEqual(summary, {'created': 1, 'updated': 0, 'deleted': 1})
+        self.assertEqual(NetworkTestScheduler.reconcile_schedules(), {'created': 0, 'updated': 0, 'deleted': 0})
+        self.assertEqual(len(self.schedule_args()), 30)
+
+
+class StaggeredScheduleTests(SchedulingStarted, TestCase):
+    def test_offsets_are_even_and_interleave_switches(self):
+        items = [(f"a{i}", 'SW-A') for i in range(4)] + [(f"b{i}", 'SW-B') for i in range(2)] + [('c0', 'SW-C')]
+        offsets = plan_offsets(items, 420)
+        ordered = sorted(offsets, key=offsets.get)
+        self.assertEqual(sorted(offsets.values()), [i * 60 for i in range(7)])
+        switches = dict(items)
+        self.assertTrue(all(switches[x] != switches[y] for x, y in zip(ordered, ordered[1:4])))
+        # Execuções de 30 s espaçadas de 60 s nunca se sobrepõem
+        self.assertEqual(peak_concurrency(offsets, dict.fromkeys(offsets, 30), 420), 1)
+
+    def test_changes_fill_gaps_and_full_reconcile_rebalances(self):
+        def create(i):
+            with self.captureOnCommitCallbacks(execute=True):
+                return NetworkTestScenario.objects.create(
+                    source_ip='10.0.0.254', source_port=2001 + i, dest_ip=f"10.0.2.{i}",
+                    device_name=f"SW-{i % 3}", test_name=f"escalonado-{i}",
+                )
+
+        def phases():
+            return sorted(round(phase(s.next_run, 420), 1) for s in Schedule.objects.filter(name__startswith='network_test_schedule_'))
+
+        # Cada cenário novo ocupa o maior intervalo livre sem mexer nos outros
+        scenarios = [create(i) for i in range(4)]
+        self.assertEqual(phases(), [0, 105, 210, 315])
+        self.assertEqual(gap_offset([0, 105, 210, 315], 420), 52.5)
+        self.assertTrue(all(s.schedule_type == 'I' and s.minutes == 7 for s in Schedule.objects.filter(name__startswith='network_test_schedule_')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            scenarios[1].delete()
+        self.assertEqual(phases(), [0, 105, 315])
+
+        NetworkTestScheduler.reconcile_schedules()
+        self.assertEqual(phases(), [0, 140, 280])
+
+    def test_runs_are_pushed_apart_to_fit_the_budgets(self):
+        items = [('a0', 'SW-A'), ('a1', 'SW-A'), ('b0', 'SW-B'), ('b1', 'SW-B')]
+        durations = {'a0': 300, 'a1': 100, 'b0': 10, 'b1': 10}
+        switches = dict(items)
+        # Espaçamento uniforme: a1 (210 s) começa antes de a0 (0-300 s) terminar
+        even = plan_offsets(items, 420)
+        self.assertEqual(overflow(even, switches, durations, 420, switch_budget=1), 1)
+
+        offsets = plan_offsets(items, 420, durations, switch_budget=1)
+        self.assertEqual(offsets, {**even, 'a1': 300.0})
+        self.assertEqual(overflow(offsets, switches, durations, 420, switch_budget=1), 0)
+        with self.assertNoLogs('pingtest.utils.placement', level='WARNING'):
+            check_budgets([(offsets, 420)], switches, durations, host_budget=0, switch_budget=1)
+
+        # Um cenário novo no maior intervalo livre também respeita o orçamento do switch
+        self.assertEqual(fill_offsets({'a0': 0}, ['a1'], switches, 420, durations), {'a1': 210.0})
+        self.assertEqual(fill_offsets({'a0': 0}, ['a1'], switches, 420, durations, switch_budget=1), {'a1': 300.0})
+
+    def test_budget_warning_only_when_no_placement_fits(self):
+        items = [(f"x{i}", f"SW-{i}") for i in range(4)]
+        durations = dict.fromkeys(dict(items), 200)
+        # 4 execuções de 200 s em 420 s: duas simultâneas cabem, uma só não
+        offsets = plan_offsets(items, 420, durations, host_budget=1)
+        with self.assertLogs('pingtest.utils.placement', level='WARNING') as logs:
+            peak, warnings = check_budgets([(offsets, 420)], dict(items), durations, host_budget=1, switch_budget=0)
+        self.assertEqual((peak, warnings), (2, ['jump host: 2 concurrent runs > budget 1']))
+        self.assertEqual(len(logs.output), 1)
+        self.assertEqual(peaks(plan_offsets(items, 420, durations, host_budget=2), dict(items), durations, 420)[0], 2)
+
+
+class ScenarioOptionsTests(SchedulingStarted, TestCase):
+    def test_ping_command_and_timeouts_follow_scenario(self):
+        client = SSHClient()
+        self.assertEqual(client._ping_command('10.0.0.1'), "ping -c 1000 10.0.0.1\n")
+        options = {'packet_count': 50, 'packet_size': 1400, 'ping_timeout': 40, 'priority': 1}
+        self.assertEqual(client._ping_command('10.0.0.1', options), "ping -c 50 -s 1400 10.0.0.1\n")
+        self.assertEqual(client._ping_timeout(options), 40)
+        self.assertLess(client.max_runtime(options), client.max_runtime())
+
+    def test_form_rejects_zero_interval_and_timeout(self):
+        data = {'source_ip': '10.0.0.254', 'source_port': 2001, 'dest_ip': '10.0.3.1', 'device_name': 'SW-BB',
+                'test_name': 'zerado', 'interval_minutes': 7, 'packet_count': 20, 'ping_timeout': 30,
+                'priority': 2, 'active': True}
+        self.assertTrue(NetworkTestScenarioForm(data).is_valid())
+        for field in ('interval_minutes', 'ping_timeout'):
+            form = NetworkTestScenarioForm({**data, field: 0})
+            self.assertFalse(form.is_valid())
+            self.assertIn(field, form.errors)
+
+    def test_schedule_uses_scenario_interval_and_task_timeout(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            critico = NetworkTestScenario.objects.create(
+                source_ip='10.0.0.254', source_port=2001, dest_ip='10.0.3.1', device_name='SW-BB',
+                test_name='backbone', interval_minutes=1, packet_count=20, ping_timeout=30, priority=1,
+            )
+            acesso = NetworkTestScenario.objects.create(
+                source_ip='10.0.0.254', source_port=2002, dest_ip='10.0.3.2', device_name='SW-AC',
+                test_name='acesso', interval_minutes=30, packet_count=1000, ping_timeout=600,
+            )
+        schedules = {s.name: s for s in Schedule.objects.all()}
+        rapido = schedules[f"network_test_schedule_{critico.id}"]
+        lento = schedules[f"network_test_schedule_{acesso.id}"]
+        self.assertEqual((rapido.minutes, lento.minutes), (1, 30))
+        timeouts = [eval(s.kwargs)['q_options']['timeout'] for s in (rapido, lento)]
+        self.assertLess(timeouts[0], 30 + 200)
+        self.assertGreater(timeouts[1], 600)
+        self.assertTrue(NetworkTestScheduler()._validate_scenario(eval(rapido.args)[0]))
+
+
+class FakeGroupClient(SSHClient):
+    """SSHClient with the switch side stubbed out: counts logins and pings"""
+
+    def __init__(self, fail_on=()):
+        super().__init__()
+        self.logins = 0
+        self.pinged = []
+        self.fail_on = fail_on
+        self.returned = []
+
+    @property
+    def sessions(self):
+        client = self
+
+        class Sessions:
+            def checkin(self, session):
+                client.returned.append('checkin')
+
+            def discard(self, session):
+                client.returned.append('discard')
+        return Sessions()
+
+    def _open_session(self, telnet_host, telnet_port, sw_name):
+        self.logins += 1
+        return type('Session', (), {'channel': type('Channel', (), {'closed': False})()})()
+
+    def _execute_ping_test(self, channel, telnet_host, telnet_port, ping_destination, sw_name, options=None):
+        self.pinged.append(ping_destination)
+        result = self._initialize_result(telnet_host, telnet_port, ping_destination, sw_name)
+        result.update(success='SF', start_time=timezone.now(), end_time=timezone.now())
+        if ping_destination in self.fail_on:
+            result['error'] = "Ping statistics not found after aborting."
+        return result
+
+
+class SwitchGroupTests(SchedulingStarted, TestCase):
+    def scenario(self, dest, name, options=None):
+        return ('10.0.0.254', 2001, dest, 'SW-GRUPO', name, options or {'ping_timeout': 20})
+
+    def test_group_logs_in_once_and_fans_out_results(self):
+        client = FakeGroupClient()
+        results = client.run_group([self.scenario(f"10.0.4.{i}", f"grupo-{i}") for i in range(5)])
+        self.assertEqual(client.logins, 1)
+        self.assertEqual([r['test_name'] for r in results], [f"grupo-{i}" for i in range(5)])
+        self.assertEqual(client.returned, ['checkin'])
+
+    def test_broken_cli_state_forces_a_new_login(self):
+        client = FakeGroupClient(fail_on={'10.0.4.1'})
+        results = client.run_group([self.scenario(f"10.0.4.{i}", f"grupo-{i}") for i in range(3)])
+        self.assertEqual(client.logins, 2)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(client.returned, ['discard', 'checkin'])
+
+    def test_reconcile_groups_scenarios_per_console(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(4):
+                NetworkTestScenario.objects.create(
+                    source_ip='10.0.0.254', source_port=2001, dest_ip=f"10.0.5.{i}", device_name='SW-GRUPO',
+                    test_name=f"grupo-{i}", packet_count=50, ping_timeout=60,
+                )
+            sozinho = NetworkTestScenario.objects.create(
+                source_ip='10.0.0.254', source_port=2009, dest_ip='10.0.5.9', device_name='SW-SO', test_name='sozinho',
+            )
+
+        schedules = {s.name: s for s in Schedule.objects.filter(name__startswith='network_test_schedule_')}
+        self.assertEqual(set(schedules), {'network_test_schedule_sw_10.0.0.254_2001_7m_1', f"network_test_schedule_{sozinho.id}"})
+        grupo = schedules['network_test_schedule_sw_10.0.0.254_2001_7m_1']
+        self.assertTrue(grupo.func.endswith('create_group_task'))
+        self.assertEqual([s[4] for s in eval(grupo.args)[0]], [f"grupo-{i}" for i in range(4)])
+
+    def test_group_is_split_when_pings_do_not_fit_the_interval(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(4):
+                NetworkTestScenario.objects.create(
+                    source_ip='10.0.0.254', source_port=2001, dest_ip=f"10.0.6.{i}", device_name='SW-GRUPO',
+                    test_name=f"longo-{i}", ping_timeout=200,
+                )
+        names = sorted(Schedule.objects.filter(name__startswith='network_test_schedule_').values_list('name', flat=True))
+        self.assertEqual(names, [f"network_test_schedule_sw_10.0.0.254_2001_7m_{i}" for i in (1, 2)])
+
+    def test_default_scenarios_are_grouped_on_expected_durations(self):
+        def schedules():
+            return {s.name: eval(s.args)[0] for s in Schedule.objects.filter(name__startswith='network_test_schedule_')}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cenarios = [
+                NetworkTestScenario.objects.create(
+                    source_ip='10.0.0.254', source_port=2001, dest_ip=f"10.0.7.{i}", device_name='SW-GRUPO',
+                    test_name=f"padrao-{i}",
+                )
+                for i in range(3)
+            ]
+        # Sem histórico: 1000 pacotes x 0,2 s, não o ping_timeout de 418 s; cabem dois por intervalo de 7 min
+        self.assertEqual(set(schedules()), {'network_test_schedule_sw_10.0.0.254_2001_7m_1', f"network_test_schedule_{cenarios[2].id}"})
+
+        # Com a duração medida das últimas execuções os três cabem em uma tarefa
+        start = timezone.now()
+        LatestTestStatus.objects.bulk_create([
+            LatestTestStatus(test_name=f"padrao-{i}", test_start=start, test_end=start + timedelta(seconds=90))
+            for i in range(3)
+        ])
+        NetworkTestScheduler.reconcile_schedules()
+        grupo = schedules()
+        self.assertEqual(list(grupo), ['network_test_schedule_sw_10.0.0.254_2001_7m_1'])
+        self.assertEqual(len(grupo['network_test_schedule_sw_10.0.0.254_2001_7m_1']), 3)
+
+    @override_settings(PING_MULTIPLEX_SCHEDULES=True, PING_MULTIPLEX_CHANNELS=3)
+    def test_multiplexed_batches_per_interval(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, port in enumerate([2001, 2001, 2002, 2003, 2004]):
+                NetworkTestScenario.objects.create(
+                    source_ip='10.0.0.254', source_port=port, dest_ip=f"10.0.8.{i}", device_name=f"SW-{port}",
+                    test_name=f"mux-{i}", packet_count=50, ping_timeout=60,
+                )
+            NetworkTestScenario.objects.create(
+                source_ip='10.0.0.254', source_port=2005, dest_ip='10.0.8.9', device_name='SW-2005',
+                test_name='mux-lento', interval_minutes=30,
+            )
+
+        schedules = {s.name: s for s in Schedule.objects.filter(name__startswith='network_test_schedule_')}
+        self.assertEqual(set(schedules), {f"network_test_schedule_mux_7m_{i}" for i in (1, 2)} | {'network_test_schedule_mux_30m_1'})
+        lotes = [eval(schedules[f"network_test_schedule_mux_7m_{i}"].args)[0] for i in (1, 2)]
+        self.assertEqual([len(lote) for lote in lotes], [3, 2])
+        # No máximo um cenário por console em cada lote: cada canal faz o próprio login
+        self.assertTrue(all(len({s[1] for s in lote}) == len(lote) for lote in lotes))
+        self.assertEqual(sorted(s[4] for lote in lotes for s in lote), [f"mux-{i}" for i in range(5)])
+        self.assertTrue(all(s.func.endswith('create_multiplexed_task') for s in schedules.values()))
+        # Os pings do lote rodam juntos: o timeout cobre o mais longo, não a soma
+        timeout = eval(schedules['network_test_schedule_mux_7m_1'].kwargs)['q_options']['timeout']
+        self.assertLess(timeout, NetworkTestScheduler()._task_timeout(lotes[0]))
+
+        with override_settings(PING_MULTIPLEX_SCHEDULES=False):
+            NetworkTestScheduler.reconcile_schedules()
+        self.assertFalse(Schedule.objects.filter(name__contains='_mux_').exists())
+
+
+
+VRP_PING = (
+    "ping -c 3 10.0.0.1\r\n"
+    "  PING 10.0.0.1: 56  data bytes, press CTRL_C to break\r\n"
+    "    Reply from 10.0.0.1: bytes=56 Sequence=1 ttl=255 time=2 ms\r\n"
+    "    Request time out\r\n"
+    "    Reply from 10.0.0.1: bytes=56 Sequence=3 ttl=255 time=4 ms\r\n"
+    "\r\n"
+    "  --- 10.0.0.1 ping statistics ---\r\n"
+    "    3 packet(s) transmitted\r\n"
+    "    2 packet(s) received\r\n"
+    "    33.33% packet loss\r\n"
+    "    round-trip min/avg/max = 2/3/4 ms\r\n"
+    "\r\n"
+    "<SW-01>"
+)
+COMWARE_V7_PING = (
+    "Ping 10.0.0.2 (10.0.0.2): 56 data bytes, press CTRL_C to break\r\n"
+    "56 bytes from 10.0.0.2: icmp_seq=0 ttl=254 time=1.000 ms\r\n"
+    "56 bytes from 10.0.0.2: icmp_seq=1 ttl=254 time=3.000 ms\r\n"
+    "\r\n"
+    "--- Ping statistics for 10.0.0.2 ---\r\n"
+    "2 packet(s) transmitted, 2 packet(s) received, 0.0% packet loss\r\n"
+    "round-trip min/avg/max/std-dev = 1.000/2.000/3.000/1.000 ms\r\n"
+    "<SW-01>"
+)
+
+
+class PingParserTests(TestCase):
+    def parse(self, text, *chunks, destination='10.0.0.1'):
+        parser = PingStreamParser(destination, 'SW-01')
+        bounds = [0, *chunks, len(text)]
+        done = [parser.feed(text[start:end]) for start, end in zip(bounds, bounds[1:])]
+        return parser, done
+
+    def test_vrp_output_with_a_timeout(self):
+        parser, done = self.parse(VRP_PING)
+        self.assertEqual(done, [True])
+        self.assertEqual((parser.sent, parser.received, parser.timeouts), (3, 2, 1))
+        self.assertEqual(parser.packet_loss, 33.33)
+        self.assertEqual(parser.rtt, (2.0, 3.0, 4.0))
+        self.assertEqual(list(parser.sample_seqs), [1, 3])
+        self.assertTrue(parser.statistics_text().startswith("--- 10.0.0.1 ping statistics ---\n3 packet(s) transmitted"))
+
+    def test_comware_v7_output(self):
+        parser, done = self.parse(COMWARE_V7_PING, destination='10.0.0.2')
+        self.assertEqual(done, [True])
+        self.assertEqual((parser.sent, parser.received, parser.packet_loss), (2, 2, 0.0))
+        self.assertEqual(parser.rtt, (1.0, 2.0, 3.0))
+        self.assertEqual(list(parser.sample_seqs), [0, 1])
+
+    def test_any_split_gives_the_same_result(self):
+        whole, _ = self.parse(VRP_PING)
+        for cut in range(1, len(VRP_PING)):
+            parser, done = self.parse(VRP_PING, cut)
+            self.assertEqual(done, [False, True], cut)
+            self.assertEqual(
+                (parser.sent, parser.received, parser.packet_loss, parser.rtt, list(parser.sample_seqs), parser.summary),
+                (whole.sent, whole.received, whole.packet_loss, whole.rtt, list(whole.sample_seqs), whole.summary),
+                cut,
+            )
+
+    def test_byte_sized_chunks_of_comware_output(self):
+        parser = PingStreamParser('10.0.0.2', 'SW-01')
+        done = [parser.feed(char) for char in COMWARE_V7_PING]
+        self.assertEqual(done.index(True), len(COMWARE_V7_PING) - 1)
+        self.assertEqual(parser.rtt, (1.0, 2.0, 3.0))
+
+    def test_partial_run_uses_the_counters(self):
+        cut = VRP_PING.index("\r\n  ---")
+        parser, done = self.parse(VRP_PING[:cut])
+        self.assertEqual(done, [False])
+        self.assertFalse(parser.has_summary)
+        self.assertEqual((parser.sent, parser.packet_loss, parser.rtt), (3, 33.33, (2.0, 3.0, 4.0)))
+        self.assertIn("(partial)", parser.statistics_text())
+
+    def test_summary_waits_for_the_prompt(self):
+        parser, done = self.parse(VRP_PING[:-len("<SW-01>")])
+        self.assertEqual(done, [False])
+        self.assertTrue(parser.has_summary)
+        self.assertTrue(parser.feed("<SW-01>"))
+
+
+    def test_adaptive_policy_decides_once_after_the_sample(self):
+        replies = "".join(f"Reply from 10.0.0.1: bytes=56 Sequence={seq} ttl=255 time=1 ms\n" for seq in range(1, 6))
+        for lost, expected in ((0, [False] * 4 + [True]), (5, [False] * 4 + [True]), (1, [False] * 5)):
+            parser, policy = PingStreamParser('10.0.0.1', 'SW-01'), AdaptivePingPolicy(5)
+            decisions = []
+            for i, line in enumerate(replies.splitlines(keepends=True)):
+                parser.feed("Request time out\n" if i < lost else line)
+                decisions.append(policy.should_abort(parser))
+            self.assertEqual(decisions, expected, lost)
+            self.assertFalse(policy.should_abort(parser))
+
+class RttSamplesTests(TestCase):
+    def test_pack_round_trip(self):
+        blob = pack_samples([1, 2, 65535], [0.5, 1.25, 300.0])
+        self.assertEqual(len(blob), 4 + 6 * 3)
+        seqs, rtts = unpack_samples(blob)
+        self.assertEqual((list(seqs), list(rtts)), ([1, 2, 65535], [0.5, 1.25, 300.0]))
+        self.assertEqual([list(a) for a in unpack_samples(pack_samples([], []))], [[], []])
+        with self.assertRaises(ValueError):
+            pack_samples([1, 2], [1.0])
+
+    def test_jitter_percentiles_and_loss_bursts(self):
+        # VRP (começa em 1): perdidos 4-5, 8-9 e 11-12 de 12 enviados; fora de ordem de propósito
+        blob = pack_samples([3, 1, 2, 6, 7, 10], [2.0, 1.0, 3.0, 6.0, 4.0, 4.0])
+        analysis = analyze_samples(blob, sent=12)
+        self.assertEqual(analysis['replies'], 6)
+        self.assertEqual(analysis['jitter'], 1.8)  # |3-1|, |2-3|, |6-2|, |4-6|, |4-4|
+        self.assertEqual((analysis['p50'], analysis['p95']), (3.5, 5.5))
+        self.assertAlmostEqual(analysis['p99'], 5.9)
+        self.assertEqual((analysis['loss_bursts'], analysis['max_loss_burst']), (3, 2))
+
+    def test_comware_sequences_start_at_zero(self):
+        analysis = analyze_samples(pack_samples([0, 1, 3], [1.0, 1.0, 1.0]), sent=5)
+        self.assertEqual((analysis['jitter'], analysis['loss_bursts'], analysis['max_loss_burst']), (0.0, 2, 1))
+        self.assertEqual(analyze_samples(pack_samples([0, 1, 2], [1.0, 1.0, 1.0]), sent=3)['loss_bursts'], 0)
+
+    def test_series_is_stored_with_the_result(self):
+        writer = BulkResultWriter(batch_size=1000)
+        writer.add({**make_result('serie', timezone.now()), 'rtt_samples': pack_samples([1, 3], [1.5, 2.5])})
+        writer.flush()
+        result = NetworkTestResult.objects.get(test_name='serie')
+        self.assertEqual(result.rtt_series(), [(1, 1.5), (3, 2.5)])
+        self.assertEqual(result.rtt_analysis()['max_loss_burst'], 1)
+
+class SimulatedClient(SSHClient):
+    """SSHClient tuned for the local simulator: no shell warm-up, short abort wait"""
+    SHELL_INIT_DELAY = 0
+    ABORT_READ_TIMEOUT = 1
+
+
+class SimulatorTests(TestCase):
+    """SSHClient end to end against the in-process jump host/switch simulator"""
+
+    def setUp(self):
+        self.simulator = JumpHostSimulator(seed=7).start()
+        self.client = SimulatedClient()
+        self.client.ssh_config.update(self.simulator.ssh_config)
+
+    def tearDown(self):
+        self.client.sessions.clear()
+        self.simulator.stop()
+
+    def run_ping(self, port, profile, **options):
+        self.simulator.add_switch('10.7.0.1', port, profile)
+        sw_name = self.simulator.switch_name('10.7.0.1', port)
+        return self.client.run_test('10.7.0.1', port, '10.0.0.1', sw_name, repeat=1, options=options)
+
+    def test_loss_pattern_and_rtt_reach_the_result(self):
+        result = self.run_ping(7001, SwitchProfile(loss_pattern='!!!.', rtt=4), packet_count=20)
+        self.assertEqual(result['error'], '')
+        self.assertEqual(result['success'], 'FP')
+        self.assertEqual(result['packets_sent'], 20)
+        self.assertEqual(result['packet_loss'], 25.0)
+        self.assertEqual((result['rtt_min'], result['rtt_avg'], result['rtt_max']), (4.0, 4.0, 4.0))
+
+    def test_slow_replies_are_aborted_with_partial_statistics(self):
+        result = self.run_ping(7002, SwitchProfile(reply_delay=0.05), packet_count=1000, ping_timeout=1)
+        self.assertEqual(result['error'], '')
+        self.assertEqual(result['success'], 'SF')
+        self.assertLess(result['packets_sent'], 1000)
+        self.assertEqual(self.simulator.stats()['aborts'], 1)
+
+    def test_hung_session_is_reported_and_not_cached(self):
+        result = self.run_ping(7003, SwitchProfile(name='SW-TRAVADO', hang_after=5), packet_count=20, ping_timeout=1)
+        self.assertEqual(result['error'], "Ping statistics not found after aborting.")
+        self.assertEqual(result['packets_sent'], 5)
+        self.assertEqual(self.client.sessions.stats()['cached'], 0)
+
+    def test_multiplexed_session_failure_stays_in_its_own_result(self):
+        scenarios = []
+        for port in (7004, 7005, 7006):
+            self.simulator.add_switch('10.7.0.1', port, SwitchProfile())
+            sw_name = self.simulator.switch_name('10.7.0.1', port)
+            scenarios.append(('10.7.0.1', port, '10.0.0.1', sw_name, f"mux-{port}", {'packet_count': 5}))
+        broken = scenarios[1][3]
+        feed = ChannelSession.feed
+
+        def failing_feed(session, data):
+            if session.sw_name == broken and session.in_ping:
+                raise ValueError("parser exploded")
+            return feed(session, data)
+
+        with mock.patch.object(ChannelSession, 'feed', failing_feed):
+            results = MultiplexExecutor(self.client).run(scenarios)
+
+        errors = {r['test_name']: r['error'] for r in results}
+        self.assertEqual(errors, {'mux-7004': '', 'mux-7005': 'parser exploded', 'mux-7006': ''})
+        self.assertEqual(self.client.pool.stats()['active_leases'], 0)
+
+    @override_settings(PING_ADAPTIVE=True, PING_ADAPTIVE_SAMPLE=20)
+    def test_adaptive_ping_stops_clean_targets_and_runs_lossy_ones_in_full(self):
+        clean = self.run_ping(7007, SwitchProfile(reply_delay=0.002), packet_count=200)
+        self.assertEqual((clean['error'], clean['success']), ('', 'SF'))
+        self.assertGreaterEqual(clean['packets_sent'], 20)
+        self.assertLess(clean['packets_sent'], 200)
+        self.assertEqual(self.simulator.stats()['aborts'], 1)
+
+        lossy = self.run_ping(7008, SwitchProfile(loss_pattern='!!!.', reply_delay=0.002), packet_count=200)
+        self.assertEqual((lossy['success'], lossy['packets_sent'], lossy['packet_loss']), ('FP', 200, 25.0))
+        self.assertEqual(self.simulator.stats()['aborts'], 1)
+
+    def test_benchmark_writes_every_result(self):
+        seq = cache.get(SEQ_KEY)
+        report = run_benchmark(5, mode='multiplex', per_switch=2, options={'packet_count': 10}, seed=1)
+        self.assertEqual(report['outcomes'], {'SF': 5})
+        self.assertEqual(report['db_rows'], 5)
+        self.assertEqual(report['simulator']['logins'], 5)
+        self.assertEqual({phase: stats['count'] for phase, stats in report['phases'].items() if phase != 'save'},
+                         {'connect': 1, 'shell_init': 5, 'login': 5, 'ping': 5, 'parse': 5})
+        self.assertGreaterEqual(report['phases']['save']['count'], 1)
+        self.assertEqual(NetworkTestResult.objects.filter(test_name__startswith='bench-').count(), 5)
+        # Nada chega ao status, aos alertas nem ao stream ao vivo da instalação real
+        self.assertFalse(LatestTestStatus.objects.exists())
+        self.assertEqual(cache.get(SEQ_KEY), seq)
+        self.assertEqual(delete_benchmark_results(), 5)
+
+    def test_lossy_benchmark_leaves_no_alerts(self):
+        run_benchmark(4, mode='task', workers=2, per_switch=2, profile=SwitchProfile(loss=1.0), options={'packet_count': 5})
+        self.assertFalse(AlertTransition.objects.exists())
+        self.assertEqual(delete_benchmark_results(), 4)
+
+
+
+
+class SimulatedAsyncClient(async_ssh_client.AsyncSSHClient):
+    SHELL_INIT_DELAY = 0
+    ABORT_READ_TIMEOUT = 1
+
+
+class AsyncEngineTests(TestCase):
+    """AsyncSSHClient end to end against the simulator (needs the optional asyncssh package)"""
+
+    def test_missing_asyncssh_is_a_configuration_error(self):
+        with mock.patch.object(async_ssh_client, 'asyncssh', None):
+            with self.assertRaises(ImproperlyConfigured):
+                async_ssh_client.AsyncSSHClient()
+
+    @skipIf(async_ssh_client.asyncssh is None, "asyncssh not installed")
+    def test_concurrent_scenarios_and_group_run(self):
+        with JumpHostSimulator(seed=3) as simulator:
+            simulator.add_switch('10.7.3.1', 7301, SwitchProfile(loss_pattern='!!!.', rtt=4))
+            client = SimulatedAsyncClient(max_concurrency=4)
+            client.ssh_config.update(simulator.ssh_config)
+            scenarios = [
+                ('10.7.3.1', port, '10.0.0.1', simulator.switch_name('10.7.3.1', port), f"async-{port}", {'packet_count': 20})
+                for port in (7301, 7302, 7303)
+            ]
+
+            results = {r['test_name']: r for r in client.run(scenarios)}
+            self.assertEqual({name: r['success'] for name, r in results.items()},
+                             {'async-7301': 'FP', 'async-7302': 'SF', 'async-7303': 'SF'})
+            self.assertEqual(results['async-7301']['packet_loss'], 25.0)
+            self.assertEqual(results['async-7301']['rtt_avg'], 4.0)
+
+            group = [(*scenarios[1][:2], f"10.0.0.{i}", scenarios[1][3], f"grupo-{i}", {'packet_count': 5}) for i in (1, 2)]
+            results = client.run_group(group)
+            self.assertEqual([(r['test_name'], r['error']) for r in results], [('grupo-1', ''), ('grupo-2', '')])
+            self.assertEqual(simulator.stats()['logins'], 4)
+
+class SSHPoolTests(TestCase):
+    """SSHConnectionPool leases, health checks and idle eviction against the simulator"""
+
+    def setUp(self):
+        self.simulator = JumpHostSimulator().start()
+        self.client = SimulatedClient()
+        self.client.ssh_config.update(self.simulator.ssh_config)
+
+    def tearDown(self):
+        self.simulator.stop()
+
+    def make_pool(self, **kwargs):
+        pool = SSHConnectionPool(self.client._connect_ssh, **{'size': 1, 'max_sessions': 2, **kwargs})
+        self.addCleanup(pool.close_all)
+        return pool
+
+    def test_leases_share_one_transport_up_to_max_sessions(self):
+        pool = self.make_pool()
+        first, second = pool.acquire(), pool.acquire()
+        self.assertIs(first, second)
+        with self.assertRaises(TimeoutError):
+            pool.acquire(timeout=0)
+
+        pool.release(second)
+        self.assertIs(pool.acquire(timeout=0), first)
+        stats = pool.stats()
+        self.assertEqual((stats['created'], stats['reused'], stats['open'], stats['active_leases']), (1, 2, 1, 2))
+
+    def test_dead_transport_fails_the_health_check_and_is_replaced(self):
+        pool = self.make_pool()
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.client.close()
+
+        fresh = pool.acquire()
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(fresh.is_healthy())
+        stats = pool.stats()
+        self.assertEqual((stats['created'], stats['reconnects'], stats['open']), (2, 1, 1))
+
+    def test_idle_transports_are_closed_after_idle_timeout(self):
+        pool = self.make_pool(idle_timeout=0)
+        conn = pool.acquire()
+        pool.release(conn)
+        time.sleep(0.01)
+
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertIsNone(conn.transport)
+        self.assertEqual(pool.stats()['evicted'], 1)
+
+    def test_disabled_pool_opens_and_closes_per_lease(self):
+        pool = self.make_pool(size=0)
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIsNone(conn.transport)
+        self.assertEqual(pool.stats()['open'], 0)
+
+
+class FakeChannel:
+    """Channel stub for _read_until: hands out ``chunks`` in order, then times out"""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def settimeout(self, timeout):
+        pass
+
+    def recv(self, size):
+        if not self.chunks:
+            raise SocketTimeout()
+        return self.chunks.pop(0)
+
+
+class ReadUntilTests(TestCase):
+    def test_read_until_matches_a_prompt_split_across_chunks(self):
+        client = SSHClient()
+        channel = FakeChannel([b'ping ok\r\n<SW-', b'01>', b'not read'])
+        self.assertEqual(client._read_until(channel, r'<SW-01>', timeout=5), 'ping ok\r\n<SW-01>')
+        self.assertEqual(channel.chunks, [b'not read'])
+
+    def test_read_until_keeps_multibyte_characters_and_stops_on_timeout(self):
+        client = SSHClient()
+        text = client._read_until(FakeChannel([b'Informa\xc3', b'\xa7\xc3\xa3o']), r'<SW>', timeout=5)
+        self.assertEqual(text, 'Informação')
+
+    def test_read_until_hands_chunks_to_the_callback_until_it_returns_true(self):
+        seen = []
+        channel = FakeChannel([b'um ', b'dois ', b'tres '])
+        result = SSHClient()._read_until(channel, None, timeout=5, on_chunk=lambda chunk: seen.append(chunk) or 'dois' in chunk)
+        self.assertEqual(result, '')
+        self.assertEqual(seen, ['um ', 'dois ', ''])
+        self.assertEqual(channel.chunks, [b'tres '])
+
+
+class SessionCacheTests(TestCase):
+    def setUp(self):
+        self.closed = []
+
+    def make_cache(self, **kwargs):
+        return TelnetSessionCache(lambda session: self.closed.append(session.key), **kwargs)
+
+    def test_least_recently_used_session_is_evicted(self):
+        cache_ = self.make_cache(max_sessions=2, ttl=600)
+        for key in ('a', 'b'):
+            cache_.checkin(TelnetSession(key, None, None))
+        cache_.checkin(cache_.checkout('a'))  # 'a' passa a ser a mais recente
+        cache_.checkin(TelnetSession('c', None, None))
+
+        self.assertEqual(self.closed, ['b'])
+        self.assertIsNone(cache_.checkout('b'))
+        self.assertEqual(cache_.checkout('a').key, 'a')
+        stats = cache_.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evicted'], stats['cached']), (2, 1, 1, 1))
+
+    def test_sessions_idle_past_the_ttl_expire(self):
+        cache_ = self.make_cache(max_sessions=8, ttl=60)
+        old, recent = TelnetSession('velha', None, None), TelnetSession('nova', None, None)
+        cache_.checkin(old)
+        cache_.checkin(recent)
+        old.last_used -= 61
+
+        self.assertIsNone(cache_.checkout('velha'))
+        self.assertEqual(self.closed, ['velha'])
+        self.assertIs(cache_.checkout('nova'), recent)
+        self.assertEqual(cache_.stats()['expired'], 1)
+
+    def test_evict_lru_and_disabled_cache(self):
+        cache_ = self.make_cache(max_sessions=2, ttl=600)
+        self.assertFalse(cache_.evict_lru())
+        cache_.checkin(TelnetSession('a', None, None))
+        cache_.checkin(TelnetSession('b', None, None))
+        self.assertTrue(cache_.evict_lru())
+        self.assertEqual(self.closed, ['a'])
+
+        disabled = self.make_cache(max_sessions=0)
+        disabled.checkin(TelnetSession('c', None, None))
+        self.assertEqual(self.closed, ['a', 'c'])
+        self.assertEqual(disabled.stats()['cached'], 0)
+
+    def test_cached_session_skips_the_second_login(self):
+        with JumpHostSimulator() as simulator:
+            client = SimulatedClient()
+            client.ssh_config.update(simulator.ssh_config)
+            hits = client.sessions.stats()['hits']  # cache do processo: compartilhado com os outros testes
+            for _ in range(2):
+                result = client.run_test('10.7.2.1', 7201, '10.0.0.1', 'SW-7201', repeat=1, options={'packet_count': 5})
+                self.assertEqual(result['error'], '')
+            self.assertEqual(simulator.stats()['logins'], 1)
+            self.assertEqual(client.sessions.stats()['hits'], hits + 1)
+            client.sessions.clear()
+
+
+class MetricsTests(TestCase):
+    """Phase histograms aggregated through the cache and exposed on /metrics"""
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics.observe(metrics.TASK, 0.003, kind='task')
+        metrics.observe(metrics.TASK, 0.2, kind='task')
+        metrics.flush()
+        text = metrics.render()
+        self.assertIn('pingtest_task_seconds_bucket{kind="task",le="0.005"} 1', text)
+        self.assertIn('pingtest_task_seconds_bucket{kind="task",le="0.25"} 2', text)
+        self.assertIn('pingtest_task_seconds_bucket{kind="task",le="+Inf"} 2', text)
+        self.assertIn('pingtest_task_seconds_sum{kind="task"} 0.203', text)
+
+    def test_client_phases_are_labelled_by_jump_host_and_switch(self):
+        with JumpHostSimulator() as simulator:
+            client = SimulatedClient()
+            client.ssh_config.update(simulator.ssh_config)
+            client.run_test('10.7.1.1', 7101, '10.0.0.1', 'SW-7101', repeat=1, options={'packet_count': 5})
+            client.sessions.clear()
+        metrics.flush()
+        text = metrics.render()
+        for name in ('connect', 'shell_init', 'login', 'ping', 'parse'):
+            switch = '' if name == 'connect' else 'SW-7101'
+            self.assertIn(f'pingtest_phase_seconds_count{{jump_host="127.0.0.1",phase="{name}",switch="{switch}"}} 1', text)
+
+    @override_settings(METRICS_TOKEN='segredo')
+    def test_endpoint_needs_token_and_reports_view_latency(self):
+        self.assertEqual(self.client.get(reverse('pingtest:metrics')).status_code, 403)
+
+        User.objects.create_user('operador', password='senha-teste')
+        self.client.login(username='operador', password='senha-teste')
+        self.client.get(reverse('pingtest:index'))
+        self.client.logout()
+
+        response = self.client.get(reverse('pingtest:metrics'), HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('pingtest_view_seconds_count{view="index"} 1', text)
+        self.assertIn('pingtest_queue_depth 0', text)
+        self.assertIn('# TYPE pingtest_workers gauge', text)
+
+
+class BrokerTests(TestCase):
+    def test_orm_benchmark_processes_every_task_and_cleans_up(self):
+        from django_q.models import OrmQ, Task
+        report = broker.run_broker_benchmark('orm', 5)
+        self.assertEqual(report['processed'], 5)
+        self.assertEqual(report['enqueue_queries'], 5)
+        self.assertGreater(report['process_queries'], 0)
+        self.assertFalse(Task.objects.filter(name__startswith=broker.BENCH_PREFIX).exists())
+        self.assertFalse(OrmQ.objects.filter(key__startswith=broker.BENCH_PREFIX).exists())
+
+
+class AlertStateTests(TestCase):
+    def ingest(self, test_name, codes, start):
+        writer = BulkResultWriter()
+        for run, success in enumerate(codes):
+            writer.add(make_result(test_name, start + timedelta(minutes=7 * run), success))
+        writer.flush()
+        return LatestTestStatus.objects.get(test_name=test_name)
+
+    def test_state_machine_walks_down_and_back(self):
+        start = timezone.now() - timedelta(hours=2)
+        status = self.ingest('nucleo', ['SF', 'FP', 'FT', 'FT'], start)
+        self.assertEqual(status.alert_state, 'down')
+        self.assertEqual([c['test_name'] for c in build_cards(alerting_only=True)], ['nucleo'])
+
+        status = self.ingest('nucleo', ['SF'], start + timedelta(minutes=28))
+        self.assertEqual(status.alert_state, 'recovering')
+        status = self.ingest('nucleo', ['SF', 'SF', 'SF'], start + timedelta(minutes=35))
+        self.assertEqual(status.alert_state, 'ok')
+        self.assertEqual(build_cards(alerting_only=True), [])
+
+        path = list(AlertTransition.objects.order_by('changed_at').values_list('from_state', 'to_state'))
+        self.assertEqual(path, [('ok', 'degraded'), ('degraded', 'down'), ('down', 'recovering'), ('recovering', 'ok')])
+        self.assertEqual(alerts.replay(status.recent_results)[0], 'ok')
+
+    @override_settings(ALERT_EMAIL_RECIPIENTS=['noc@example.com'], ALERT_EMAIL_FROM='pingtest@example.com')
+    def test_flapping_link_produces_one_debounced_digest(self):
+        start = timezone.now() - timedelta(hours=3)
+        self.ingest('flapping', ['FT', 'FT', 'FT', 'SF'] * 5, start)
+        self.ingest('estavel', ['SF', 'FP'], start)
+        pending = AlertTransition.objects.count()
+        self.assertGreater(pending, 10)
+
+        self.assertEqual(alerts.send_digest(), 0)  # transições recém-chegadas: ainda esperando
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(alerts.send_digest(now=timezone.now() + timedelta(seconds=121)), pending)
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEqual(message.to, ['noc@example.com'])
+        self.assertIn('1 degradado', message.subject)
+        lines = message.body.splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('estavel'))
+        self.assertIn('mudanças; agora Recuperando', lines[1])
+        self.assertFalse(AlertTransition.objects.exists())
@@ -13,8 +13,12 @@ urlpatterns = [
     path('partial-falha/', views.partial_falha, name='partial_falha'), 
     path('teste-individual/<str:test_name>/', views.teste_individual, name='teste_individual'),
     path('partial-individual/<str:test_name>/', views.partial_individual, name='partial_individual'),
+    path('exportar-individual/<str:test_name>/', views.exportar_individual, name='exportar_individual'),
     path('cadastrar-teste/', views.cadastrar_teste, name='cadastrar_teste'),
     path('editar-teste/', views.editar_teste, name='editar_teste'),
     path('editar-teste/<int:id>/', views.form_editar_teste, name='form_editar_teste'),
     path('deletar-teste/<int:id>/', views.deletar_teste, name='deletar_teste'),
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
+    path('metrics/', views.prometheus_metrics, name='metrics'),
+    path('live/<str:view>/', views.live_updates, name='live_updates'),
     ]
\ No newline at end of file
@@ -0,0 +1,119 @@
+import logging
+from collections import OrderedDict
+from types import SimpleNamespace
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import Max, Min
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Valores de LatestTestStatus.AlertState (strings: também rodam com os modelos históricos das migrações)
+OK, DEGRADED, DOWN, RECOVERING = 'ok', 'degraded', 'down', 'recovering'
+LABELS = {OK: 'OK', DEGRADED: 'Degradado', DOWN: 'Fora', RECOVERING: 'Recuperando'}
+SUCCESS = 'SF'
+TOTAL_FAILURE = 'FT'
+
+
+def advance(status, success, at):
+    """
+    Feed the newest result code into ``status`` (before status.success is
+    overwritten) and return (from_state, to_state) when the state changes.
+
+    A failure degrades; ALERT_DOWN_AFTER failures in a row ending in a
+    total failure mean down, and a failure while recovering goes straight
+    back down. A success after down starts recovering; ALERT_RECOVER_AFTER
+    successes in a row bring any state back to ok.
+    """
+    failed = success != SUCCESS
+    same = status.alert_streak and (status.success != SUCCESS) == failed
+    status.alert_streak = status.alert_streak + 1 if same else 1
+
+    state = status.alert_state
+    if failed:
+        down = success == TOTAL_FAILURE and status.alert_streak >= getattr(settings, 'ALERT_DOWN_AFTER', 3)
+        new = DOWN if down or state in (DOWN, RECOVERING) else DEGRADED
+    elif state == OK or status.alert_streak >= getattr(settings, 'ALERT_RECOVER_AFTER', 4):
+        new = OK
+    elif state == DOWN:
+        new = RECOVERING
+    else:
+        new = state
+
+    if new == state:
+        return None
+    status.alert_state = new
+    status.alert_since = at
+    return state, new
+
+
+def replay(recent_results, test_end=None):
+    """(alert_state, alert_streak, alert_since) from a recent_results string (newest first), for rebuilds"""
+    status = SimpleNamespace(success=SUCCESS, alert_state=OK, alert_streak=0, alert_since=None)
+    codes = [recent_results[i:i + 2] for i in range(0, len(recent_results), 2)]
+    for code in reversed(codes):
+        advance(status, code, test_end)
+        status.success = code
+    return status.alert_state, status.alert_streak, status.alert_since
+
+
+def send_digest(now=None):
+    """
+    Email every pending AlertTransition as one digest and delete them.
+
+    Debounced: waits until no transition arrived for ALERT_DEBOUNCE_SECONDS,
+    but never holds the oldest one longer than ALERT_MAX_DELAY_SECONDS, so a
+    flapping link yields one digest per window. Without
+    ALERT_EMAIL_RECIPIENTS the transitions are just dropped. Returns the
+    number of transitions handled (0 while still waiting).
+    """
+    from pingtest.models import AlertTransition, LatestTestStatus
+
+    now = now or timezone.now()
+    bounds = AlertTransition.objects.aggregate(first=Min('created_at'), last=Max('created_at'), top=Max('id'))
+    if bounds['top'] is None:
+        return 0
+    quiet = (now - bounds['last']).total_seconds() >= getattr(settings, 'ALERT_DEBOUNCE_SECONDS', 120)
+    overdue = (now - bounds['first']).total_seconds() >= getattr(settings, 'ALERT_MAX_DELAY_SECONDS', 900)
+    if not (quiet or overdue):
+        return 0
+
+    # Só até o maior id lido: o que chegar agora fica para o próximo digest
+    pending = AlertTransition.objects.filter(id__lte=bounds['top'])
+    transitions = list(pending.order_by('changed_at', 'id'))
+    recipients = getattr(settings, 'ALERT_EMAIL_RECIPIENTS', [])
+    if recipients:
+        statuses = LatestTestStatus.objects.in_bulk(
+            list({t.test_name for t in transitions}), field_name='test_name',
+        )
+        subject, body = build_digest(transitions, statuses)
+        # Erro de SMTP sobe antes do delete: as transições ficam para a próxima tentativa
+        send_mail(subject, body, getattr(settings, 'ALERT_EMAIL_FROM', settings.EMAIL_HOST_USER), recipients)
+    else:
+        logger.info(f"No ALERT_EMAIL_RECIPIENTS; dropping {len(transitions)} alert transitions")
+    pending.delete()
+    return len(transitions)
+
+
+def build_digest(transitions, statuses):
+    """(subject, body): one line per test with its path of states, ordered by the current state"""
+    paths = OrderedDict()
+    for t in transitions:
+        paths.setdefault(t.test_name, [t.from_state]).append(t.to_state)
+
+    order = {DOWN: 0, DEGRADED: 1, RECOVERING: 2, OK: 3}
+    names = sorted(paths, key=lambda name: (order[paths[name][-1]], name))
+    counts = {state: sum(1 for name in names if paths[name][-1] == state) for state in order}
+
+    lines = []
+    for name in names:
+        path, status = paths[name], statuses.get(name)
+        where = f" ({status.sw_name} -> {status.ping_destination})" if status else ""
+        changes = f", {len(path) - 1} mudanças" if len(path) > 2 else ""
+        since = f" desde {timezone.localtime(status.alert_since):%d/%m %H:%M}" if status and status.alert_since else ""
+        lines.append(
+            f"{name}{where}: {' -> '.join(LABELS[s] for s in path)}{changes}; agora {LABELS[path[-1]]}{since}"
+        )
+
+    summary = ", ".join(f"{counts[state]} {LABELS[state].lower()}" for state in order if counts[state])
+    return f"[pingtest] Alertas: {summary}", "\n".join(lines) + "\n"
@@ -0,0 +1,271 @@
+import re
+import asyncio
+import logging
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from .ssh_client import SSHClient
+from .ping_parser import PingStreamParser
+
+try:
+    import asyncssh
+except ImportError:  # Optional dependency, only needed for PING_TEST_ENGINE = 'asyncio'
+    asyncssh = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSSHClient(SSHClient):
+    """
+    Coroutine based engine with the same run_test contract as SSHClient.
+
+    Sessions are asyncssh processes multiplexed over a few SSH connections
+    (SSH_POOL_MAX_SESSIONS each); a semaphore bounds how many scenarios run at
+    once, so one process can drive hundreds of switches without threads.
+    """
+
+    def __init__(self, max_concurrency=None):
+        if asyncssh is None:
+            raise ImproperlyConfigured("PING_TEST_ENGINE='asyncio' requires the asyncssh package")
+        super().__init__()
+        self.max_concurrency = max_concurrency or getattr(settings, 'ASYNC_MAX_CONCURRENCY', 200)
+        self.max_sessions = getattr(settings, 'SSH_POOL_MAX_SESSIONS', 10)
+
+    def run_test(self, telnet_host, telnet_port, ping_destination, sw_name, repeat=2, options=None):
+        return asyncio.run(self._run_single(telnet_host, telnet_port, ping_destination, sw_name, repeat, options))
+
+    def run(self, scenarios):
+        """Run (host, port, destination, sw_name, test_name[, options]) scenarios concurrently"""
+        return asyncio.run(self.run_many(scenarios))
+
+    async def run_many(self, scenarios):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        connections = []
+        lock = asyncio.Lock()
+
+        async def run_one(scenario):
+            telnet_host, telnet_port, ping_destination, sw_name, test_name = scenario[:5]
+            options = scenario[5] if len(scenario) > 5 else None
+            async with semaphore:
+                results = await self.run_test_async(
+                    telnet_host, telnet_port, ping_destination, sw_name,
+                    repeat=1, connections=connections, lock=lock, options=options,
+                )
+            result = results[0] if results else self._empty_result(scenario)
+            result['test_name'] = test_name
+            return result
+
+        try:
+            return await asyncio.gather(*(run_one(s) for s in scenarios))
+        finally:
+            for conn, _ in connections:
+                conn.close()
+
+    async def _run_single(self, telnet_host, telnet_port, ping_destination, sw_name, repeat, options=None):
+        connections = []
+        try:
+            results = await self.run_test_async(
+                telnet_host, telnet_port, ping_destination, sw_name,
+                repeat=repeat, connections=connections, lock=asyncio.Lock(), options=options,
+            )
+        finally:
+            for conn, _ in connections:
+                conn.close()
+
+        if repeat == 1:
+            return results[0] if results else None
+        return results
+
+    async def run_test_async(self, telnet_host, telnet_port, ping_destination, sw_name, repeat=1,
+                             connections=None, lock=None, options=None):
+        results = []
+        slot = None
+        process = None
+
+        try:
+            slot = await self._acquire_connection(connections, lock)
+            process = await slot[0].create_process(term_type='vt100', encoding='utf-8', errors='ignore')
+            with self._phase('shell_init', sw_name):
+                await asyncio.sleep(self.SHELL_INIT_DELAY)  # Shell initialization, without blocking other sessions
+
+            await self._login_async(process, telnet_host, telnet_port, sw_name)
+
+            for _ in range(repeat):
+                result = await self._execute_ping_test_async(
+                    process, telnet_host, telnet_port, ping_destination, sw_name, options,
+                )
+                results.append(result)
+
+        except Exception as e:
+            logger.error(f"Critical error: {str(e)}")
+
+        finally:
+            if process:
+                try:
+                    process.stdin.write("exit\n")
+                    process.close()
+                except Exception as e:
+                    logger.debug(f"Channel cleanup warning: {str(e)}")
+            if slot:
+                slot[1] -= 1
+
+        return results
+
+    def run_group(self, scenarios, sessions=1):
+        """Same contract as SSHClient.run_group, on one event loop"""
+        return asyncio.run(self._run_group(scenarios, sessions))
+
+    async def _run_group(self, scenarios, sessions):
+        connections = []
+        lock = asyncio.Lock()
+        chunks = [chunk for chunk in (scenarios[i::sessions] for i in range(max(1, sessions))) if chunk]
+        try:
+            chunk_results = await asyncio.gather(*(self.run_group_async(c, connections, lock) for c in chunks))
+        finally:
+            for conn, _ in connections:
+                conn.close()
+        return [result for results in chunk_results for result in results]
+
+    async def run_group_async(self, scenarios, connections, lock):
+        """One login on the switch console, then every scenario's ping in sequence"""
+        telnet_host, telnet_port, _, sw_name = scenarios[0][:4]
+        results = []
+        slot = None
+        process = None
+
+        try:
+            for scenario in scenarios:
+                ping_destination, test_name = scenario[2], scenario[4]
+                options = scenario[5] if len(scenario) > 5 else None
+                try:
+                    if process is None:
+                        slot = await self._acquire_connection(connections, lock)
+                        process = await slot[0].create_process(term_type='vt100', encoding='utf-8', errors='ignore')
+                        with self._phase('shell_init', sw_name):
+                            await asyncio.sleep(self.SHELL_INIT_DELAY)
+                        await self._login_async(process, telnet_host, telnet_port, sw_name)
+                    result = await self._execute_ping_test_async(
+                        process, telnet_host, telnet_port, ping_destination, sw_name, options,
+                    )
+                except Exception as e:
+                    logger.error(f"Critical error: {str(e)}")
+                    result = self._empty_result(scenario)
+                    result['error'] = str(e)
+                result['test_name'] = test_name
+                results.append(result)
+
+                if process and (process.stdin.is_closing() or result['error']):
+                    # CLI em estado desconhecido: novo login para o próximo destino
+                    self._close_process(process, slot)
+                    process, slot = None, None
+        finally:
+            if process:
+                self._close_process(process, slot)
+
+        return results
+
+    async def _login_async(self, process, telnet_host, telnet_port, sw_name):
+        with self._phase('login', sw_name):
+            for command, pattern, timeout in self._login_steps(telnet_host, telnet_port, sw_name):
+                process.stdin.write(command)
+                await self._read_until_async(process, pattern, timeout)
+
+    def _close_process(self, process, slot):
+        try:
+            process.stdin.write("exit\n")
+            process.close()
+        except Exception as e:
+            logger.debug(f"Channel cleanup warning: {str(e)}")
+        if slot:
+            slot[1] -= 1
+
+    async def _acquire_connection(self, connections, lock):
+        """Pick a connection with a free session slot, opening a new one if needed"""
+        async with lock:
+            for slot in connections:
+                if slot[1] < self.max_sessions and not slot[0].is_closed():
+                    slot[1] += 1
+                    return slot
+
+            with self._phase('connect'):
+                conn = await asyncssh.connect(
+                    self.ssh_config['hostname'],
+                    port=self.ssh_config['port'],
+                    username=self.ssh_config['username'],
+                    password=self.ssh_config['password'],
+                    known_hosts=None,
+                    connect_timeout=self.ssh_config['timeout'],
+                    keepalive_interval=getattr(settings, 'SSH_KEEPALIVE_INTERVAL', 30),
+                )
+            slot = [conn, 1]
+            connections.append(slot)
+            return slot
+
+    async def _read_until_async(self, process, end_marker, timeout=60, on_chunk=None):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        pattern = re.compile(end_marker) if end_marker else None
+        chunks = []
+        tail = ""
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(process.stdout.read(65535), remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+
+            if on_chunk:
+                if on_chunk(chunk):
+                    break
+            else:
+                chunks.append(chunk)
+
+            if pattern:
+                window = tail + chunk
+                if pattern.search(window):
+                    break
+                tail = window[-self.READ_WINDOW:]
+
+        return "".join(chunks)
+
+    async def _execute_ping_test_async(self, process, telnet_host, telnet_port, ping_destination, sw_name, options=None):
+        result = self._initialize_result(telnet_host, telnet_port, ping_destination, sw_name)
+        parser = PingStreamParser(ping_destination, sw_name)
+
+        on_chunk = self._ping_feeder(parser, lambda: process.stdin.write("\003\n"))
+
+        try:
+            with self._phase('ping', sw_name):
+                process.stdin.write(self._ping_command(ping_destination, options))
+                result['start_time'] = timezone.localtime()
+                await self._read_until_async(process, None, timeout=self._ping_timeout(options), on_chunk=on_chunk)
+
+                if not parser.complete:
+                    process.stdin.write("\003\n")
+                    await self._read_until_async(process, None, timeout=self.ABORT_READ_TIMEOUT, on_chunk=parser.feed)
+
+            if not self._apply_ping_output(result, parser):
+                result['error'] = "Ping statistics not found after aborting."
+
+        except Exception as e:
+            self._handle_test_error(result, e)
+
+        finally:
+            result['end_time'] = timezone.localtime()
+
+        return result
+
+    def _empty_result(self, scenario):
+        telnet_host, telnet_port, ping_destination, sw_name = scenario[:4]
+        result = self._initialize_result(telnet_host, telnet_port, ping_destination, sw_name)
+        result.update({
+            'start_time': timezone.localtime(),
+            'end_time': timezone.localtime(),
+            'error': "No results returned",
+        })
+        return result
@@ -0,0 +1,172 @@
+import time
+import logging
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+from pingtest.models import AlertTransition, LatestTestStatus, NetworkTestResult
+from .result_writer import BulkResultWriter
+from .simulator import JumpHostSimulator, SwitchProfile
+from .ssh_client import SSHClient
+from .test_runner import NetworkTestScheduler
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Prefixo dos test_name gerados, para apagar os resultados depois
+TEST_PREFIX = 'bench-'
+MODES = ('task', 'group', 'multiplex')
+# Fases na ordem de uma execução (relatório)
+PHASES = ('connect', 'shell_init', 'login', 'ping', 'parse', 'save')
+
+
+class BenchmarkClient(SSHClient):
+    """SSHClient without the shell warm-up: the simulator answers at once"""
+
+    SHELL_INIT_DELAY = 0
+
+
+class BenchmarkResultWriter(BulkResultWriter):
+    """
+    BulkResultWriter without the results_saved side effects: bench-* rows
+    must not reach LatestTestStatus, alert digests, the dashboard cache or
+    the live SSE stream of the real deployment.
+    """
+
+    def _notify(self, instances):
+        pass
+
+
+class BenchmarkScheduler(NetworkTestScheduler):
+    """The real task implementations, wired to the simulator and a private writer"""
+
+    def __init__(self, simulator, writer):
+        super().__init__(engine='paramiko')
+        self.ssh_client = BenchmarkClient()
+        self.ssh_client.ssh_config.update(simulator.ssh_config)
+        self.writer = writer
+
+    def _save_result(self, result):
+        self.writer.add_many(result if isinstance(result, list) else [result])
+
+
+def build_scenarios(simulator, count, per_switch=10, options=None, hung=0):
+    """``count`` 6-field scenarios, ``per_switch`` destinations per simulated switch"""
+    scenarios = []
+    for i in range(count):
+        switch = i // per_switch
+        telnet_host, telnet_port = f"10.{switch // 250}.{switch % 250}.1", 2000 + switch
+        if switch < hung:
+            simulator.add_switch(telnet_host, telnet_port, SwitchProfile(hang_after=0))
+        sw_name = simulator.switch_name(telnet_host, telnet_port)
+        scenarios.append((telnet_host, telnet_port, f"192.0.2.{i % 250 + 1}", sw_name, f"{TEST_PREFIX}{i:04d}", dict(options or {})))
+    return scenarios
+
+
+def _phase_totals(jump_host):
+    """
+    Histogram fields summed per phase from the shared metrics: the client's
+    pingtest_phase_seconds for ``jump_host`` plus the writer's flushes as 'save'.
+    """
+    metrics.flush()
+    totals = defaultdict(Counter)
+    for labels, fields in metrics.read(metrics.PHASE).items():
+        labels = dict(labels)
+        if labels.get('jump_host') == jump_host:
+            totals[labels['phase']].update(fields)
+    for fields in metrics.read(metrics.FLUSH).values():
+        totals['save'].update(fields)
+    return totals
+
+
+def _phase_summary(before, after):
+    """{phase: {count, seconds, avg, p50, p95}} for what was recorded between two _phase_totals"""
+    summary = {}
+    for phase in PHASES:
+        delta = after.get(phase, Counter()) - before.get(phase, Counter())
+        if delta['count']:
+            summary[phase] = {
+                'count': delta['count'],
+                'seconds': delta['sum_us'] / 1e6,
+                'avg': delta['sum_us'] / 1e6 / delta['count'],
+                # Limite superior do bucket do histograma
+                'p50': metrics.quantile(delta, 0.5),
+                'p95': metrics.quantile(delta, 0.95),
+            }
+    return summary
+
+
+def _in_thread(func):
+    """Worker wrapper closing the thread's DB connection, as a django-q worker would"""
+    def run(arg):
+        try:
+            return func(arg)
+        finally:
+            connection.close()
+    return run
+
+
+def run_benchmark(count, mode='multiplex', workers=8, per_switch=10, profile=None, options=None, hung=0, seed=None):
+    """
+    Run ``count`` scenarios through NetworkTestScheduler against a local
+    JumpHostSimulator and return throughput, per-phase latency and DB write rates.
+    Phase latencies come from the same histograms the client exports on /metrics.
+
+    ``mode`` picks the task path: 'task' (create_task per scenario on
+    ``workers`` threads), 'group' (create_group_task per switch) or
+    'multiplex' (one create_multiplexed_task for everything).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown benchmark mode {mode!r}, expected one of {MODES}")
+
+    with JumpHostSimulator(default=profile, seed=seed) as simulator:
+        jump_host = simulator.ssh_config['hostname']
+        writer = BenchmarkResultWriter()
+        scheduler = BenchmarkScheduler(simulator, writer)
+        scenarios = build_scenarios(simulator, count, per_switch, options, hung)
+        before = _phase_totals(jump_host)
+
+        started = time.monotonic()
+        if mode == 'multiplex':
+            results = scheduler._create_multiplexed_task_impl(scenarios)
+        else:
+            if mode == 'task':
+                func, batches = scheduler._create_task_impl, scenarios
+            else:
+                by_switch = defaultdict(list)
+                for scenario in scenarios:
+                    by_switch[scenario[:2]].append(scenario)
+                func, batches = scheduler._create_group_task_impl, list(by_switch.values())
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = []
+                for result in executor.map(_in_thread(func), batches):
+                    results.extend(result if isinstance(result, list) else [result])
+        writer.flush()
+        seconds = time.monotonic() - started
+        # Fecha as sessões telnet em cache antes do simulador parar
+        scheduler.ssh_client.sessions.clear()
+        simulator_stats = simulator.stats()
+    phases = _phase_summary(before, _phase_totals(jump_host))
+    rows = writer.stats()['results']
+    save_seconds = phases.get('save', {}).get('seconds', 0.0)
+
+    return {
+        'mode': mode,
+        'scenarios': count,
+        'seconds': seconds,
+        'scenarios_per_minute': 60.0 * count / seconds if seconds else 0.0,
+        'outcomes': dict(Counter(r['success'] for r in results if r)),
+        'errors': sum(1 for r in results if r and r.get('error')),
+        'phases': phases,
+        'db_rows': rows,
+        'db_writes_per_second': rows / save_seconds if save_seconds else 0.0,
+        'simulator': simulator_stats,
+        'pool': scheduler.ssh_client.pool_stats(),
+    }
+
+
+def delete_benchmark_results():
+    """Remove every row written by run_benchmark (status and alert rows left by older versions included)"""
+    deleted, _ = NetworkTestResult.objects.filter(test_name__startswith=TEST_PREFIX).delete()
+    LatestTestStatus.objects.filter(test_name__startswith=TEST_PREFIX).delete()
+    AlertTransition.objects.filter(test_name__startswith=TEST_PREFIX).delete()
+    return deleted
@@ -0,0 +1,139 @@
+import time
+import logging
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.utils import timezone
+from django_q.brokers.orm import ORM
+from django_q.conf import Conf
+from django_q.models import OrmQ, Task
+from django_q.monitor import save_cached, save_task
+from django_q.signing import SignedPackage
+from django_q.tasks import async_task
+
+try:
+    import redis
+except ImportError:  # Optional dependency, only needed for Q_BROKER = 'redis'
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+BROKERS = ('orm', 'redis')
+# Prefixo das tarefas de benchmark_broker, removidas no fim
+BENCH_PREFIX = 'broker-bench-'
+
+
+class QueryCounter:
+    """execute_wrapper counting statements (no 9000 entry cap like connection.queries)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _require_redis():
+    if redis is None:
+        raise ImproperlyConfigured("Q_BROKER='redis' requires the redis package")
+
+
+def redis_connection(url=None):
+    _require_redis()
+    return redis.from_url(url or settings.Q_REDIS_URL)
+
+
+def redis_queue_key():
+    """List key django-q's Redis broker uses for this cluster"""
+    return f"django_q:{Conf.CLUSTER_NAME}:q"
+
+
+def get_broker(kind, list_key=None):
+    """ORM or Redis broker regardless of Q_BROKER (Redis needs Q_CLUSTER['redis'])"""
+    list_key = list_key or Conf.CLUSTER_NAME
+    if kind == 'redis':
+        _require_redis()
+        from django_q.brokers.redis_broker import Redis
+        return Redis(list_key=list_key)
+    return ORM(list_key=list_key)
+
+
+def move_queue(target, url=None, dry_run=False):
+    """
+    Move tasks still waiting in one broker to the other (cluster stopped).
+
+    Only unclaimed tasks are moved: OrmQ rows whose lock already expired,
+    or the whole Redis list. Returns the number of tasks moved.
+    """
+    conn = redis_connection(url)
+    key = redis_queue_key()
+    if target == 'redis':
+        rows = list(OrmQ.objects.filter(key=Conf.CLUSTER_NAME, lock__lte=timezone.now()).order_by('id'))
+        if dry_run or not rows:
+            return len(rows)
+        conn.rpush(key, *[row.payload for row in rows])
+        OrmQ.objects.filter(id__in=[row.id for row in rows]).delete()
+        return len(rows)
+
+    payloads = conn.lrange(key, 0, -1)
+    if dry_run or not payloads:
+        return len(payloads)
+    with transaction.atomic():
+        OrmQ.objects.bulk_create([
+            OrmQ(key=Conf.CLUSTER_NAME, payload=payload.decode(), lock=timezone.now())
+            for payload in payloads
+        ])
+        # Remove só o que foi copiado, mesmo que algo tenha entrado na lista nesse meio-tempo
+        conn.ltrim(key, len(payloads), -1)
+    return len(payloads)
+
+
+def run_broker_benchmark(kind, count):
+    """
+    Push ``count`` tasks through a broker like a cluster would (enqueue,
+    dequeue, save the result, acknowledge) and count the queries each
+    step sends to the default database.
+
+    'orm' keeps results in the Task table, 'redis' in the cache (the
+    Q_BROKER='redis' setup); the tasks themselves do nothing.
+    """
+    broker = get_broker(kind, list_key=f"{BENCH_PREFIX}{kind}")
+    cached = settings.Q_RESULT_TTL if kind == 'redis' else False
+    broker.purge_queue()
+    report = {'broker': kind, 'tasks': count}
+
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        started = time.monotonic()
+        for i in range(count):
+            async_task('math.floor', 1.5, broker=broker, cached=cached, task_name=f"{BENCH_PREFIX}{i}")
+        report['enqueue_seconds'] = time.monotonic() - started
+        report['enqueue_queries'] = queries.count
+
+        started = time.monotonic()
+        done = 0
+        saved_keys = []
+        while done < count and time.monotonic() - started < 60 + count:
+            for ack_id, payload in broker.dequeue() or []:
+                task = SignedPackage.loads(payload)
+                task.update({'result': 1, 'success': True, 'stopped': timezone.now()})
+                if task.get('cached'):
+                    save_cached(task, broker)
+                    saved_keys.append(f"{broker.list_key}:{task['id']}")
+                else:
+                    save_task(task, broker)
+                broker.acknowledge(ack_id)
+                done += 1
+        report['process_seconds'] = time.monotonic() - started
+        report['process_queries'] = queries.count - report['enqueue_queries']
+
+    report['processed'] = done
+    seconds = report['enqueue_seconds'] + report['process_seconds']
+    report['tasks_per_second'] = done / seconds if seconds else 0.0
+    report['queries_per_task'] = queries.count / count if count else 0.0
+
+    Task.objects.filter(name__startswith=BENCH_PREFIX).delete()
+    broker.cache.delete_many(saved_keys)
+    broker.purge_queue()
+    return report
@@ -0,0 +1,191 @@
+import time
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from django_q.models import Task
+from pingtest.models import NetworkTestResult
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = 'p'
+FUTURE_PARTITION = 'pmax'
+
+
+def purge_results(cutoff, batch_size=None, pause=None, max_seconds=None):
+    """
+    Delete results with test_start < cutoff in short, independent transactions.
+
+    The id range to visit comes from result_test_start_idx; each batch is a
+    primary-key range delete committed on its own, with a pause in between
+    so the ingest writers never wait behind a long lock. A run stops after
+    ``max_seconds`` and the next one simply continues: the range is
+    recomputed from what is still there.
+    """
+    batch_size = batch_size or getattr(settings, 'CLEANUP_BATCH_SIZE', 5000)
+    pause = getattr(settings, 'CLEANUP_BATCH_PAUSE', 0.2) if pause is None else pause
+    max_seconds = max_seconds or getattr(settings, 'CLEANUP_MAX_SECONDS', 240)
+
+    expired = NetworkTestResult.objects.filter(test_start__lt=cutoff)
+    bounds = expired.aggregate(low=Min('id'), high=Max('id'))
+    stats = {'deleted': 0, 'batches': 0, 'seconds': 0.0, 'rows_per_second': 0.0, 'complete': True}
+    if bounds['low'] is None:
+        return stats
+
+    started = time.monotonic()
+    low = bounds['low']
+    while low <= bounds['high']:
+        high = low + batch_size
+        with transaction.atomic():
+            # test_start na condição: ids fora de ordem (resultados atrasados) continuam protegidos
+            deleted, _ = expired.filter(id__gte=low, id__lt=high).delete()
+        stats['deleted'] += deleted
+        stats['batches'] += 1
+        low = high
+
+        if time.monotonic() - started >= max_seconds and low <= bounds['high']:
+            stats['complete'] = False
+            logger.warning(f"Cleanup stopped at id {low} after {max_seconds}s; next run resumes from there")
+            break
+        if pause:
+            time.sleep(pause)
+
+    stats['seconds'] = round(time.monotonic() - started, 2)
+    stats['rows_per_second'] = round(stats['deleted'] / stats['seconds'], 1) if stats['seconds'] else float(stats['deleted'])
+    logger.info(
+        f"Deleted {stats['deleted']} old results in {stats['batches']} batches "
+        f"({stats['rows_per_second']} rows/s)"
+    )
+    return stats
+
+
+def purge_tasks(cutoff, batch_size=None, pause=None):
+    """
+    Delete django-q Task rows (successes and failures) stopped before ``cutoff``.
+
+    The ping tasks no longer store successes; what is left are failures and
+    the housekeeping tasks. The primary key is a uuid, so each batch deletes
+    an explicit list of ids instead of a range. Returns the number deleted.
+    """
+    batch_size = batch_size or getattr(settings, 'CLEANUP_BATCH_SIZE', 5000)
+    pause = getattr(settings, 'CLEANUP_BATCH_PAUSE', 0.2) if pause is None else pause
+
+    deleted = 0
+    while True:
+        ids = list(Task.objects.filter(stopped__lt=cutoff).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        count, _ = Task.objects.filter(id__in=ids).delete()
+        deleted += count
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    if deleted:
+        logger.info(f"Deleted {deleted} django-q task records")
+    return deleted
+
+
+def _connection():
+    return connections[router.db_for_write(NetworkTestResult)]
+
+
+def partitions():
+    """[(name, upper bound day as TO_DAYS int)] of the partitioned results table, oldest first"""
+    connection = _connection()
+    if connection.vendor != 'mysql':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION",
+            [NetworkTestResult._meta.db_table],
+        )
+        return [(name, None if bound == 'MAXVALUE' else int(bound)) for name, bound in cursor.fetchall()]
+
+
+def partition_ddl(first_day, days):
+    """
+    One-off DDL that turns the results table into daily RANGE partitions.
+
+    MySQL needs the partition column in every unique key, so the primary
+    key becomes (id, test_start); unique_test_run already contains it.
+    """
+    table = NetworkTestResult._meta.db_table
+    return [
+        f"ALTER TABLE `{table}` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `test_start`)",
+        f"ALTER TABLE `{table}` PARTITION BY RANGE (TO_DAYS(`test_start`)) ("
+        + ", ".join(_partition_clause(first_day + timedelta(days=i)) for i in range(days))
+        + f", PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE)",
+    ]
+
+
+def _partition_clause(day):
+    upper = day + timedelta(days=1)
+    return f"PARTITION {PARTITION_PREFIX}{day:%Y%m%d} VALUES LESS THAN (TO_DAYS('{upper:%Y-%m-%d}'))"
+
+
+def _partition_day(name):
+    try:
+        return datetime.strptime(name[len(PARTITION_PREFIX):], '%Y%m%d').date()
+    except ValueError:
+        return None
+
+
+def maintain_partitions(cutoff, days_ahead=None):
+    """
+    Drop daily partitions entirely older than ``cutoff`` and pre-create the
+    next ``days_ahead`` ones. Returns the dropped partition names, or None
+    when the table is not partitioned (caller falls back to purge_results).
+    """
+    days_ahead = days_ahead or getattr(settings, 'CLEANUP_PARTITIONS_AHEAD', 3)
+    existing = partitions()
+    if not existing:
+        return None
+
+    table = NetworkTestResult._meta.db_table
+    connection = _connection()
+    # Dias em UTC: é como o MySQL guarda os DATETIME com USE_TZ
+    cutoff_day = cutoff.astimezone(dt_timezone.utc).date()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT TO_DAYS(%s)", [cutoff_day])
+        cutoff_days = cursor.fetchone()[0]
+        expired = [name for name, bound in existing if bound is not None and bound <= cutoff_days]
+        if expired:
+            cursor.execute(f"ALTER TABLE `{table}` DROP PARTITION {', '.join(expired)}")
+
+        named = {name for name, _ in existing}
+        # Só dá para dividir a pmax: cria apenas os dias depois da última partição diária
+        last_day = max((_partition_day(name) for name in named if _partition_day(name)), default=None)
+        today = timezone.now().astimezone(dt_timezone.utc).date()
+        missing = [
+            today + timedelta(days=i) for i in range(days_ahead + 1)
+            if last_day is None or today + timedelta(days=i) > last_day
+        ]
+        if missing and FUTURE_PARTITION in named:
+            cursor.execute(
+                f"ALTER TABLE `{table}` REORGANIZE PARTITION {FUTURE_PARTITION} INTO ("
+                + ", ".join(_partition_clause(day) for day in missing)
+                + f", PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE)"
+            )
+    logger.info(f"Dropped partitions {expired or 'none'}, created {len(missing)} ahead")
+    return expired
+
+
+def cleanup_results(cutoff=None):
+    """Retention entry point: partition drops when CLEANUP_MODE='partition', chunked deletes, then old Task rows"""
+    cutoff = cutoff or timezone.now() - timedelta(hours=getattr(settings, 'RESULT_RETENTION_HOURS', 18))
+    stats = {'dropped_partitions': []}
+    if getattr(settings, 'CLEANUP_MODE', 'delete') == 'partition':
+        dropped = maintain_partitions(cutoff)
+        if dropped is None:
+            logger.warning("CLEANUP_MODE='partition' but the results table is not partitioned; deleting rows")
+        stats['dropped_partitions'] = dropped or []
+    # Mesmo com partições, o resto do dia parcialmente vencido sai por DELETE em lotes
+    stats.update(purge_results(cutoff))
+    task_cutoff = timezone.now() - timedelta(hours=getattr(settings, 'TASK_RETENTION_HOURS', 72))
+    stats['tasks_deleted'] = purge_tasks(task_cutoff)
+    return stats
@@ -0,0 +1,25 @@
+from pingtest.models import LatestTestStatus
+
+
+def build_cards(alerting_only=False):
+    """
+    Cards for index/falha, one per test, in a single query.
+
+    Reads the precomputed LatestTestStatus rows (kept up to date on ingest),
+    so the cost no longer grows with the number of tests or with history.
+    Each card keeps the keys the templates already use. ``alerting_only``
+    keeps the tests whose alert state is not ok (the falha page).
+    """
+    statuses = LatestTestStatus.objects.order_by('test_name')
+    if alerting_only:
+        statuses = statuses.exclude(alert_state=LatestTestStatus.AlertState.OK)
+    return [
+        {
+            'test_name': status.test_name,
+            'latest': status,
+            'latest_failure': status.latest_failure,
+            'has_failure': status.alert_state != LatestTestStatus.AlertState.OK,
+            'alert_state': status.alert_state,
+        }
+        for status in statuses
+    ]
@@ -0,0 +1,97 @@
+import csv
+import json
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+from pingtest.models import NetworkTestResult
+
+# Colunas usadas pelo histórico; rtt_samples e os campos de conexão ficam de fora
+PAGE_FIELDS = ['id', 'test_name', 'statistics', 'error_message', 'success', 'test_start', 'test_end']
+EXPORT_FIELDS = [
+    'test_name', 'sw_name', 'ping_destination', 'test_start', 'test_end', 'success',
+    'packets_sent', 'packet_loss', 'rtt_min', 'rtt_avg', 'rtt_max', 'statistics', 'error_message',
+]
+
+
+def page_size():
+    return getattr(settings, 'HISTORY_PAGE_SIZE', 30)
+
+
+def encode_cursor(result):
+    """Opaque position after ``result``: '<test_end iso>_<id>'"""
+    return f"{result.test_end.isoformat()}_{result.id}"
+
+
+def decode_cursor(cursor):
+    """(test_end, id) or None for a missing/garbled cursor (= first page)"""
+    try:
+        end, _, pk = cursor.rpartition('_')
+        return datetime.fromisoformat(end), int(pk)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def history_page(test_name, cursor=None, limit=None):
+    """
+    One page of a test's history, newest first.
+
+    Keyset pagination on (test_end, id): every page is an index range scan
+    on result_test_end_idx, so page N costs the same as page 1 regardless
+    of how much history there is. Returns (rows, next_cursor).
+    """
+    limit = limit or page_size()
+    queryset = NetworkTestResult.objects.filter(test_name=test_name)
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        end, pk = position
+        queryset = queryset.filter(Q(test_end__lt=end) | Q(test_end=end, id__lt=pk))
+
+    rows = list(queryset.order_by('-test_end', '-id').only(*PAGE_FIELDS)[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def iter_history(test_name, chunk_size=2000):
+    """
+    Full history as value tuples, newest first.
+
+    Read in keyset chunks on (test_end, id) like history_page: each chunk is
+    its own short query, so memory stays bounded on every backend and no
+    cursor is held open while the response streams.
+    """
+    queryset = NetworkTestResult.objects.filter(test_name=test_name).order_by('-test_end', '-id')
+    position = None
+    while True:
+        chunk = queryset
+        if position:
+            end, pk = position
+            chunk = chunk.filter(Q(test_end__lt=end) | Q(test_end=end, id__lt=pk))
+        rows = list(chunk.values_list('test_end', 'id', *EXPORT_FIELDS)[:chunk_size])
+        for row in rows:
+            yield row[2:]
+        if len(rows) < chunk_size:
+            return
+        position = rows[-1][:2]
+
+
+class _Echo:
+    """File-like object for csv.writer that hands each line back instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_json(rows):
+    """A JSON array written one object at a time"""
+    yield '['
+    for i, row in enumerate(rows):
+        item = json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str)
+        yield item if i == 0 else ',\n' + item
+    yield ']'
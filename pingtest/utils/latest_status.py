@@ -0,0 +1,127 @@
+import logging
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from pingtest.models import AlertTransition, LatestTestStatus, NetworkTestResult
+from . import alerts
+
+logger = logging.getLogger(__name__)
+
+SUCCESS = NetworkTestResult.escolhas_success.SEM_FALHA
+
+UPDATE_FIELDS = [
+    'sw_name', 'ping_destination', 'success', 'statistics', 'error_message',
+    'test_start', 'test_end', 'latest_failure_start', 'latest_failure_end',
+    'recent_results', 'has_recent_failure', 'alert_state', 'alert_streak', 'alert_since',
+]
+
+
+
+def apply_results(results, status_model=LatestTestStatus):
+    """
+    Fold freshly written results into LatestTestStatus.
+
+    Runs once per ingest batch with a fixed number of queries: create the
+    missing rows, lock the affected ones, merge in memory, bulk_update.
+    Alert state changes are queued as AlertTransition rows for the digest.
+    """
+    by_test = defaultdict(list)
+    for result in results:
+        if result.test_name and result.test_end:
+            by_test[result.test_name].append(result)
+    if not by_test:
+        return 0
+
+    with transaction.atomic():
+        status_model.objects.bulk_create(
+            [status_model(test_name=name) for name in by_test],
+            ignore_conflicts=True,
+        )
+        statuses = list(status_model.objects.select_for_update().filter(test_name__in=list(by_test)))
+        transitions = []
+        for status in statuses:
+            for result in sorted(by_test[status.test_name], key=lambda r: r.test_end):
+                changed = _merge_result(status, result)
+                if changed:
+                    transitions.append(AlertTransition(
+                        test_name=status.test_name, from_state=changed[0], to_state=changed[1], changed_at=result.test_end,
+                    ))
+        status_model.objects.bulk_update(statuses, UPDATE_FIELDS)
+        AlertTransition.objects.bulk_create(transitions)
+    return len(statuses)
+
+
+def _merge_result(status, result):
+    """Apply one result; returns the alert (from_state, to_state) it caused, if any"""
+    if result.success != SUCCESS and (
+        status.latest_failure_end is None or result.test_end >= status.latest_failure_end
+    ):
+        status.latest_failure_start = result.test_start
+        status.latest_failure_end = result.test_end
+
+    # Late arrivals (older than what we already show) only count for the failure above
+    if status.test_end is not None and result.test_end < status.test_end:
+        return None
+
+    changed = alerts.advance(status, result.success, result.test_end)
+    status.sw_name = result.sw_name
+    status.ping_destination = result.ping_destination
+    status.success = result.success
+    status.statistics = result.statistics
+    status.error_message = result.error_message
+    status.test_start = result.test_start
+    status.test_end = result.test_end
+
+    window = status.RECENT_WINDOW * 2
+    status.recent_results = (result.success + status.recent_results)[:window]
+    status.has_recent_failure = any(code != SUCCESS for code in status.recent_codes)
+    return changed
+
+
+def rebuild_latest_status():
+    """Recompute every LatestTestStatus row from history using window functions (manage.py rebuild_latest_status)"""
+    ranked = NetworkTestResult.objects.exclude(test_name__isnull=True).annotate(
+        rank=Window(RowNumber(), partition_by=[F('test_name')], order_by=F('test_end').desc()),
+    )
+    recent = ranked.filter(rank__lte=LatestTestStatus.RECENT_WINDOW).order_by('test_name', 'rank')
+
+    failures = NetworkTestResult.objects.exclude(test_name__isnull=True).exclude(success=SUCCESS).annotate(
+        rank=Window(RowNumber(), partition_by=[F('test_name')], order_by=F('test_end').desc()),
+    ).filter(rank=1).values('test_name', 'test_start', 'test_end')
+    latest_failures = {row['test_name']: row for row in failures}
+
+    statuses = {}
+    for result in recent.only(
+        'test_name', 'sw_name', 'ping_destination', 'success', 'statistics',
+        'error_message', 'test_start', 'test_end',
+    ):
+        status = statuses.get(result.test_name)
+        if status is None:
+            status = statuses[result.test_name] = LatestTestStatus(
+                test_name=result.test_name,
+                sw_name=result.sw_name,
+                ping_destination=result.ping_destination,
+                success=result.success,
+                statistics=result.statistics,
+                error_message=result.error_message,
+                test_start=result.test_start,
+                test_end=result.test_end,
+                recent_results='',
+            )
+            failure = latest_failures.get(result.test_name)
+            if failure:
+                status.latest_failure_start = failure['test_start']
+                status.latest_failure_end = failure['test_end']
+        status.recent_results += result.success
+        status.has_recent_failure = status.has_recent_failure or result.success != SUCCESS
+
+    for status in statuses.values():
+        # Estado de alerta refeito só a partir da janela recente, sem gerar transições
+        status.alert_state, status.alert_streak, status.alert_since = alerts.replay(status.recent_results, status.test_end)
+
+    with transaction.atomic():
+        LatestTestStatus.objects.all().delete()
+        LatestTestStatus.objects.bulk_create(statuses.values(), batch_size=500)
+    logger.info(f"Rebuilt latest status for {len(statuses)} tests")
+    return len(statuses)
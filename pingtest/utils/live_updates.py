@@ -0,0 +1,88 @@
+import json
+import asyncio
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.text import slugify
+
+logger = logging.getLogger(__name__)
+
+SEQ_KEY = 'live:seq'
+EVENT_TTL = 600
+# Clients further behind than this get a full reload instead of a diff
+MAX_EVENT_GAP = 100
+
+
+def publish_changes(test_names):
+    """Append an event with the tests that just got new results (called on ingest)"""
+    test_names = sorted(n for n in test_names if n)
+    if not test_names:
+        return None
+    cache.add(SEQ_KEY, 0, None)
+    seq = cache.incr(SEQ_KEY)
+    cache.set(f"live:event:{seq}", test_names, EVENT_TTL)
+    return seq
+
+
+def card_id(test_name):
+    return f"card-{slugify(test_name)}"
+
+
+def render_changed_cards(view, test_names):
+    """
+    HTML fragments for the cards that changed, taken from the cached payload.
+
+    A test that left the view (e.g. recovered on 'falha') is sent with empty
+    html so the browser drops its card.
+    """
+    from pingtest.utils.test_runner import CacheManager
+
+    cards = {card['test_name']: card for card in CacheManager.get_cards(view)}
+    fragments = []
+    for name in sorted(test_names):
+        card = cards.get(name)
+        html = render_to_string('partials/card.html', {'card': card}) if card else ""
+        fragments.append({'id': card_id(name), 'html': html})
+    return fragments
+
+
+async def event_stream(view, last_seq=None):
+    """
+    Server-sent events for one browser.
+
+    Every connection only polls the shared cache for new event ids; the
+    card payload itself is rebuilt once per change by CacheManager, so the
+    number of open wall displays does not add DB load.
+    """
+    poll = getattr(settings, 'LIVE_POLL_INTERVAL', 2)
+    keepalive = getattr(settings, 'LIVE_KEEPALIVE_INTERVAL', 15)
+    idle = 0
+
+    if last_seq is None:
+        last_seq = await cache.aget(SEQ_KEY) or 0
+    yield f"retry: {poll * 1000}\n\n"
+
+    while True:
+        seq = await cache.aget(SEQ_KEY) or 0
+        if seq > last_seq:
+            if seq - last_seq > MAX_EVENT_GAP:
+                yield f"id: {seq}\nevent: reload\ndata: {{}}\n\n"
+            else:
+                keys = [f"live:event:{s}" for s in range(last_seq + 1, seq + 1)]
+                events = await cache.aget_many(keys)
+                names = set()
+                for key in keys:
+                    names.update(events.get(key) or [])
+                fragments = await sync_to_async(render_changed_cards)(view, names)
+                data = json.dumps({'cards': fragments})
+                yield f"id: {seq}\nevent: cards\ndata: {data}\n\n"
+            last_seq = seq
+            idle = 0
+        else:
+            idle += poll
+            if idle >= keepalive:
+                yield ": keepalive\n\n"
+                idle = 0
+        await asyncio.sleep(poll)
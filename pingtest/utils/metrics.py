@@ -0,0 +1,235 @@
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'metrics'
+SERIES_KEY = f'{PREFIX}:series'
+# Limites superiores (segundos) dos buckets; o último bucket é o +Inf
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+PHASE = 'pingtest_phase_seconds'
+TASK = 'pingtest_task_seconds'
+FLUSH = 'pingtest_result_flush_seconds'
+VIEW = 'pingtest_view_seconds'
+RESULTS = 'pingtest_results_written_total'
+
+# nome -> (tipo, descrição) no formato de exposição do Prometheus
+METRICS = {
+    PHASE: ('histogram', 'Duration of each test phase (connect, shell_init, login, ping, parse, save) per jump host and switch'),
+    TASK: ('histogram', 'Duration of django-q tasks; rate(_sum) / pingtest_workers is the worker utilisation'),
+    FLUSH: ('histogram', 'Duration of one bulk upsert of results'),
+    VIEW: ('histogram', 'Dashboard view latency'),
+    RESULTS: ('counter', 'Results written by the bulk writer'),
+}
+
+_lock = threading.Lock()
+# (nome, labels) -> {campo: incremento ainda não enviado ao cache}
+_pending = {}
+_registered = set()
+
+
+def observe(name, seconds, **labels):
+    """Record one duration in the process-local buffer (sent to the cache by flush())"""
+    index = next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+    with _lock:
+        fields = _pending.setdefault((name, _labels(labels)), {})
+        for field, amount in ((f'b{index}', 1), ('count', 1), ('sum_us', int(seconds * 1e6))):
+            fields[field] = fields.get(field, 0) + amount
+
+
+def inc(name, amount=1, **labels):
+    with _lock:
+        fields = _pending.setdefault((name, _labels(labels)), {})
+        fields['value'] = fields.get('value', 0) + amount
+
+
+@contextmanager
+def span(name, **labels):
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - started, **labels)
+
+
+@contextmanager
+def timed_task(kind):
+    """Task duration span that also flushes everything the task recorded"""
+    try:
+        with span(TASK, kind=kind):
+            yield
+    finally:
+        flush()
+
+
+def timed_view(view):
+    """View decorator recording pingtest_view_seconds{view=...}"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            with span(VIEW, view=view.__name__):
+                return view(request, *args, **kwargs)
+        finally:
+            flush()
+    return wrapper
+
+
+def flush():
+    """Add the buffered increments to the shared cache counters (all processes add up there)"""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if not pending:
+        return
+
+    try:
+        if _registered and not cache.has_key(SERIES_KEY):
+            _registered.clear()  # cache limpo/reiniciado: registra as séries de novo
+        new = [series for series in pending if series not in _registered]
+        if new:
+            _register(new)
+        for series, fields in pending.items():
+            base = _key(series)
+            for field, amount in fields.items():
+                _incr(f"{base}:{field}", amount)
+    except Exception as e:
+        # Métrica nunca derruba teste nem view
+        logger.warning(f"Metrics flush failed: {str(e)}")
+
+
+def render(gauges=None):
+    """Every series in the Prometheus text exposition format, plus ``gauges`` {name: (help, value)}"""
+    series = sorted(cache.get(SERIES_KEY) or ())
+    keys = [f"{_key(s)}:{field}" for s in series for field in _fields(s[0])]
+    values = cache.get_many(keys)
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        matching = [s for s in series if s[0] == name]
+        if not matching:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for s in matching:
+            base, labels = _key(s), s[1]
+            if kind == 'counter':
+                lines.append(f"{name}{_format(labels)} {values.get(f'{base}:value', 0)}")
+                continue
+            cumulative = 0
+            for i, bound in enumerate(BUCKETS + ('+Inf',)):
+                cumulative += values.get(f"{base}:b{i}", 0)
+                lines.append(f"{name}_bucket{_format(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_format(labels)} {values.get(f'{base}:sum_us', 0) / 1e6}")
+            lines.append(f"{name}_count{_format(labels)} {values.get(f'{base}:count', 0)}")
+
+    for name, (help_text, value) in (gauges or {}).items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def read(name):
+    """{labels: {field: value}} for every series of ``name`` in the shared cache"""
+    series = [s for s in (cache.get(SERIES_KEY) or ()) if s[0] == name]
+    values = cache.get_many([f"{_key(s)}:{field}" for s in series for field in _fields(name)])
+    return {s[1]: {field: values.get(f"{_key(s)}:{field}", 0) for field in _fields(name)} for s in series}
+
+
+def quantile(fields, q):
+    """Upper bound (seconds) of the bucket holding the ``q`` quantile of a histogram from read(); None if empty"""
+    count = fields.get('count', 0)
+    if not count:
+        return None
+    cumulative = 0
+    for i, bound in enumerate(BUCKETS):
+        cumulative += fields.get(f'b{i}', 0)
+        if cumulative >= q * count:
+            return bound
+    return float('inf')
+
+
+def collect_gauges():
+    """Point-in-time values read at scrape: queue depth, overdue schedules, workers, dashboard cache"""
+    from django_q.brokers import get_broker
+    from django_q.models import Schedule
+    from .test_runner import CacheManager
+
+    gauges = {
+        'pingtest_queue_depth': ('Tasks waiting in the django-q broker', get_broker().queue_size()),
+        'pingtest_schedules_overdue': (
+            'Schedules past their next_run, not yet queued by the cluster',
+            Schedule.objects.filter(next_run__lt=timezone.now()).count(),
+        ),
+        'pingtest_workers': ('Configured django-q workers', settings.Q_CLUSTER.get('workers', 0)),
+    }
+    for name, value in CacheManager.stats().items():
+        gauges[f'pingtest_dashboard_cache_{name}'] = (f'Dashboard cache {name.replace("_", " ")}', value)
+    return gauges
+
+
+def reset():
+    """Drop every series (local buffer and cache)"""
+    with _lock:
+        _pending.clear()
+        _registered.clear()
+    series = cache.get(SERIES_KEY) or ()
+    cache.delete_many([f"{_key(s)}:{field}" for s in series for field in _fields(s[0])] + [SERIES_KEY])
+
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _key(series):
+    name, labels = series
+    return f"{PREFIX}:{hashlib.md5(repr((name, labels)).encode()).hexdigest()}"
+
+
+def _fields(name):
+    if METRICS[name][0] == 'counter':
+        return ['value']
+    return [f'b{i}' for i in range(len(BUCKETS) + 1)] + ['sum_us', 'count']
+
+
+def _register(new):
+    """Union ``new`` into the shared series index under a short cache lock"""
+    lock = f"{SERIES_KEY}:lock"
+    locked = False
+    for _ in range(50):
+        locked = cache.add(lock, 1, 5)
+        if locked:
+            break
+        time.sleep(0.01)
+    try:
+        series = set(cache.get(SERIES_KEY) or ())
+        series.update(new)
+        cache.set(SERIES_KEY, series, None)
+    finally:
+        if locked:
+            cache.delete(lock)
+    _registered.update(new)
+
+
+def _incr(key, amount):
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Primeira vez: add evita sobrescrever um valor criado por outro processo no meio-tempo
+        if not cache.add(key, amount, None):
+            cache.incr(key, amount)
+
+
+def _format(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
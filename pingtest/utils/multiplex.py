@@ -0,0 +1,239 @@
+import re
+import time
+import codecs
+import logging
+import selectors
+from django.conf import settings
+from django.utils import timezone
+from .ssh_client import SSHClient
+from .ping_parser import PingStreamParser
+
+logger = logging.getLogger(__name__)
+
+PING_STEP = 'ping'
+
+
+class ChannelSession:
+    """Drives one invoke_shell channel through the telnet login and a ping without blocking"""
+
+    def __init__(self, client, conn, channel, scenario):
+        telnet_host, telnet_port, ping_destination, sw_name, test_name = scenario[:5]
+        self.options = scenario[5] if len(scenario) > 5 else None
+        self.client = client
+        self.conn = conn
+        self.channel = channel
+        self.ping_destination = ping_destination
+        self.sw_name = sw_name
+        self.parser = PingStreamParser(ping_destination, sw_name)
+        self.feed_ping = client._ping_feeder(self.parser, lambda: self.channel.send("\003\n"))
+        self.result = client._initialize_result(telnet_host, telnet_port, ping_destination, sw_name)
+        self.result['test_name'] = test_name
+
+        # (command, expected pattern, timeout); a None pattern just waits the timeout out
+        self.steps = (
+            [(None, None, client.SHELL_INIT_DELAY)]
+            + client._login_steps(telnet_host, telnet_port, sw_name)
+            + [(PING_STEP, None, client._ping_timeout(self.options))]
+        )
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        self.done = False
+        self.aborted = False
+        self.phase_started = time.monotonic()
+        self._start_step(0)
+
+    @property
+    def in_ping(self):
+        return self.steps[self.step][0] == PING_STEP
+
+    def _start_step(self, index):
+        if index == 1:
+            self._end_phase('shell_init')
+        self.step = index
+        command, pattern, timeout = self.steps[index]
+        self.pattern = re.compile(pattern) if pattern else None
+        self.deadline = time.monotonic() + timeout
+        self.tail = ""
+
+        if command == PING_STEP:
+            self._end_phase('login')
+            self.channel.send(self.client._ping_command(self.ping_destination, self.options))
+            self.result['start_time'] = timezone.localtime()
+        elif command:
+            self.channel.send(command)
+
+    def feed(self, data):
+        chunk = self.decoder.decode(data)
+        if self.in_ping:
+            # The streaming parser decides when the ping is over (summary + prompt)
+            if self.feed_ping(chunk):
+                self._ping_completed()
+            return
+
+        window = self.tail + chunk
+        if self.pattern and self.pattern.search(window):
+            self._step_completed()
+        else:
+            self.tail = window[-self.client.READ_WINDOW:]
+
+    def on_timeout(self):
+        if self.in_ping:
+            if self.aborted:
+                self._ping_completed()
+            else:
+                self._abort_ping()
+        else:
+            # Same leniency as SSHClient._execute_telnet_login: move on to the next step
+            self._start_step(self.step + 1)
+
+    def _abort_ping(self):
+        self.aborted = True
+        self.channel.send("\003\n")
+        self.deadline = time.monotonic() + self.client.ABORT_READ_TIMEOUT
+        self.tail = ""
+
+    def _step_completed(self):
+        self._start_step(self.step + 1)
+
+    def _ping_completed(self):
+        if self.client._apply_ping_output(self.result, self.parser):
+            self._finish()
+        else:
+            self._finish("Ping statistics not found after aborting.")
+
+    def _end_phase(self, phase):
+        now = time.monotonic()
+        self.client._observe_phase(phase, now - self.phase_started, self.sw_name)
+        self.phase_started = now
+
+    def _finish(self, error=None):
+        if self.in_ping:
+            self._end_phase('ping')
+        if error:
+            self.result['error'] = error
+        self.result['end_time'] = timezone.localtime()
+        self.done = True
+
+    def fail(self, error):
+        self.client._handle_test_error(self.result, error)
+        self._finish()
+
+
+class MultiplexExecutor:
+    """
+    Runs many ping scenarios concurrently from one selector loop.
+
+    Every scenario gets its own invoke_shell channel, but the channels share
+    the pooled jump-host transports (up to SSH_POOL_MAX_SESSIONS each), so a
+    single worker can keep dozens of switches busy at once.
+    """
+
+    def __init__(self, ssh_client=None, max_channels=None):
+        self.client = ssh_client or SSHClient()
+        self.max_channels = max_channels or getattr(settings, 'PING_MULTIPLEX_CHANNELS', 20)
+
+    def run(self, scenarios):
+        pending = list(scenarios)
+        sessions = []
+        results = []
+        selector = selectors.DefaultSelector()
+
+        try:
+            while pending or sessions:
+                while pending and len(sessions) < self.max_channels:
+                    # Com canais abertos não bloqueia no pool: um deles vai liberar a vaga
+                    session = self._open_session(pending[0], results, wait=not sessions)
+                    if session is False:
+                        break
+                    pending.pop(0)
+                    if session:
+                        selector.register(session.channel, selectors.EVENT_READ, session)
+                        sessions.append(session)
+
+                if not sessions:
+                    continue
+
+                timeout = max(0, min(s.deadline for s in sessions) - time.monotonic())
+                for key, _ in selector.select(timeout):
+                    session = key.data
+                    # Erro em uma sessão vira resultado de erro dela; as outras seguem
+                    try:
+                        data = session.channel.recv(65535)
+                        if not data:
+                            raise ConnectionError("Channel closed by remote side")
+                        session.feed(data)
+                    except Exception as e:
+                        self._fail_session(session, e)
+
+                now = time.monotonic()
+                for session in sessions:
+                    if not session.done and now >= session.deadline:
+                        try:
+                            session.on_timeout()
+                        except Exception as e:
+                            self._fail_session(session, e)
+
+                for session in [s for s in sessions if s.done]:
+                    selector.unregister(session.channel)
+                    sessions.remove(session)
+                    self._close_session(session)
+                    results.append(session.result)
+        finally:
+            for session in sessions:
+                if not session.done:
+                    session.fail(ConnectionError("Multiplexed run interrupted"))
+                self._close_session(session)
+                results.append(session.result)
+            selector.close()
+
+        return results
+
+    def _open_session(self, scenario, results, wait=True):
+        """
+        ChannelSession for ``scenario``; None when it failed (an error result
+        is added), False when ``wait`` is off and the pool has no free lease.
+        """
+        conn = None
+        try:
+            if wait:
+                conn = self.client._acquire_connection()
+            else:
+                conn = self._try_acquire()
+                if conn is None:
+                    return False
+            channel = conn.client.invoke_shell()
+            return ChannelSession(self.client, conn, channel, scenario)
+        except Exception as e:
+            logger.error(f"Could not open channel for {scenario}: {str(e)}")
+            if conn:
+                self.client.pool.release(conn)
+            telnet_host, telnet_port, ping_destination, sw_name, test_name = scenario[:5]
+            result = self.client._initialize_result(telnet_host, telnet_port, ping_destination, sw_name)
+            result.update({
+                'test_name': test_name,
+                'start_time': timezone.localtime(),
+                'end_time': timezone.localtime(),
+                'error': str(e),
+            })
+            results.append(result)
+            return None
+
+    def _try_acquire(self):
+        """Non-blocking lease; idle cached telnet sessions give theirs up first"""
+        while True:
+            try:
+                return self.client.pool.acquire(timeout=0)
+            except TimeoutError:
+                if not self.client.sessions.evict_lru():
+                    return None
+
+    def _fail_session(self, session, error):
+        logger.error(f"Multiplexed session for {session.sw_name} -> {session.ping_destination} failed: {str(error)}")
+        session.fail(error)
+
+    def _close_session(self, session):
+        try:
+            session.channel.send("exit\n")
+            session.channel.close()
+        except Exception as e:
+            logger.debug(f"Channel cleanup warning: {str(e)}")
+        self.client.pool.release(session.conn)
@@ -0,0 +1,270 @@
+import re
+import sys
+import time
+import math
+import struct
+from array import array
+
+# Comware/VRP reply lines:
+#   Reply from 10.0.0.1: bytes=56 Sequence=1 ttl=255 time=1 ms
+#   56 bytes from 10.0.0.1: icmp_seq=0 ttl=255 time=1.000 ms
+REPLY_RE = re.compile(r'(?:icmp_seq|sequence)\s*=\s*(\d+).*?time\s*[=<]\s*(\d+\.?\d*)\s*ms', re.IGNORECASE)
+TIMEOUT_RE = re.compile(r'request\s+time\s*out', re.IGNORECASE)
+
+# "--- 10.0.0.1 ping statistics ---" (VRP / Comware V5) or "--- Ping statistics for 10.0.0.1 ---" (Comware V7)
+SUMMARY_RE = re.compile(r'-+\s*(?:\S+\s+ping statistics|ping statistics for\s+\S+)\s*-+', re.IGNORECASE)
+TRANSMITTED_RE = re.compile(r'(\d+)\s+packet\(?s?\)?\s+transmitted', re.IGNORECASE)
+RECEIVED_RE = re.compile(r'(\d+)\s+packet\(?s?\)?\s+received', re.IGNORECASE)
+LOSS_RE = re.compile(r'(\d+\.?\d*)%\s*(?:packet\s+loss|loss rate)', re.IGNORECASE)
+RTT_RE = re.compile(r'min/avg/max(?:/std-dev)?\s*=\s*(\d+\.?\d*)/(\d+\.?\d*)/(\d+\.?\d*)', re.IGNORECASE)
+
+
+class PingStreamParser:
+    """
+    Line oriented parser for streaming Comware/VRP ping output.
+
+    Per-reply lines only update running counters and are then dropped, so
+    memory stays constant for any packet count and a partial result is
+    available at any point (e.g. after a timeout).
+    """
+
+    def __init__(self, ping_destination, sw_name, record_samples=True):
+        self.ping_destination = ping_destination
+        self.prompt = f"<{sw_name}>"
+        self.received = 0
+        self.timeouts = 0
+        self.rtt_min = None
+        self.rtt_max = None
+        self.rtt_sum = 0.0
+        self.summary = []
+        self.summary_loss = None
+        self.summary_rtt = None
+        self.summary_transmitted = None
+        self.complete = False
+        self._partial = ""
+        # Tempo de CPU gasto em feed(), exposto como a fase 'parse'
+        self.parse_seconds = 0.0
+
+        # Optional per-reply series: 2 + 4 bytes per reply instead of the text line
+        self.record_samples = record_samples
+        self.sample_seqs = array('H')
+        self.sample_rtts = array('f')
+
+    def feed(self, text):
+        """Consume a decoded chunk; returns True once summary and prompt were seen"""
+        if self.complete:
+            return True
+
+        started = time.perf_counter()
+        try:
+            lines = (self._partial + text).split("\n")
+            self._partial = lines.pop()
+            for line in lines:
+                self._parse_line(line.rstrip("\r"))
+                if self.complete:
+                    return True
+
+            # The prompt after the summary is not newline terminated
+            if self.summary and self.prompt in self._partial:
+                self.complete = True
+            return self.complete
+        finally:
+            self.parse_seconds += time.perf_counter() - started
+
+    def _parse_line(self, line):
+        if self.summary:
+            if self.prompt in line:
+                self.complete = True
+                return
+            self._parse_summary_line(line)
+            return
+
+        if SUMMARY_RE.search(line):
+            self.summary.append(line.strip())
+            return
+
+        match = REPLY_RE.search(line)
+        if match:
+            self._add_reply(int(match.group(1)), float(match.group(2)))
+        elif TIMEOUT_RE.search(line):
+            self.timeouts += 1
+
+    def _parse_summary_line(self, line):
+        line = line.strip()
+        if not line:
+            return
+        self.summary.append(line)
+
+        match = TRANSMITTED_RE.search(line)
+        if match:
+            self.summary_transmitted = int(match.group(1))
+        match = LOSS_RE.search(line)
+        if match:
+            self.summary_loss = float(match.group(1))
+        match = RTT_RE.search(line)
+        if match:
+            self.summary_rtt = tuple(float(v) for v in match.groups())
+
+    def _add_reply(self, seq, rtt):
+        if self.record_samples:
+            self.sample_seqs.append(seq & 0xFFFF)
+            self.sample_rtts.append(rtt)
+        self.received += 1
+        self.rtt_sum += rtt
+        self.rtt_min = rtt if self.rtt_min is None else min(self.rtt_min, rtt)
+        self.rtt_max = rtt if self.rtt_max is None else max(self.rtt_max, rtt)
+
+    @property
+    def has_summary(self):
+        return self.summary_loss is not None
+
+    @property
+    def sent(self):
+        if self.summary_transmitted is not None:
+            return self.summary_transmitted
+        return self.received + self.timeouts
+
+    @property
+    def packet_loss(self):
+        """Loss % from the device summary, or from the counters for partial runs"""
+        if self.summary_loss is not None:
+            return self.summary_loss
+        if not self.sent:
+            return None
+        return round(100.0 * (self.sent - self.received) / self.sent, 2)
+
+    @property
+    def rtt(self):
+        """(min, avg, max) in ms, or None without replies"""
+        if self.summary_rtt is not None:
+            return self.summary_rtt
+        if not self.received:
+            return None
+        return (self.rtt_min, round(self.rtt_sum / self.received, 3), self.rtt_max)
+
+    def packed_samples(self):
+        """Reply series packed with pack_samples(), or None if nothing was recorded"""
+        if not self.record_samples or not self.sample_seqs:
+            return None
+        return pack_samples(self.sample_seqs, self.sample_rtts)
+
+    def statistics_text(self):
+        if self.summary:
+            return "\n".join(self.summary)
+
+        text = (
+            f"--- {self.ping_destination} ping statistics (partial) ---\n"
+            f"{self.sent} packet(s) transmitted\n"
+            f"{self.received} packet(s) received\n"
+            f"{self.packet_loss:.2f}% packet loss"
+        )
+        rtt = self.rtt
+        if rtt:
+            text += f"\nround-trip min/avg/max = {rtt[0]}/{rtt[1]}/{rtt[2]} ms"
+        return text
+
+
+class AdaptivePingPolicy:
+    """
+    Early-abort rule for long pings.
+
+    After ``sample`` packets a run with 0% or 100% loss is already decided,
+    so it can be stopped with Ctrl-C; any partial loss escalates to the full
+    packet count so intermittent problems are still measured properly.
+    """
+
+    def __init__(self, sample):
+        self.sample = sample
+        self.decided = False
+
+    def should_abort(self, parser):
+        """True exactly once, when the run should be cut short"""
+        if self.decided or parser.has_summary or parser.sent < self.sample:
+            return False
+        self.decided = True
+        return parser.received in (0, parser.sent)
+
+
+def classify_loss(packet_loss):
+    """Map a loss percentage onto NetworkTestResult.success codes"""
+    if packet_loss is None or math.isnan(packet_loss):
+        return 'FT'
+    if packet_loss == 0.0:
+        return 'SF'
+    elif packet_loss == 100.0:
+        return 'FT'
+    return 'FP'
+
+
+def pack_samples(seqs, rtts):
+    """
+    Pack a reply series as <uint32 count><uint16 seq * n><float32 rtt_ms * n>.
+
+    Lost packets are the sequence numbers missing from the series.
+    """
+    seqs = array('H', seqs)
+    rtts = array('f', rtts)
+    if len(seqs) != len(rtts):
+        raise ValueError("seqs and rtts must have the same length")
+    if sys.byteorder != 'little':
+        seqs.byteswap()
+        rtts.byteswap()
+    return struct.pack('<I', len(seqs)) + seqs.tobytes() + rtts.tobytes()
+
+
+def unpack_samples(blob):
+    """Inverse of pack_samples(): returns (seqs, rtts) arrays"""
+    blob = bytes(blob)
+    (count,) = struct.unpack_from('<I', blob)
+    seqs = array('H')
+    rtts = array('f')
+    seqs.frombytes(blob[4:4 + 2 * count])
+    rtts.frombytes(blob[4 + 2 * count:4 + 6 * count])
+    if sys.byteorder != 'little':
+        seqs.byteswap()
+        rtts.byteswap()
+    return seqs, rtts
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = (len(sorted_values) - 1) * pct / 100.0
+    lower = math.floor(index)
+    upper = math.ceil(index)
+    if lower == upper:
+        return sorted_values[lower]
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (index - lower)
+
+
+def analyze_samples(blob, sent=None):
+    """Jitter, RTT percentiles and loss bursts from a packed reply series"""
+    seqs, rtts = unpack_samples(blob)
+    ordered = sorted(zip(seqs, rtts))
+    values = [rtt for _, rtt in ordered]
+
+    # Mean absolute difference between consecutive replies (RFC 3550 style jitter)
+    diffs = [abs(b - a) for a, b in zip(values, values[1:])]
+    jitter = sum(diffs) / len(diffs) if diffs else 0.0
+
+    # Sequence numbers start at 0 (Comware V7) or 1 (VRP / Comware V5)
+    base = 0 if ordered and ordered[0][0] == 0 else 1
+    bursts = []
+    expected = base
+    for seq, _ in ordered:
+        if seq > expected:
+            bursts.append(seq - expected)
+        expected = seq + 1
+    if sent is not None and expected < base + sent:
+        bursts.append(base + sent - expected)
+
+    ranked = sorted(values)
+    return {
+        'replies': len(values),
+        'jitter': round(jitter, 3),
+        'p50': percentile(ranked, 50),
+        'p95': percentile(ranked, 95),
+        'p99': percentile(ranked, 99),
+        'loss_bursts': len(bursts),
+        'max_loss_burst': max(bursts) if bursts else 0,
+    }
@@ -0,0 +1,219 @@
+import logging
+import math
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import zip_longest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Referência fixa das fases: o mesmo offset cai no mesmo ponto do ciclo em qualquer dia
+EPOCH = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+# Resolução máxima da linha do tempo usada para afastar execuções (um ciclo de 7 min dá bins de 1 s)
+TIMELINE_BINS = 720
+
+
+def plan_offsets(items, interval, durations=None, host_budget=0, switch_budget=0, busy=None):
+    """
+    Evenly spaced start offsets (seconds into ``interval``) for ``items``.
+
+    ``items`` is a list of (key, switch). Keys are interleaved round-robin
+    by switch before being laid on the slots, so runs against the same
+    switch land as far apart as possible. Adding or removing a scenario
+    re-spreads everything, keeping the gap between starts constant.
+
+    With ``durations`` and a jump-host or per-switch budget, an even plan
+    that would exceed a budget is pushed apart: each key keeps its slot
+    if it fits there and otherwise moves to the offset with the least
+    overflow. ``busy`` is the (host, {switch: runs}) peak already taken
+    by other intervals.
+    """
+    by_switch = defaultdict(list)
+    for key, switch in sorted(items, key=lambda item: str(item[0])):
+        by_switch[switch].append(key)
+    # Switches com mais cenários primeiro: eles precisam do maior espaçamento
+    groups = sorted(by_switch.values(), key=len, reverse=True)
+    order = [key for row in zip_longest(*groups) for key in row if key is not None]
+
+    step = interval / len(order) if order else interval
+    even = {key: round(i * step, 3) for i, key in enumerate(order)}
+    switches = dict(items)
+    budgets = (host_budget, switch_budget, busy)
+    if durations is None or not overflow(even, switches, durations, interval, *budgets):
+        return even
+
+    timeline = _Timeline(interval, durations, *budgets)
+    pushed = {key: timeline.place(key, switches[key], even[key]) for key in order}
+    if overflow(pushed, switches, durations, interval, *budgets) < overflow(even, switches, durations, interval, *budgets):
+        return pushed
+    return even
+
+
+def fill_offsets(offsets, pending, switches, interval, durations=None, host_budget=0, switch_budget=0, busy=None):
+    """
+    Offsets for the ``pending`` keys added one by one next to the fixed
+    ``offsets``: the middle of the largest free gap, or the offset with
+    the least overflow when the gap would exceed a budget.
+    """
+    timeline = _Timeline(interval, durations or {}, host_budget, switch_budget, busy)
+    for key, offset in offsets.items():
+        timeline.add(key, switches[key], offset)
+    placed = dict(offsets)
+    for key in pending:
+        preferred = gap_offset(placed.values(), interval)
+        placed[key] = timeline.place(key, switches[key], preferred) if durations else preferred
+    return {key: placed[key] for key in pending}
+
+
+def gap_offset(offsets, interval):
+    """Middle of the largest free gap between ``offsets`` in the repeating ``interval``"""
+    points = sorted(offset % interval for offset in offsets)
+    if not points:
+        return 0.0
+    gaps = [end - start for start, end in zip(points, points[1:] + [points[0] + interval])]
+    widest = max(range(len(gaps)), key=gaps.__getitem__)
+    return round((points[widest] + gaps[widest] / 2) % interval, 3)
+
+
+def next_run_at(offset, interval, now=None):
+    """First datetime after ``now`` whose phase in the repeating ``interval`` is ``offset``"""
+    now = now or timezone.now()
+    cycle = int((now - EPOCH).total_seconds() // interval)
+    run = EPOCH + timedelta(seconds=cycle * interval + offset)
+    return run if run > now else run + timedelta(seconds=interval)
+
+
+def phase(moment, interval):
+    """Offset of ``moment`` inside its ``interval`` cycle (inverse of next_run_at)"""
+    return (moment - EPOCH).total_seconds() % interval
+
+
+def peak_concurrency(offsets, durations, interval):
+    """
+    Highest number of runs in flight at once when each key starts at its
+    offset every ``interval`` seconds and lasts ``durations[key]`` seconds.
+    """
+    events = []
+    for key, offset in offsets.items():
+        duration = min(durations.get(key, interval), interval)
+        end = offset + duration
+        events += [(offset, 1), (min(end, interval), -1)]
+        if end > interval:  # a execução passa para o ciclo seguinte
+            events += [(0, 1), (end - interval, -1)]
+    peak = running = 0
+    for _, delta in sorted(events, key=lambda e: (e[0], e[1])):
+        running += delta
+        peak = max(peak, running)
+    return peak
+
+
+def peaks(offsets, switches, durations, interval):
+    """(jump-host peak, Counter of per-switch peaks) of one interval's offsets"""
+    by_switch = defaultdict(dict)
+    for key, offset in offsets.items():
+        by_switch[switches[key]][key] = offset
+    return peak_concurrency(offsets, durations, interval), Counter({
+        switch: peak_concurrency(switch_offsets, durations, interval) for switch, switch_offsets in by_switch.items()
+    })
+
+
+def overflow(offsets, switches, durations, interval, host_budget=0, switch_budget=0, busy=None):
+    """Concurrent runs above the jump-host budget plus above each switch budget (0 = the plan fits)"""
+    host_busy, switch_busy = busy or (0, Counter())
+    host_peak, switch_peaks = peaks(offsets, switches, durations, interval)
+    excess = max(0, host_busy + host_peak - host_budget) if host_budget else 0
+    if switch_budget:
+        excess += sum(max(0, switch_busy[switch] + peak - switch_budget) for switch, peak in switch_peaks.items())
+    return excess
+
+
+def check_budgets(plans, switches, durations, host_budget, switch_budget):
+    """
+    Warn when the plan would exceed the jump-host or a per-switch concurrency budget.
+
+    ``plans`` is a list of (offsets, interval), one per scenario interval;
+    peaks of different intervals are added up, which is the worst case.
+    plan_offsets/fill_offsets already push runs apart, so a warning means
+    no placement they found fits.
+    """
+    warnings = []
+    peak = 0
+    switch_peaks = Counter()
+    for offsets, interval in plans:
+        host_peak, interval_peaks = peaks(offsets, switches, durations, interval)
+        peak += host_peak
+        switch_peaks += interval_peaks
+
+    if host_budget and peak > host_budget:
+        warnings.append(f"jump host: {peak} concurrent runs > budget {host_budget}")
+    for switch, switch_peak in sorted(switch_peaks.items()):
+        if switch_budget and switch_peak > switch_budget:
+            warnings.append(f"{switch}: {switch_peak} concurrent runs > budget {switch_budget}")
+
+    for warning in warnings:
+        logger.warning(f"Schedule over budget, {warning}")
+    return peak, warnings
+
+
+class _Timeline:
+    """Runs in flight per time bin of one interval, for the jump host and for each switch"""
+
+    def __init__(self, interval, durations, host_budget=0, switch_budget=0, busy=None):
+        self.interval = interval
+        self.durations = durations
+        self.bins = max(1, min(int(interval), TIMELINE_BINS))
+        self.width = interval / self.bins
+        self.host = [0] * self.bins
+        self.switches = defaultdict(lambda: [0] * self.bins)
+        host_busy, self.switch_busy = busy or (0, Counter())
+        self.host_limit = host_budget - host_busy if host_budget else None
+        self.switch_budget = switch_budget
+
+    def _span(self, key):
+        duration = min(self.durations.get(key, self.interval), self.interval)
+        return min(self.bins, max(1, math.ceil(duration / self.width)))
+
+    def add(self, key, switch, offset):
+        self._fill(int(offset / self.width) % self.bins, self._span(key), switch)
+
+    def _fill(self, start, span, switch):
+        for i in range(start, start + span):
+            self.host[i % self.bins] += 1
+            self.switches[switch][i % self.bins] += 1
+
+    def place(self, key, switch, preferred):
+        """``preferred`` if ``key`` fits the budgets there, else the start with the least overflow (then load, then distance)"""
+        span = self._span(key)
+        host_peak = _window_max(self.host, span)
+        switch_peak = _window_max(self.switches[switch], span)
+        switch_limit = self.switch_budget - self.switch_busy[switch] if self.switch_budget else None
+
+        def excess(b):
+            over = max(0, host_peak[b] + 1 - self.host_limit) if self.host_limit is not None else 0
+            return over + (max(0, switch_peak[b] + 1 - switch_limit) if switch_limit is not None else 0)
+
+        def cost(b):
+            return excess(b), host_peak[b] + switch_peak[b], min((b - start) % self.bins, (start - b) % self.bins)
+
+        start = int(preferred / self.width) % self.bins
+        if excess(start):
+            start = min(range(self.bins), key=cost)
+            preferred = round(start * self.width, 3)
+        self._fill(start, span, switch)
+        return preferred
+
+
+def _window_max(load, span):
+    """Highest value of every cyclic window of ``span`` bins, indexed by the window start"""
+    values = load + load
+    peaks, window = [0] * len(load), deque()
+    for i in range(len(load) + span - 1):
+        while window and values[window[-1]] <= values[i]:
+            window.pop()
+        window.append(i)
+        start = i - span + 1
+        if start >= 0:
+            while window[0] < start:
+                window.popleft()
+            peaks[start] = values[window[0]]
+    return peaks
@@ -0,0 +1,188 @@
+import time
+import logging
+import threading
+from multiprocessing import util as mp_util
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from pingtest.models import NetworkTestResult
+from pingtest.signals import results_saved
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Natural key of a run, backed by the unique_test_run constraint
+UNIQUE_FIELDS = ['telnet_host', 'telnet_port', 'ping_destination', 'sw_name', 'test_name', 'test_start']
+UPDATE_FIELDS = [
+    'test_end', 'statistics', 'success', 'error_message',
+    'packets_sent', 'packet_loss', 'rtt_min', 'rtt_avg', 'rtt_max', 'rtt_samples',
+]
+
+
+class BulkResultWriter:
+    """
+    Buffers result dicts and writes them with one bulk upsert per batch.
+
+    A batch is flushed when it reaches ``batch_size`` results or when the
+    oldest buffered result is ``max_delay`` seconds old (checked by a
+    daemon thread), and once more when the worker process exits.
+    """
+
+    def __init__(self, batch_size=None, max_delay=None):
+        self.batch_size = batch_size or getattr(settings, 'RESULT_BATCH_SIZE', 50)
+        self.max_delay = max_delay or getattr(settings, 'RESULT_FLUSH_INTERVAL', 5)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer = []
+        self._oldest = None
+        self._thread = None
+        self._stats = {'results': 0, 'flushes': 0, 'errors': 0, 'dropped': 0}
+
+    def add(self, result):
+        if not isinstance(result, dict):
+            logger.error(f"Invalid result type: {type(result)}")
+            return
+
+        with self._lock:
+            self._buffer.append(result)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._buffer) >= self.batch_size
+        self._ensure_thread()
+
+        if full:
+            self.flush()
+
+    def add_many(self, results):
+        for result in results:
+            self.add(result)
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+                self._oldest = None
+            if not batch:
+                return 0
+
+            try:
+                close_old_connections()
+                # Last write wins for repeated runs (an upsert can't touch a row twice per statement)
+                unique = {}
+                for instance in map(self._to_instance, batch):
+                    unique[tuple(getattr(instance, f) for f in UNIQUE_FIELDS)] = instance
+                instances = list(unique.values())
+                try:
+                    with metrics.span(metrics.FLUSH), transaction.atomic():
+                        NetworkTestResult.objects.bulk_create(instances, batch_size=self.batch_size, **self._upsert_options())
+                    written = instances
+                except Exception as e:
+                    # Uma linha ruim não pode descartar o lote inteiro
+                    logger.warning(f"Bulk write of {len(instances)} results failed ({str(e)}); retrying row by row")
+                    written = self._write_rows(instances)
+                if written:
+                    metrics.inc(metrics.RESULTS, len(written))
+                    self._notify(written)
+                self._stats['results'] += len(written)
+                self._stats['flushes'] += 1
+                logger.debug(f"Flushed {len(written)} results in one batch")
+                return len(written)
+            except Exception as e:
+                self._stats['errors'] += 1
+                logger.error(f"DB Save Error: {str(e)}", exc_info=True)
+                return 0
+            finally:
+                close_old_connections()
+
+    def _write_rows(self, instances):
+        """Upsert one row per transaction; rows that still fail are logged and counted as dropped"""
+        options = self._upsert_options()
+        written = []
+        for instance in instances:
+            try:
+                with transaction.atomic():
+                    NetworkTestResult.objects.bulk_create([instance], **options)
+                written.append(instance)
+            except Exception as e:
+                self._stats['errors'] += 1
+                self._stats['dropped'] += 1
+                logger.error(
+                    f"Dropped result {instance.test_name} ({instance.sw_name} -> {instance.ping_destination}, "
+                    f"start {instance.test_start}): {str(e)}"
+                )
+        return written
+
+    def _notify(self, instances):
+        """Fire results_saved; receiver errors are logged, the rows are already committed"""
+        responses = results_saved.send_robust(sender=self.__class__, results=instances)
+        for receiver, response in responses:
+            if isinstance(response, Exception):
+                logger.error(f"results_saved receiver {receiver.__name__} failed: {response}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['buffered'] = len(self._buffer)
+        return stats
+
+    def _upsert_options(self):
+        """ON CONFLICT/ON DUPLICATE KEY update where the backend supports it"""
+        features = connections[router.db_for_write(NetworkTestResult)].features
+        if not features.supports_update_conflicts:
+            return {}
+        options = {'update_conflicts': True, 'update_fields': UPDATE_FIELDS}
+        if features.supports_update_conflicts_with_target:
+            options['unique_fields'] = UNIQUE_FIELDS
+        return options
+
+    def _to_instance(self, result):
+        return NetworkTestResult(
+            telnet_host=result.get('telnet_host'),
+            telnet_port=result.get('telnet_port'),
+            ping_destination=result.get('ping_destination'),
+            test_name=result.get('test_name'),
+            sw_name=result.get('sw_name'),
+            test_start=result.get('start_time'),
+            test_end=result.get('end_time'),
+            statistics=str(result.get('statistics', ''))[:500],
+            success=result.get('success', 'FT'),
+            error_message=str(result.get('error', ''))[:2000],
+            packets_sent=result.get('packets_sent'),
+            packet_loss=result.get('packet_loss'),
+            rtt_min=result.get('rtt_min'),
+            rtt_avg=result.get('rtt_avg'),
+            rtt_max=result.get('rtt_max'),
+            rtt_samples=result.get('rtt_samples'),
+        )
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.max_delay / 2)
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay
+            if due:
+                self.flush()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_result_writer():
+    """Process-wide writer; flushed on worker exit via multiprocessing finalizers"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BulkResultWriter()
+            # Runs both for django-q worker processes and on interpreter exit
+            mp_util.Finalize(_writer, _writer.flush, exitpriority=10)
+        return _writer
@@ -0,0 +1,163 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from pingtest.models import NetworkTestResult, TestRollup
+
+logger = logging.getLogger(__name__)
+
+Resolution = TestRollup.Resolution
+Status = NetworkTestResult.escolhas_success
+
+# Unidade do Trunc e duração de cada janela
+TIERS = {
+    Resolution.MINUTE: ('minute', timedelta(minutes=1)),
+    Resolution.HOUR: ('hour', timedelta(hours=1)),
+    Resolution.DAY: ('day', timedelta(days=1)),
+}
+# Dias mantidos por janela quando ROLLUP_RETENTION_DAYS não define
+DEFAULT_RETENTION_DAYS = {Resolution.MINUTE: 2, Resolution.HOUR: 90, Resolution.DAY: 730}
+COUNT_FIELDS = ['run_count', 'sf_count', 'fp_count', 'ft_count', 'loss_sum', 'loss_runs', 'rtt_sum', 'rtt_runs']
+UPDATE_FIELDS = COUNT_FIELDS + ['rtt_min', 'rtt_max']
+
+
+def retention(resolution):
+    days = getattr(settings, 'ROLLUP_RETENTION_DAYS', {}).get(resolution, DEFAULT_RETENTION_DAYS[resolution])
+    return timedelta(days=days)
+
+
+def _raw_aggregates():
+    """1m buckets straight from NetworkTestResult"""
+    return {
+        'run_count': Count('id'),
+        'sf_count': Count('id', filter=Q(success=Status.SEM_FALHA)),
+        'fp_count': Count('id', filter=Q(success=Status.FALHA_PARCIAL)),
+        'ft_count': Count('id', filter=Q(success=Status.FALHA_TOTAL)),
+        'loss_sum': Sum('packet_loss'),
+        'loss_runs': Count('packet_loss'),
+        'rtt_min': Min('rtt_min'),
+        'rtt_max': Max('rtt_max'),
+        'rtt_sum': Sum('rtt_avg'),
+        'rtt_runs': Count('rtt_avg'),
+    }
+
+
+def _rollup_aggregates():
+    """Coarser buckets re-aggregated from the tier below"""
+    aggregates = {field: Sum(field) for field in COUNT_FIELDS}
+    aggregates.update(rtt_min=Min('rtt_min'), rtt_max=Max('rtt_max'))
+    return aggregates
+
+
+def _tier_source(resolution, since):
+    """(queryset, time field, aggregates) each tier is built from"""
+    if resolution == Resolution.MINUTE:
+        queryset = NetworkTestResult.objects.filter(test_start__gte=since).exclude(test_name__isnull=True)
+        return queryset, 'test_start', _raw_aggregates()
+    source = Resolution.MINUTE if resolution == Resolution.HOUR else Resolution.HOUR
+    queryset = TestRollup.objects.filter(resolution=source, bucket_start__gte=since)
+    return queryset, 'bucket_start', _rollup_aggregates()
+
+
+def build_tier(resolution, since):
+    """
+    Recompute every ``resolution`` bucket starting at or after ``since``.
+
+    ``since`` is floored to the bucket size so only whole buckets are
+    rebuilt; they are written with one upsert, which makes reruns and
+    late-arriving results harmless.
+    """
+    unit, _ = TIERS[resolution]
+    since = _floor(since, unit)
+    queryset, field, aggregates = _tier_source(resolution, since)
+    rows = queryset.annotate(bucket=Trunc(field, unit)).values('test_name', 'bucket').annotate(**aggregates)
+
+    rollups = [
+        TestRollup(
+            test_name=row['test_name'],
+            resolution=resolution,
+            bucket_start=row['bucket'],
+            **{name: row[name] or 0 for name in COUNT_FIELDS},
+            rtt_min=row['rtt_min'],
+            rtt_max=row['rtt_max'],
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        TestRollup.objects.bulk_create(rollups, batch_size=500, **_upsert_options())
+    return len(rollups)
+
+
+def run_rollups(now=None, lookback_hours=None):
+    """
+    Build 1m from raw results, 1h from 1m and 1d from 1h, then prune each tier.
+
+    Every run recomputes the last ROLLUP_LOOKBACK_HOURS, which must stay
+    shorter than the raw retention so no bucket is rebuilt from partial data
+    (pass a larger ``lookback_hours`` once to backfill the raw table).
+    """
+    now = now or timezone.now()
+    lookback_hours = lookback_hours or getattr(settings, 'ROLLUP_LOOKBACK_HOURS', 3)
+    since = now - timedelta(hours=lookback_hours)
+    built = {resolution: build_tier(resolution, since) for resolution in TIERS}
+
+    pruned = {}
+    for resolution in TIERS:
+        pruned[resolution], _ = TestRollup.objects.filter(
+            resolution=resolution, bucket_start__lt=now - retention(resolution),
+        ).delete()
+    logger.info(f"Rollups built {built}, pruned {pruned}")
+    return built
+
+
+def availability(test_name, start, end=None, resolution=None):
+    """
+    SLA numbers for ``test_name`` between ``start`` and ``end`` read from rollups.
+
+    Picks the finest tier still retained for ``start`` unless ``resolution``
+    is given. Returns None when there is no data in the range.
+    """
+    end = end or timezone.now()
+    if resolution is None:
+        age = timezone.now() - start
+        resolution = next((r for r in TIERS if age <= retention(r)), Resolution.DAY)
+
+    totals = TestRollup.objects.filter(
+        test_name=test_name, resolution=resolution, bucket_start__gte=start, bucket_start__lt=end,
+    ).aggregate(**_rollup_aggregates())
+    if not totals['run_count']:
+        return None
+    return {
+        'resolution': resolution,
+        'runs': totals['run_count'],
+        'sf': totals['sf_count'],
+        'fp': totals['fp_count'],
+        'ft': totals['ft_count'],
+        'availability': 100.0 * totals['sf_count'] / totals['run_count'],
+        'packet_loss': totals['loss_sum'] / totals['loss_runs'] if totals['loss_runs'] else None,
+        'rtt_min': totals['rtt_min'],
+        'rtt_avg': totals['rtt_sum'] / totals['rtt_runs'] if totals['rtt_runs'] else None,
+        'rtt_max': totals['rtt_max'],
+    }
+
+
+def _floor(moment, unit):
+    moment = timezone.localtime(moment).replace(second=0, microsecond=0)
+    if unit in ('hour', 'day'):
+        moment = moment.replace(minute=0)
+    if unit == 'day':
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def _upsert_options():
+    features = connections[router.db_for_write(TestRollup)].features
+    if not features.supports_update_conflicts:
+        return {}
+    options = {'update_conflicts': True, 'update_fields': UPDATE_FIELDS}
+    if features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['test_name', 'resolution', 'bucket_start']
+    return options
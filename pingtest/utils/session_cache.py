@@ -0,0 +1,124 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TelnetSession:
+    """A logged-in switch CLI: the pooled connection lease plus its shell channel"""
+
+    def __init__(self, key, conn, channel, pool=None):
+        self.key = key
+        self.conn = conn
+        # Pool the lease came from; the cache is process-wide, the pools are per jump host
+        self.pool = pool
+        self.channel = channel
+        self.last_used = time.monotonic()
+
+
+class TelnetSessionCache:
+    """
+    Per-process LRU/TTL cache of logged-in telnet sessions.
+
+    Keyed by (telnet_host, telnet_port, sw_name). A session is checked out
+    for exclusive use during a run and checked back in afterwards; anything
+    idle longer than ``ttl`` or beyond ``max_sessions`` is closed.
+    """
+
+    def __init__(self, close_session, max_sessions=None, ttl=None):
+        self._close_session = close_session
+        self.max_sessions = max_sessions if max_sessions is not None else getattr(settings, 'TELNET_SESSION_MAX', 8)
+        self.ttl = ttl if ttl is not None else getattr(settings, 'TELNET_SESSION_TTL', 600)
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0, 'dead': 0}
+
+    @property
+    def enabled(self):
+        return self.max_sessions > 0
+
+    def checkout(self, key):
+        to_close = []
+        with self._lock:
+            to_close.extend(self._expire_locked())
+            session = self._sessions.pop(key, None)
+            self._stats['hits' if session else 'misses'] += 1
+        self._close_all(to_close)
+        return session
+
+    def checkin(self, session):
+        if not self.enabled:
+            self._close_session(session)
+            return
+
+        to_close = []
+        with self._lock:
+            session.last_used = time.monotonic()
+            previous = self._sessions.pop(session.key, None)
+            if previous:
+                to_close.append(previous)
+            self._sessions[session.key] = session
+            to_close.extend(self._expire_locked())
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self._stats['evicted'] += 1
+                to_close.append(evicted)
+        self._close_all(to_close)
+
+    def discard(self, session):
+        """Close a session that failed its probe or a run"""
+        with self._lock:
+            self._stats['dead'] += 1
+        self._close_session(session)
+
+    def evict_lru(self):
+        """Close the least recently used session to free its pool lease; False if empty"""
+        with self._lock:
+            if not self._sessions:
+                return False
+            _, session = self._sessions.popitem(last=False)
+            self._stats['evicted'] += 1
+        self._close_session(session)
+        return True
+
+    def clear(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        self._close_all(sessions)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached'] = len(self._sessions)
+        return stats
+
+    def _expire_locked(self):
+        now = time.monotonic()
+        expired = [k for k, s in self._sessions.items() if now - s.last_used > self.ttl]
+        for key in expired:
+            self._stats['expired'] += 1
+        return [self._sessions.pop(key) for key in expired]
+
+    def _close_all(self, sessions):
+        for session in sessions:
+            try:
+                self._close_session(session)
+            except Exception as e:
+                logger.debug(f"Session close warning: {str(e)}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_session_cache(close_session):
+    """Return the process-wide telnet session cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TelnetSessionCache(close_session)
+        return _cache
@@ -0,0 +1,308 @@
+import re
+import random
+import socket
+import logging
+import threading
+import time
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+JUMP_PROMPT = "[jump]$ "
+PING_RE = re.compile(r'^ping\s+(?P<args>.*?)\s*(?P<dest>\S+)$')
+# Linhas da saída de ping enviadas juntas quando não há atraso entre respostas
+SEND_BATCH = 64
+
+_host_key = None
+_host_key_lock = threading.Lock()
+
+
+def host_key():
+    """RSA key shared by every simulator in the process (generating one is slow)"""
+    global _host_key
+    with _host_key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        return _host_key
+
+
+class SwitchProfile:
+    """
+    How a simulated switch answers a ping.
+
+    ``loss`` is the probability of a lost packet, or ``loss_pattern`` a
+    string repeated over the sequence numbers ('!' reply, '.' lost).
+    ``rtt`` is the mean RTT in ms (or a callable taking a random.Random),
+    with ``jitter`` as the standard deviation. ``reply_delay`` is the
+    pause between packets, ``login_delay`` the time before the telnet
+    banner and ``hang_after`` the packet after which the session stops
+    answering altogether, Ctrl-C included.
+    """
+
+    def __init__(self, name=None, loss=0.0, loss_pattern=None, rtt=1.0, jitter=0.0,
+                 reply_delay=0.0, login_delay=0.0, hang_after=None):
+        self.name = name
+        self.loss = loss
+        self.loss_pattern = loss_pattern
+        self.rtt = rtt
+        self.jitter = jitter
+        self.reply_delay = reply_delay
+        self.login_delay = login_delay
+        self.hang_after = hang_after
+
+    def is_lost(self, seq, rng):
+        if self.loss_pattern:
+            return self.loss_pattern[(seq - 1) % len(self.loss_pattern)] == '.'
+        return rng.random() < self.loss
+
+    def sample_rtt(self, rng):
+        if callable(self.rtt):
+            return max(1, round(self.rtt(rng)))
+        return max(1, round(rng.gauss(self.rtt, self.jitter) if self.jitter else self.rtt))
+
+
+class _JumpHostInterface(paramiko.ServerInterface):
+    """Accepts any password and starts a shell thread per session channel"""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        threading.Thread(target=_Shell(self.simulator, channel).run, daemon=True).start()
+        return True
+
+
+class JumpHostSimulator:
+    """
+    In-process SSH server standing in for the jump host and its switches.
+
+    The shell understands ``telnet <host> <port>``, logs in with any
+    credentials and drops into a VRP-like CLI with a ``<sw_name>`` prompt
+    whose ping output follows the SwitchProfile registered for that
+    (host, port), or ``default``. Point an SSHClient at it through
+    ``client.ssh_config.update(simulator.ssh_config)``.
+    """
+
+    def __init__(self, profiles=None, default=None, seed=None):
+        self.profiles = dict(profiles or {})
+        self.default = default or SwitchProfile()
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._socket = None
+        self._transports = []
+        self._stats = {'connections': 0, 'sessions': 0, 'logins': 0, 'pings': 0, 'packets': 0, 'aborts': 0}
+
+    def add_switch(self, telnet_host, telnet_port, profile):
+        self.profiles[(str(telnet_host), int(telnet_port))] = profile
+
+    def profile(self, telnet_host, telnet_port):
+        return self.profiles.get((str(telnet_host), int(telnet_port)), self.default)
+
+    def switch_name(self, telnet_host, telnet_port):
+        return self.profile(telnet_host, telnet_port).name or f"SW-{telnet_port}"
+
+    @property
+    def ssh_config(self):
+        host, port = self._socket.getsockname()
+        return {'hostname': host, 'port': port, 'username': 'bench', 'password': 'bench', 'timeout': 10}
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(('127.0.0.1', 0))
+        self._socket.listen(128)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._socket:
+            self._socket.close()
+        with self._lock:
+            transports, self._transports = self._transports, []
+        for transport in transports:
+            transport.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _accept_loop(self):
+        while True:
+            try:
+                sock, _ = self._socket.accept()
+            except OSError:
+                return  # socket fechado por stop()
+            try:
+                # Sem Nagle: cada ida e volta do SSH custaria ~40ms de delayed ACK no loopback
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                transport = paramiko.Transport(sock)
+                transport.add_server_key(host_key())
+                transport.start_server(server=_JumpHostInterface(self))
+            except Exception as e:
+                logger.debug(f"Simulator handshake failed: {str(e)}")
+                sock.close()
+                continue
+            with self._lock:
+                self._transports.append(transport)
+                self._stats['connections'] += 1
+
+
+class _Shell:
+    """One invoke_shell channel: jump-host prompt, telnet login, then the switch CLI"""
+
+    def __init__(self, simulator, channel):
+        self.simulator = simulator
+        self.channel = channel
+        self.buffer = ""
+        self.rng = random.Random(simulator.seed)
+
+    def run(self):
+        self.simulator.count('sessions')
+        try:
+            self.send(JUMP_PROMPT)
+            while True:
+                line = self.read_line()
+                if line is None or line in ('exit', 'logout'):
+                    return
+                if line.startswith('telnet '):
+                    self.telnet(*line.split()[1:3])
+                    self.send(JUMP_PROMPT)
+                elif line:
+                    self.send(f"{line.split()[0]}: command not found\r\n{JUMP_PROMPT}")
+                else:
+                    self.send(JUMP_PROMPT)
+        except (OSError, EOFError):
+            pass
+        finally:
+            self.channel.close()
+
+    def send(self, text):
+        self.channel.sendall(text.encode())
+
+    def read_line(self):
+        """Next input line without the terminator, None once the client closes the channel"""
+        while "\n" not in self.buffer:
+            data = self.channel.recv(1024)
+            if not data:
+                return None
+            self.buffer += data.decode(errors='ignore').replace("\r", "")
+        line, self.buffer = self.buffer.split("\n", 1)
+        return line.replace("\003", "").strip()
+
+    def interrupted(self):
+        """True when a Ctrl-C arrived; consumes the rest of that line"""
+        while self.channel.recv_ready():
+            data = self.channel.recv(1024)
+            if not data:
+                raise EOFError
+            self.buffer += data.decode(errors='ignore').replace("\r", "")
+        if "\003" not in self.buffer:
+            return False
+        rest = self.buffer.split("\003", 1)[1]
+        self.buffer = rest.split("\n", 1)[1] if "\n" in rest else ""
+        return True
+
+    def telnet(self, telnet_host, telnet_port):
+        profile = self.simulator.profile(telnet_host, telnet_port)
+        sw_name = self.simulator.switch_name(telnet_host, telnet_port)
+        if profile.login_delay:
+            time.sleep(profile.login_delay)
+        self.send(f"Trying {telnet_host} ...\r\nConnected to {telnet_host} ...\r\n\r\nLogin authentication\r\n\r\nUsername:")
+        if self.read_line() is None:
+            raise EOFError
+        self.send("\r\nPassword:")
+        if self.read_line() is None:
+            raise EOFError
+        self.simulator.count('logins')
+        prompt = f"\r\n<{sw_name}>"
+        self.send(prompt)
+
+        while True:
+            line = self.read_line()
+            if line is None:
+                raise EOFError
+            if line in ('quit', 'exit'):
+                self.send("\r\nConfiguration console exit, please retry to log on\r\n"
+                          "Connection closed by foreign host.\r\n")
+                return
+            match = PING_RE.match(line)
+            if match:
+                self.ping(profile, match.group('dest'), match.group('args'))
+            elif line:
+                self.send("\r\n                 ^\r\nError: Unrecognized command found at '^' position.")
+            self.send(prompt)
+
+    def ping(self, profile, destination, args):
+        count = int((re.search(r'-c\s+(\d+)', args) or [None, 5])[1])
+        size = int((re.search(r'-s\s+(\d+)', args) or [None, 56])[1])
+        self.simulator.count('pings')
+        lines = [f"\r\n  PING {destination}: {size}  data bytes, press CTRL_C to break\r\n"]
+        sent = received = 0
+        rtts = []
+
+        for seq in range(1, count + 1):
+            if profile.hang_after is not None and seq > profile.hang_after:
+                self.send("".join(lines))
+                self.hang()
+            if profile.reply_delay:
+                self.send("".join(lines))
+                lines = []
+                time.sleep(profile.reply_delay)
+            if self.interrupted():
+                self.simulator.count('aborts')
+                break
+
+            sent += 1
+            if profile.is_lost(seq, self.rng):
+                lines.append("    Request time out\r\n")
+            else:
+                rtt = profile.sample_rtt(self.rng)
+                rtts.append(rtt)
+                received += 1
+                lines.append(f"    Reply from {destination}: bytes={size} Sequence={seq} ttl=255 time={rtt} ms\r\n")
+            if len(lines) >= SEND_BATCH:
+                self.send("".join(lines))
+                lines = []
+
+        self.simulator.count('packets', sent)
+        loss = 100.0 * (sent - received) / sent if sent else 100.0
+        lines += [
+            "\r\n",
+            f"  --- {destination} ping statistics ---\r\n",
+            f"    {sent} packet(s) transmitted\r\n",
+            f"    {received} packet(s) received\r\n",
+            f"    {loss:.2f}% packet loss\r\n",
+        ]
+        if rtts:
+            lines.append(f"    round-trip min/avg/max = {min(rtts)}/{sum(rtts) // len(rtts)}/{max(rtts)} ms\r\n")
+        self.send("".join(lines))
+
+    def hang(self):
+        """Stop answering: swallow input until the client gives up and closes the channel"""
+        while self.channel.recv(1024):
+            pass
+        raise EOFError
@@ -1,14 +1,29 @@
 import paramiko
+import codecs
 import re
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from socket import timeout as SocketTimeout
 from django.conf import settings
 from django.utils import timezone
+from . import metrics
+from .ssh_pool import get_pool
+from .session_cache import TelnetSession, get_session_cache
+from .ping_parser import AdaptivePingPolicy, PingStreamParser, classify_loss
 
 logger = logging.getLogger(__name__)
 
 class SSHClient:
+    # Characters kept from previous chunks when matching prompts split across reads
+    READ_WINDOW = 4096
+    PING_READ_TIMEOUT = 418
+    PING_COUNT = 1000
+    ABORT_READ_TIMEOUT = 10
+    PROBE_TIMEOUT = 5
+    # Seconds the jump-host shell gets before the telnet command (0 against the simulator)
+    SHELL_INIT_DELAY = 2
+
     def __init__(self):
         # Inicialização da conexão SSH com configurações vindas do arquivo .env
         self.ssh_config = {
@@ -19,26 +34,72 @@ class SSHClient:
             'timeout': getattr(settings, 'SSH_TIMEOUT', 30)
         }
 
-    def _read_until(self, channel, end_marker, timeout=60):
-        """Enhanced read with buffer flushing and pattern matching"""
-        start_time = time.time()
-        output = ""
-        pattern = re.compile(end_marker)
-        
-        while time.time() - start_time < timeout:
-            if channel.recv_ready():
-                # Read larger chunks and handle continuation
-                chunk = channel.recv(65535).decode('utf-8', errors='ignore')
-                output += chunk
-                if pattern.search(output):
-                    return output
-            time.sleep(1)
-        
-        # Final attempt to read remaining data
-        if channel.recv_ready():
-            output += channel.recv(65535).decode('utf-8', errors='ignore')
-        
-        return output
+    @property
+    def pool(self):
+        """Process-wide pool of jump-host transports shared by every SSHClient"""
+        key = (self.ssh_config['hostname'], self.ssh_config['port'], self.ssh_config['username'])
+        return get_pool(key, self._connect_ssh)
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    def _phase(self, phase, sw_name=''):
+        """Timing span for pingtest_phase_seconds, labelled with this jump host and the switch"""
+        return metrics.span(metrics.PHASE, phase=phase, jump_host=self.ssh_config['hostname'], switch=sw_name)
+
+    def _observe_phase(self, phase, seconds, sw_name=''):
+        metrics.observe(metrics.PHASE, seconds, phase=phase, jump_host=self.ssh_config['hostname'], switch=sw_name)
+
+    def _read_until(self, channel, end_marker, timeout=60, on_chunk=None):
+        """
+        Blocking read until end_marker, matching only the newest tail of the buffer.
+
+        With on_chunk, decoded chunks are handed to the callback instead of
+        being buffered (nothing is returned) and reading stops as soon as the
+        callback returns True.
+        """
+        deadline = time.monotonic() + timeout
+        pattern = re.compile(end_marker) if end_marker else None
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        chunks = []
+        tail = ""
+
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                # Block on the channel instead of polling recv_ready() + sleep
+                channel.settimeout(remaining)
+                try:
+                    data = channel.recv(65535)
+                except SocketTimeout:
+                    break
+                if not data:  # Channel closed by the remote side
+                    break
+
+                chunk = decoder.decode(data)
+                if on_chunk:
+                    if on_chunk(chunk):
+                        break
+                else:
+                    chunks.append(chunk)
+
+                if pattern:
+                    # Only the new chunk plus a short overlap can contain a new match
+                    window = tail + chunk
+                    if pattern.search(window):
+                        break
+                    tail = window[-self.READ_WINDOW:]
+        finally:
+            channel.settimeout(None)
+
+        if on_chunk:
+            on_chunk(decoder.decode(b'', final=True))
+            return ""
+        chunks.append(decoder.decode(b'', final=True))
+        return "".join(chunks)
 
     def _parse_packet_loss(self, stats_text):
         """More resilient packet loss parsing"""
@@ -53,106 +114,257 @@ class SSHClient:
             raise ValueError(f"Invalid packet loss value: {match.group(1)}")
 
         # Return appropriate enum based on packet loss percentage
-        if packet_loss == 0.0:
-            return 'SF'
-        elif packet_loss == 100.0:
-            return 'FT'
-        else:
-            return 'FP'
+        return classify_loss(packet_loss)
 
     def _connect_ssh(self):
         """SSH connection with retries"""
         max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                ssh = paramiko.SSHClient()
-                ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                ssh.connect(**self.ssh_config)
-                return ssh
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise
-                time.sleep(2 ** attempt)
+        with self._phase('connect'):
+            for attempt in range(max_retries):
+                try:
+                    ssh = paramiko.SSHClient()
+                    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                    ssh.connect(**self.ssh_config)
+                    return ssh
+                except Exception as e:
+                    if attempt == max_retries - 1:
+                        raise
+                    logger.warning(f"SSH connect attempt {attempt + 1}/{max_retries} failed: {str(e)}")
+                    time.sleep(2 ** attempt)
         return None
 
-    def run_test(self, telnet_host, telnet_port, ping_destination, sw_name, repeat=2):
+    @property
+    def sessions(self):
+        """Process-wide cache of logged-in telnet sessions"""
+        return get_session_cache(self._close_session)
+
+    def run_test(self, telnet_host, telnet_port, ping_destination, sw_name, repeat=2, options=None):
         results = []
-        ssh = None
-        channel = None
+        session = None
+        healthy = False
 
         try:
-            # Connection setup with increased timeouts
-            ssh = self._connect_ssh()
-            if not ssh:
-                raise ConnectionError("SSH connection failed after retries")
-
-            channel = ssh.invoke_shell()
-            time.sleep(2)  # Extended shell initialization
-
-            self._execute_telnet_login(channel, telnet_host, telnet_port, sw_name)
+            session = self._open_session(telnet_host, telnet_port, sw_name)
 
             for _ in range(repeat):
-                result = self._execute_ping_test(channel, telnet_host, telnet_port, ping_destination, sw_name)
+                result = self._execute_ping_test(session.channel, telnet_host, telnet_port, ping_destination, sw_name, options)
                 results.append(result)
+            # Only a clean run leaves the CLI in a known state worth caching
+            healthy = not session.channel.closed and not any(r['error'] for r in results)
 
         except Exception as e:
             logger.error(f"Critical error: {str(e)}")
-            if ssh: ssh.close()
             return results
 
         finally:
-            self._cleanup_connections(channel, ssh)
+            if session:
+                if healthy:
+                    self.sessions.checkin(session)
+                else:
+                    self.sessions.discard(session)
 
         if repeat == 1:
             return results[0] if results else None  # Return single dict
         return results  # Return list only for repeat > 1
 
-    def _execute_telnet_login(self, channel, telnet_host, telnet_port, sw_name):
-        """Modular telnet login with pattern flexibility"""
-        login_sequence = [
+    def run_group(self, scenarios, sessions=1):
+        """
+        Ping every destination of one switch console over a single login.
+
+        ``scenarios`` share telnet_host/port/sw_name and are run in sequence
+        on one CLI session (the VRP CLI runs one ping at a time). With
+        ``sessions`` > 1 they are split across that many parallel logins,
+        for consoles that accept more than one. One result per scenario,
+        with test_name set.
+        """
+        chunks = [chunk for chunk in (scenarios[i::sessions] for i in range(max(1, sessions))) if chunk]
+        if len(chunks) == 1:
+            return self._run_group_session(chunks[0])
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            return [result for results in executor.map(self._run_group_session, chunks) for result in results]
+
+    def _run_group_session(self, scenarios):
+        results = []
+        session = None
+        try:
+            for scenario in scenarios:
+                telnet_host, telnet_port, ping_destination, sw_name, test_name = scenario[:5]
+                options = scenario[5] if len(scenario) > 5 else None
+                try:
+                    if session is None:
+                        session = self._open_session(telnet_host, telnet_port, sw_name)
+                    result = self._execute_ping_test(
+                        session.channel, telnet_host, telnet_port, ping_destination, sw_name, options,
+                    )
+                except Exception as e:
+                    logger.error(f"Critical error: {str(e)}")
+                    result = self._initialize_result(telnet_host, telnet_port, ping_destination, sw_name)
+                    result.update({
+                        'start_time': timezone.localtime(),
+                        'end_time': timezone.localtime(),
+                        'error': str(e),
+                    })
+                result['test_name'] = test_name
+                results.append(result)
+
+                if session and (session.channel.closed or result['error']):
+                    # CLI em estado desconhecido: novo login para o próximo destino
+                    self.sessions.discard(session)
+                    session = None
+        finally:
+            if session:
+                self.sessions.checkin(session)
+        return results
+
+    def _open_session(self, telnet_host, telnet_port, sw_name):
+        """Reuse a cached logged-in session for this switch, or log in on a pooled transport"""
+        key = (str(telnet_host), int(telnet_port), str(sw_name))
+
+        session = self.sessions.checkout(key)
+        if session:
+            if self._probe_session(session.channel, sw_name):
+                logger.debug(f"Reusing telnet session for {sw_name} ({self.sessions.stats()})")
+                return session
+            self.sessions.discard(session)
+
+        conn = self._acquire_connection()
+        channel = None
+        try:
+            channel = conn.client.invoke_shell()
+            with self._phase('shell_init', sw_name):
+                time.sleep(self.SHELL_INIT_DELAY)  # Extended shell initialization
+            self._execute_telnet_login(channel, telnet_host, telnet_port, sw_name)
+        except Exception:
+            self._cleanup_connections(channel, None)
+            self.pool.release(conn)
+            raise
+        return TelnetSession(key, conn, channel, self.pool)
+
+    def _acquire_connection(self):
+        """Pool lease; idle cached sessions give theirs up when the pool is full"""
+        while True:
+            try:
+                return self.pool.acquire(timeout=0 if self.sessions.stats()['cached'] else None)
+            except TimeoutError:
+                if not self.sessions.evict_lru():
+                    return self.pool.acquire()
+
+    def _probe_session(self, channel, sw_name):
+        """Cheap liveness check: an empty line must bring the switch prompt back"""
+        try:
+            if channel.closed:
+                return False
+            while channel.recv_ready():  # Drop leftovers from the previous run
+                channel.recv(65535)
+            channel.send("\n")
+            output = self._read_until(channel, rf"<{sw_name}>", timeout=self.PROBE_TIMEOUT)
+            return re.search(rf"<{sw_name}>", output) is not None
+        except Exception as e:
+            logger.debug(f"Session probe failed for {sw_name}: {str(e)}")
+            return False
+
+    def _close_session(self, session):
+        self._cleanup_connections(session.channel, None)
+        (session.pool or self.pool).release(session.conn)
+
+    def _login_steps(self, telnet_host, telnet_port, sw_name):
+        """(command, expected pattern, timeout) for the jump host -> switch login"""
+        return [
             (f"telnet {telnet_host} {telnet_port}\n", r"[Uu]sername:", 30),
             (f"{settings.TELNET_USER}\n", r"[Pp]assword:", 30),
             (f"{settings.TELNET_PASSWORD}\n", rf"<{sw_name}>", 40)
         ]
 
-        for command, pattern, timeout in login_sequence:
-            channel.send(command)
-            self._read_until(channel, pattern, timeout)
+    def _execute_telnet_login(self, channel, telnet_host, telnet_port, sw_name):
+        """Modular telnet login with pattern flexibility"""
+        with self._phase('login', sw_name):
+            for command, pattern, timeout in self._login_steps(telnet_host, telnet_port, sw_name):
+                channel.send(command)
+                self._read_until(channel, pattern, timeout)
+
+    def _ping_options(self, options=None):
+        """Scenario options (NetworkTestScenario.ping_options) over the defaults"""
+        merged = {
+            'packet_count': self.PING_COUNT,
+            'packet_size': None,
+            'ping_timeout': self.PING_READ_TIMEOUT,
+        }
+        merged.update({key: value for key, value in (options or {}).items() if value is not None})
+        return merged
 
-    def _execute_ping_test(self, channel, telnet_host, telnet_port, ping_destination, sw_name):
+    def _ping_command(self, ping_destination, options=None):
+        options = self._ping_options(options)
+        command = f"ping -c {options['packet_count']}"
+        if options['packet_size']:
+            command += f" -s {options['packet_size']}"
+        return f"{command} {ping_destination}\n"
+
+    def _ping_timeout(self, options=None):
+        return self._ping_options(options)['ping_timeout']
+
+    def max_runtime(self, options=None, repeat=1):
+        """Worst case seconds for a login + ``repeat`` pings, used as the worker task timeout"""
+        login = sum(timeout for _, _, timeout in self._login_steps('', 0, ''))
+        return login + repeat * (self._ping_timeout(options) + self.ABORT_READ_TIMEOUT)
+
+    def _adaptive_policy(self):
+        """Early-abort policy when PING_ADAPTIVE is on, else None (always full count)"""
+        if not getattr(settings, 'PING_ADAPTIVE', False):
+            return None
+        return AdaptivePingPolicy(getattr(settings, 'PING_ADAPTIVE_SAMPLE', 100))
+
+    def _ping_feeder(self, parser, abort):
+        """on_chunk callback feeding the parser and calling abort() once the run is decided"""
+        policy = self._adaptive_policy()
+
+        def feed(chunk):
+            complete = parser.feed(chunk)
+            if not complete and policy and policy.should_abort(parser):
+                logger.debug(f"Early abort after {parser.sent} packets ({parser.packet_loss}% loss)")
+                abort()
+            return complete
+
+        return feed
+
+    def _apply_ping_output(self, result, parser):
+        """Fill result from a PingStreamParser; returns False if the device summary was not seen"""
+        self._observe_phase('parse', parser.parse_seconds, result['sw_name'])
+        if parser.sent:
+            # Also applied on timeouts, so partial runs keep what the counters saw
+            rtt = parser.rtt or (None, None, None)
+            result.update({
+                'success': classify_loss(parser.packet_loss),
+                'statistics': parser.statistics_text(),
+                'packets_sent': parser.sent,
+                'packet_loss': parser.packet_loss,
+                'rtt_min': rtt[0],
+                'rtt_avg': rtt[1],
+                'rtt_max': rtt[2],
+                'rtt_samples': parser.packed_samples(),
+            })
+        return parser.has_summary
+
+    def _execute_ping_test(self, channel, telnet_host, telnet_port, ping_destination, sw_name, options=None):
         """Execute and monitor a single ping test"""
         result = self._initialize_result(telnet_host, telnet_port, ping_destination, sw_name)
+        parser = PingStreamParser(ping_destination, sw_name)
         
+        on_chunk = self._ping_feeder(parser, lambda: channel.send("\003\n"))
+
         try:
-            channel.send(f"ping -c 1000 {ping_destination}\n")
-            result['start_time'] = timezone.localtime()
-            output = self._read_until(channel, rf"<{sw_name}>", timeout=418)  
-            
-            stats_match = re.search(
-                rf"(-+ {re.escape(ping_destination)} ping statistics -+.*?)<{sw_name}>",
-                output,
-                re.DOTALL
-            )
-
-            if stats_match:
-                self._handle_successful_test(result, stats_match)
-            else:
-                channel.send("\003\n")
-                time.sleep(2)  # Wait for command to take effect
-                
-                # Read any remaining output after aborting
-                error_output = channel.recv(65535).decode("utf-8", errors="ignore")
-                
-                stats_match = re.search(
-                    rf"(-+ {re.escape(ping_destination)} ping statistics -+.*?)<{sw_name}>",
-                    error_output,
-                    re.DOTALL
-                )
-                
-                if stats_match:
-                    self._handle_successful_test(result, stats_match)
-                else:
-                    result['error'] = "Ping statistics not found after aborting."
+            with self._phase('ping', sw_name):
+                channel.send(self._ping_command(ping_destination, options))
+                result['start_time'] = timezone.localtime()
+                self._read_until(channel, None, timeout=self._ping_timeout(options), on_chunk=on_chunk)
+
+                if not parser.complete:
+                    channel.send("\003\n")
+
+                    # Keep feeding whatever the device prints after aborting, up to the prompt
+                    self._read_until(channel, None, timeout=self.ABORT_READ_TIMEOUT, on_chunk=parser.feed)
+
+            if not self._apply_ping_output(result, parser):
+                result['error'] = "Ping statistics not found after aborting."
 
         except Exception as e:
             self._handle_test_error(result, e)
@@ -172,17 +384,15 @@ class SSHClient:
             'end_time': None,
             'success': 'FT',
             'statistics': '',
-            'error': ''
+            'error': '',
+            'packets_sent': None,
+            'packet_loss': None,
+            'rtt_min': None,
+            'rtt_avg': None,
+            'rtt_max': None,
+            'rtt_samples': None,
         }
 
-    def _handle_successful_test(self, result, stats_match):
-        stats_text = stats_match.group(1).strip()
-        result.update({
-            'success': self._parse_packet_loss(stats_text),
-            'statistics': stats_text
-        })
-
-
     def _extract_statistics(self, output):
         """Flexible statistics extraction from partial output"""
         stats_section = re.search(
@@ -0,0 +1,186 @@
+import threading
+import time
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PooledConnection:
+    """A long-lived paramiko SSHClient plus the bookkeeping the pool needs"""
+
+    def __init__(self, client):
+        self.client = client
+        self.leases = 0
+        self.uses = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    @property
+    def transport(self):
+        return self.client.get_transport()
+
+    def is_healthy(self):
+        """Cheap liveness check: active transport that still accepts an SSH_MSG_IGNORE"""
+        transport = self.transport
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            transport.send_ignore()
+        except Exception:
+            return False
+        return True
+
+    def close(self):
+        try:
+            self.client.close()
+        except Exception as e:
+            logger.debug(f"Pooled SSH close warning: {str(e)}")
+
+
+class SSHConnectionPool:
+    """
+    Per-process pool of SSH transports to the jump host.
+
+    A transport is shared by up to ``max_sessions`` concurrent leases (one
+    ``invoke_shell`` channel each), so a busy worker reuses the same TCP/auth
+    handshake for every test instead of reconnecting per scenario.
+    """
+
+    def __init__(self, connect, size=None, idle_timeout=None, keepalive=None, max_sessions=None):
+        self._connect = connect
+        self.size = size if size is not None else getattr(settings, 'SSH_POOL_SIZE', 2)
+        self.idle_timeout = idle_timeout if idle_timeout is not None else getattr(settings, 'SSH_POOL_IDLE_TIMEOUT', 600)
+        self.keepalive = keepalive if keepalive is not None else getattr(settings, 'SSH_KEEPALIVE_INTERVAL', 30)
+        self.max_sessions = max_sessions if max_sessions is not None else getattr(settings, 'SSH_POOL_MAX_SESSIONS', 10)
+
+        self._cond = threading.Condition()
+        self._conns = []
+        self._pending = 0
+        self._stats = {
+            'created': 0,     # new transports opened (pool misses)
+            'reused': 0,      # leases served by an existing transport (pool hits)
+            'reconnects': 0,  # transports dropped by a failed health check
+            'evicted': 0,     # transports closed after idle_timeout
+            'leases': 0,
+        }
+
+    def acquire(self, timeout=None):
+        """Lease a healthy connection, opening a new one if the pool has room"""
+        if self.size <= 0:
+            # Pooling disabled: behave like the old connect-per-test path
+            conn = self._open()
+            conn.leases = 1
+            return conn
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._reap_locked()
+
+                for conn in sorted(self._conns, key=lambda c: c.leases):
+                    if conn.leases >= self.max_sessions:
+                        continue
+                    if not conn.is_healthy():
+                        self._discard_locked(conn)
+                        self._stats['reconnects'] += 1
+                        continue
+                    self._lease_locked(conn)
+                    self._stats['reused'] += 1
+                    return conn
+
+                if len(self._conns) + self._pending < self.size:
+                    self._pending += 1
+                    break
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No SSH connection available in pool")
+                self._cond.wait(remaining)
+
+        # Connect outside the lock so other threads can keep reusing live transports
+        try:
+            conn = self._open()
+        except Exception:
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._pending -= 1
+            self._conns.append(conn)
+            self._lease_locked(conn)
+            return conn
+
+    def release(self, conn, broken=False):
+        """Return a lease; broken or dead transports are dropped from the pool"""
+        if self.size <= 0:
+            conn.close()
+            return
+
+        with self._cond:
+            conn.leases = max(conn.leases - 1, 0)
+            conn.last_used = time.monotonic()
+            if broken or not (conn.transport and conn.transport.is_active()):
+                self._discard_locked(conn)
+                self._stats['reconnects'] += 1
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            for conn in list(self._conns):
+                self._discard_locked(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['open'] = len(self._conns)
+            stats['active_leases'] = sum(c.leases for c in self._conns)
+        total = stats['created'] + stats['reused']
+        stats['hit_ratio'] = round(stats['reused'] / total, 3) if total else 0.0
+        return stats
+
+    def _open(self):
+        client = self._connect()
+        if client is None:
+            raise ConnectionError("SSH connection failed after retries")
+        transport = client.get_transport()
+        if transport is not None and self.keepalive:
+            transport.set_keepalive(self.keepalive)
+        with self._cond:
+            self._stats['created'] += 1
+        logger.info(f"Opened pooled SSH connection ({self.stats()})")
+        return PooledConnection(client)
+
+    def _lease_locked(self, conn):
+        conn.leases += 1
+        conn.uses += 1
+        conn.last_used = time.monotonic()
+        self._stats['leases'] += 1
+
+    def _discard_locked(self, conn):
+        if conn in self._conns:
+            self._conns.remove(conn)
+        conn.close()
+
+    def _reap_locked(self):
+        now = time.monotonic()
+        for conn in list(self._conns):
+            if conn.leases == 0 and now - conn.last_used > self.idle_timeout:
+                self._discard_locked(conn)
+                self._stats['evicted'] += 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect):
+    """Return the process-wide pool for ``key`` (one per jump host/user)"""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SSHConnectionPool(connect)
+            _pools[key] = pool
+        return pool
@@ -1,127 +1,342 @@
-from datetime import timedelta
+from collections import Counter
+from contextlib import contextmanager
 import logging
-from django_q.tasks import async_task, schedule
+from django_q.tasks import schedule
 from django_q.models import Schedule
+from django.conf import settings
 from django.utils import timezone
-from django.db import close_old_connections
+from django.utils.dateparse import parse_datetime
+from . import metrics
 from .ssh_client import SSHClient
-from pingtest.models import NetworkTestResult, NetworkTestScenario
+from .multiplex import MultiplexExecutor
+from .result_writer import get_result_writer
+from .dashboard import build_cards
+from .history import history_page
+from .rollups import run_rollups
+from .cleanup import cleanup_results
+from .alerts import send_digest
+from .placement import check_budgets, fill_offsets, next_run_at, peaks, phase, plan_offsets
+from pingtest.models import LatestTestStatus, NetworkTestResult, NetworkTestScenario
 from django.core.cache import cache
 from django.db import transaction
-import threading
+import hashlib
 import time
 
 
 logger = logging.getLogger(__name__)
 
 class NetworkTestScheduler:
-    def __init__(self, interval_minutes=5):
-        self.ssh_client = SSHClient()
+    def __init__(self, interval_minutes=5, engine=None):
+        self.engine = engine or getattr(settings, 'PING_TEST_ENGINE', 'paramiko')
+        self.ssh_client = self._build_client(self.engine)
         self.interval = interval_minutes
         self.schedule_name = "network_test_schedule"
-        self.task_timeout = 300 
+        # Margem sobre o pior caso de login + ping; o tempo de cada tarefa vem do cenário
+        self.task_timeout_margin = 30
         
     
-    def start_polling_scheduler(self, poll_interval=360):
+    @staticmethod
+    def _build_client(engine):
+        """'paramiko' = thread/blocking SSHClient, 'asyncio' = coroutine AsyncSSHClient"""
+        if engine == 'asyncio':
+            from .async_ssh_client import AsyncSSHClient
+            return AsyncSSHClient()
+        return SSHClient()
+
+    def _batch_executor(self):
+        if self.engine == 'asyncio':
+            return self.ssh_client  # AsyncSSHClient.run() drives the batch on one event loop
+        return MultiplexExecutor(self.ssh_client)
+
+    @staticmethod
+    def reconcile_schedules():
+        """
+        Make the Schedule rows match the active scenarios and re-spread
+        every start offset. Run by start_scheduler and by the hourly
+        'scenario_reconcile' schedule.
         """
-        Starts a background thread that periodically checks for new, removed, or changed scenarios
-        and updates the schedule accordingly.
+        scheduler = NetworkTestScheduler()
+        with metrics.timed_task('reconcile'):
+            return scheduler._reconcile_schedules_impl()
+
+    @staticmethod
+    def reconcile_changed_schedules():
+        """
+        Apply a scenario change right after commit (NetworkTestScenario signals).
+
+        Only the schedules whose content changed are written; the others keep
+        their start times and a new schedule takes the largest free gap of its
+        interval (the hourly full reconcile evens the spacing again). Does
+        nothing while scheduling is stopped (run_network_tests --stop) and
+        never raises: the change is already committed.
         """
-        def polling_loop():
-            # Maps scenario.id -> last scheduled tuple
-            scheduled = {}
-            logger.info("Starting background polling scheduler loop.")
-            while True:
-                # Build current scenarios dict: id -> tuple
-                scenarios = {
-                    s.id: (
-                        s.source_ip,
-                        s.source_port,
-                        s.dest_ip,
-                        s.device_name,
-                        s.test_name,
+        try:
+            if not Schedule.objects.filter(name='scenario_reconcile').exists():
+                logger.info("Test scheduling is stopped; scenario change not scheduled")
+                return None
+            scheduler = NetworkTestScheduler()
+            with metrics.timed_task('reconcile'):
+                return scheduler._reconcile_schedules_impl(rebalance=False)
+        except Exception as e:
+            logger.error(f"Schedule reconcile after scenario change failed: {str(e)}", exc_info=True)
+            return None
+
+    def _reconcile_schedules_impl(self, rebalance=True):
+        desired = self._desired_schedules()
+        current, stale = {}, []
+        for row in Schedule.objects.filter(name__startswith=f"{self.schedule_name}_"):
+            # Nomes antigos (sw_destino), duplicados e cenários removidos/inativos saem
+            if row.name in desired and row.name not in current:
+                current[row.name] = row
+            else:
+                stale.append(row.id)
+
+        # Cada intervalo tem seu próprio ciclo, espalhado de forma independente; o pico de um
+        # intervalo já planejado conta como ocupado nos orçamentos dos seguintes
+        groups = {}
+        for name, entry in desired.items():
+            groups.setdefault(entry['interval'], []).append((name, entry['switch']))
+        switches = {name: entry['switch'] for name, entry in desired.items()}
+        durations = {name: entry['duration'] for name, entry in desired.items()}
+        budgets = self._budgets()
+        plans, busy = [], (0, Counter())
+        for interval, items in groups.items():
+            if rebalance:
+                plan = plan_offsets(items, interval, durations, *budgets, busy=busy)
+            else:
+                plan = self._kept_offsets(items, interval, current, durations, budgets, busy)
+            plans.append((plan, interval))
+            host_peak, switch_peaks = peaks(plan, switches, durations, interval)
+            busy = (busy[0] + host_peak, busy[1] + switch_peaks)
+        offsets = {name: offset for plan, _ in plans for name, offset in plan.items()}
+        check_budgets(plans, switches, durations, *budgets)
+
+        changed = []
+        fields = ('func', 'args', 'kwargs', 'hook', 'intended_date_kwarg', 'schedule_type', 'minutes')
+        for name, row in current.items():
+            interval = desired[name]['interval']
+            target = self._build_schedule(name, desired[name], offsets[name])
+            moved = abs(phase(row.next_run, interval) - offsets[name]) > 1 if row.next_run else True
+            if moved or any(getattr(row, f) != getattr(target, f) for f in fields):
+                for field in fields:
+                    setattr(row, field, getattr(target, field))
+                row.cron = None
+                # Mantém a próxima execução se a fase não mudou (edição só dos argumentos)
+                row.next_run = target.next_run if moved else row.next_run
+                changed.append(row)
+        new = [
+            self._build_schedule(name, entry, offsets[name])
+            for name, entry in desired.items() if name not in current
+        ]
+
+        with transaction.atomic():
+            Schedule.objects.filter(id__in=stale).delete()
+            Schedule.objects.bulk_update(changed, list(fields) + ['cron', 'next_run'])
+            Schedule.objects.bulk_create(new)
+
+        summary = {'created': len(new), 'updated': len(changed), 'deleted': len(stale)}
+        if any(summary.values()):
+            logger.info(f"Reconciled test schedules: {summary}")
+        return summary
+
+    def _kept_offsets(self, items, interval, current, durations, budgets, busy):
+        """Current phase of each existing schedule; new ones (or a new interval) fill the largest gap within the budgets"""
+        offsets, pending = {}, []
+        for name, _ in items:
+            row = current.get(name)
+            if row and row.next_run and row.minutes and row.minutes * 60 == interval:
+                offsets[name] = round(phase(row.next_run, interval), 3)
+            else:
+                pending.append(name)
+        offsets.update(fill_offsets(offsets, sorted(pending), dict(items), interval, durations, *budgets, busy=busy))
+        return offsets
+
+    def _desired_schedules(self):
+        """
+        {schedule name: entry} for every active scenario.
+
+        With PING_GROUP_BY_SWITCH, scenarios sharing a switch console and an
+        interval become one group task (one login, many destinations), split
+        only when their pings would not fit in the interval. A console with
+        a single scenario keeps the per-scenario task. Chunks are sized on
+        the expected ping durations (see _expected_seconds).
+
+        With PING_MULTIPLEX_SCHEDULES, each interval's scenarios are instead
+        batched into multiplexed tasks (see _multiplexed_schedules).
+        """
+        consoles = {}
+        for s in NetworkTestScenario.objects.filter(active=True).order_by('priority', 'test_name'):
+            scenario = s.as_scenario()
+            if not self._validate_scenario(scenario):
+                continue
+            key = (s.source_ip, s.source_port, s.device_name, s.interval_minutes * 60)
+            if not getattr(settings, 'PING_GROUP_BY_SWITCH', True):
+                key += (s.id,)
+            consoles.setdefault(key, []).append((s.id, scenario))
+
+        durations = self._expected_seconds([scenario for members in consoles.values() for _, scenario in members])
+        if getattr(settings, 'PING_MULTIPLEX_SCHEDULES', False):
+            return self._multiplexed_schedules(consoles, durations)
+        desired = {}
+        for key, members in consoles.items():
+            telnet_host, telnet_port, sw_name, interval = key[:4]
+            for i, chunk in enumerate(self._split_group(members, interval, durations)):
+                scenarios = [scenario for _, scenario in chunk]
+                if len(chunk) == 1:
+                    desired[self._schedule_name(chunk[0][0])] = self._schedule_entry(
+                        'create_task', scenarios[0], scenarios, interval, durations,
                     )
-                    for s in NetworkTestScenario.objects.filter(active=True)
-                }
-
-                # Handle new or changed scenarios
-                for scenario_id, scenario_tuple in scenarios.items():
-                    if scenario_id not in scheduled:
-                        # New scenario: schedule it
-                        if self._validate_scenario(scenario_tuple):
-                            self._schedule_next(scenario_tuple)
-                            logger.info(f"Scheduled scenario: {scenario_tuple[3]} ({scenario_tuple[4]})")
-                        scheduled[scenario_id] = scenario_tuple
-                    elif scheduled[scenario_id] != scenario_tuple:
-                        # Scenario changed: remove old schedule, add new
-                        old_tuple = scheduled[scenario_id]
-                        sched_name = f"{self.schedule_name}_{old_tuple[3]}_{old_tuple[2]}"
-                        Schedule.objects.filter(name=sched_name).delete()
-                        logger.info(f"Removed old schedule for scenario: {old_tuple[3]} ({old_tuple[4]})")
-                        if self._validate_scenario(scenario_tuple):
-                            self._schedule_next(scenario_tuple)
-                            logger.info(f"Rescheduled scenario: {scenario_tuple[3]} ({scenario_tuple[4]})")
-                        scheduled[scenario_id] = scenario_tuple
-
-                # Handle removed scenarios
-                for scenario_id in list(scheduled.keys()):
-                    if scenario_id not in scenarios:
-                        old_tuple = scheduled[scenario_id]
-                        sched_name = f"{self.schedule_name}_{old_tuple[3]}_{old_tuple[2]}"
-                        Schedule.objects.filter(name=sched_name).delete()
-                        logger.info(f"Removed schedule for deleted scenario: {old_tuple[3]} ({old_tuple[4]})")
-                        del scheduled[scenario_id]
-
-                time.sleep(poll_interval)
-
-        thread = threading.Thread(target=polling_loop, daemon=True)
-        thread.start()
+                else:
+                    name = f"{self.schedule_name}_sw_{telnet_host}_{telnet_port}_{interval // 60}m_{i + 1}"
+                    desired[name] = self._schedule_entry('create_group_task', scenarios, scenarios, interval, durations)
+        return desired
+
+    def _multiplexed_schedules(self, consoles, durations):
+        """
+        One create_multiplexed_task schedule per batch of an interval's
+        scenarios: up to PING_MULTIPLEX_CHANNELS channels, and at most one
+        scenario per switch console, since every channel logs in on its own.
+        Scenarios of a busy console are spread over several batches, which
+        the placement staggers like any other schedule.
+        """
+        max_channels = max(1, getattr(settings, 'PING_MULTIPLEX_CHANNELS', 20))
+        batches = {}
+        for key, members in consoles.items():
+            console, interval = key[:2], key[3]
+            for _, scenario in members:
+                interval_batches = batches.setdefault(interval, [])
+                batch = next((b for b in interval_batches if len(b) < max_channels and console not in b), None)
+                if batch is None:
+                    batch = {}
+                    interval_batches.append(batch)
+                batch[console] = scenario
+
+        desired = {}
+        for interval, interval_batches in batches.items():
+            for i, batch in enumerate(interval_batches):
+                name = f"{self.schedule_name}_mux_{interval // 60}m_{i + 1}"
+                scenarios = list(batch.values())
+                entry = self._schedule_entry('create_multiplexed_task', scenarios, scenarios, interval, durations, concurrent=True)
+                # O lote conta como uma execução nos orçamentos; os canais esperam por vaga no pool SSH
+                entry['switch'] = name
+                desired[name] = entry
+        return desired
+
+    def _schedule_entry(self, task, arg, scenarios, interval, durations, concurrent=False):
+        return {
+            'func': f'pingtest.utils.test_runner.NetworkTestScheduler.{task}',
+            'args': str((arg,)),
+            'interval': interval,
+            'switch': scenarios[0][3],
+            'scenarios': scenarios,
+            'concurrent': concurrent,
+            # Um grupo roda os pings em sequência; um lote multiplexado, todos juntos
+            'duration': (max if concurrent else sum)(durations[s[4]] for s in scenarios),
+        }
+
+    def _split_group(self, members, interval, durations):
+        """
+        Consecutive chunks of (id, scenario) whose expected pings, run one
+        after the other on PING_GROUP_SESSIONS logins, fit in one interval.
+        """
+        budget = interval * max(1, getattr(settings, 'PING_GROUP_SESSIONS', 1))
+        chunks, chunk, used = [], [], 0
+        for member in members:
+            ping = durations[member[1][4]]
+            if chunk and used + ping > budget:
+                chunks.append(chunk)
+                chunk, used = [], 0
+            chunk.append(member)
+            used += ping
+        return chunks + [chunk]
+
+    def _ping_seconds(self, scenario):
+        return self.ssh_client._ping_timeout(scenario[5] if len(scenario) > 5 else None)
+
+    def _expected_seconds(self, scenarios):
+        """
+        {test name: expected ping seconds}: the last measured run
+        (LatestTestStatus), else packet_count x PING_PACKET_INTERVAL; the
+        scenario's ping_timeout is only the upper bound.
+        """
+        measured = {}
+        for status in LatestTestStatus.objects.filter(
+            test_name__in=[s[4] for s in scenarios],
+        ).only('test_name', 'test_start', 'test_end'):
+            if status.test_start and status.test_end:
+                measured[status.test_name] = (status.test_end - status.test_start).total_seconds()
+        packet_interval = getattr(settings, 'PING_PACKET_INTERVAL', 0.2)
+        durations = {}
+        for scenario in scenarios:
+            options = self.ssh_client._ping_options(scenario[5] if len(scenario) > 5 else None)
+            expected = measured.get(scenario[4], options['packet_count'] * packet_interval)
+            durations[scenario[4]] = min(expected, options['ping_timeout'])
+        return durations
+
+    def _schedule_name(self, scenario_id):
+        # Pelo id: editar switch/destino não muda o nome do schedule
+        return f"{self.schedule_name}_{scenario_id}"
+
+    def _task_timeout(self, scenarios, concurrent=False):
+        """Login once + every ping of the task in sequence (or the longest one when they run concurrently), plus a margin"""
+        pings = (max if concurrent else sum)(self._ping_seconds(s) + self.ssh_client.ABORT_READ_TIMEOUT for s in scenarios)
+        return self.ssh_client.max_runtime(repeat=0) + pings + self.task_timeout_margin
+
+    def _build_schedule(self, name, entry, offset):
+        # Tipo 'I' (minutos) conserva a fase do next_run; cron só permitiria o segundo 0 de cada minuto
+        # save=False: sucesso não vira linha em Task (o resultado já está em NetworkTestResult);
+        # falhas são registradas pela própria tarefa (_recording_failure), com qualquer broker.
+        # scheduled_for = horário previsto da execução, igual em todas as tentativas da mesma tarefa
+        return Schedule(
+            name=name,
+            func=entry['func'],
+            args=entry['args'],
+            kwargs=str({'q_options': {'timeout': self._task_timeout(entry['scenarios'], entry['concurrent']), 'save': False}}),
+            hook=None,
+            intended_date_kwarg='scheduled_for',
+            schedule_type='I',
+            minutes=entry['interval'] // 60,
+            repeats=-1,
+            next_run=next_run_at(offset, entry['interval']),
+        )
+
+    def _budgets(self):
+        """(jump-host, per-switch) concurrency budgets; 0 = no limit"""
+        pool_budget = getattr(settings, 'SSH_POOL_SIZE', 2) * getattr(settings, 'SSH_POOL_MAX_SESSIONS', 10)
+        return (
+            getattr(settings, 'SCHEDULE_JUMP_HOST_BUDGET', pool_budget),
+            getattr(settings, 'SCHEDULE_SWITCH_BUDGET', 2),
+        )
+
+    def schedule_reconcile(self):
+        """Full reconcile every hour, only as a safety net for the signal hooks"""
+        Schedule.objects.filter(name='scenario_reconcile').delete()
+        schedule(
+            'pingtest.utils.test_runner.NetworkTestScheduler.reconcile_schedules',
+            name='scenario_reconcile',
+            schedule_type='C',
+            cron='0 * * * *',
+            repeats=-1,
+        )
 
     def _save_result(self, result):
-        """Enhanced database save with list handling"""
+        """Queue results for the buffered bulk writer (flushed on size/time thresholds)"""
         try:
-            close_old_connections()
-            
-            # Handle list results
-            if isinstance(result, list):
-                for res in result:
-                    self._save_single_result(res)
-                return
-                
-            # Handle single result
-            self._save_single_result(result)
-            
+            with self.ssh_client._phase('save'):
+                writer = get_result_writer()
+                if isinstance(result, list):
+                    writer.add_many(result)
+                else:
+                    writer.add(result)
         except Exception as e:
             logger.error(f"DB Save Error: {str(e)}", exc_info=True)
-        finally:
-            close_old_connections()
-
-    def _save_single_result(self, result):
-        """Handle individual result saving"""
-        if not isinstance(result, dict):
-            logger.error(f"Invalid result type: {type(result)}")
-            return
-
-        NetworkTestResult.objects.update_or_create(
-            telnet_host=result.get('telnet_host'),
-            telnet_port=result.get('telnet_port'),
-            ping_destination=result.get('ping_destination'),
-            test_name=result.get('test_name'),
-            sw_name=result.get('sw_name'),
-            test_start=result.get('start_time'),
-            defaults={
-                'test_end': result.get('end_time'),
-                'statistics': str(result.get('statistics', ''))[:500],
-                'success': result.get('success', 'FT'),
-                'error_message': str(result.get('error', ''))[:2000]
-            }
-        )
 
     @staticmethod
-    def create_task(scenario):
+    def create_task(scenario, scheduled_for=None):
         """Static method wrapper for task creation"""
         scheduler = NetworkTestScheduler()  # Or get existing instance
-        return scheduler._create_task_impl(scenario)
+        with metrics.timed_task('task'), scheduler._recording_failure([scenario], scheduled_for):
+            return scheduler._compact(scheduler._create_task_impl(scenario))
 
     def _create_task_impl(self, scenario):
         """Actual task implementation"""
@@ -136,15 +351,106 @@ class NetworkTestScheduler:
             return result
         except Exception as e:
             logger.error(f"Task failed: {str(e)}", exc_info=True)
-            return self._create_error_result(e, scenario)
+            # Sucesso não fica em Task: o erro só é registrado se for gravado aqui
+            result = self._create_error_result(e, scenario)
+            self._save_result(result)
+            return result
+
+    @staticmethod
+    def create_group_task(scenarios, scheduled_for=None):
+        """Run every scenario of one switch console over a single login"""
+        scheduler = NetworkTestScheduler()
+        with metrics.timed_task('group'), scheduler._recording_failure(scenarios, scheduled_for):
+            return scheduler._compact(scheduler._create_group_task_impl(scenarios))
+
+    def _create_group_task_impl(self, scenarios):
+        valid = [s for s in scenarios if self._validate_scenario(s)]
+        if len(valid) != len(scenarios):
+            logger.error(f"Skipping {len(scenarios) - len(valid)} invalid scenarios")
+        if not valid:
+            return []
+
+        try:
+            logger.info(f"Starting group task for {valid[0][3]} ({len(valid)} destinations)")
+            results = self.ssh_client.run_group(valid, sessions=getattr(settings, 'PING_GROUP_SESSIONS', 1))
+        except Exception as e:
+            logger.error(f"Group task failed: {str(e)}", exc_info=True)
+            results = [self._create_error_result(e, s) for s in valid]
+
+        self._save_result(results)
+        return results
+
+    @staticmethod
+    def create_multiplexed_task(scenarios, scheduled_for=None):
+        """Run a list of scenarios concurrently over shared SSH transports"""
+        scheduler = NetworkTestScheduler()
+        with metrics.timed_task('multiplex'), scheduler._recording_failure(scenarios, scheduled_for):
+            return scheduler._compact(scheduler._create_multiplexed_task_impl(scenarios))
+
+    def _create_multiplexed_task_impl(self, scenarios):
+        valid = [s for s in scenarios if self._validate_scenario(s)]
+        # Prioridade alta (1) abre canal primeiro quando há mais cenários que PING_MULTIPLEX_CHANNELS
+        valid.sort(key=lambda s: (s[5].get('priority') or 2) if len(s) > 5 else 2)
+        if len(valid) != len(scenarios):
+            logger.error(f"Skipping {len(scenarios) - len(valid)} invalid scenarios")
+
+        try:
+            logger.info(f"Starting multiplexed task for {len(valid)} scenarios")
+            results = self._batch_executor().run(valid)
+        except Exception as e:
+            logger.error(f"Multiplexed task failed: {str(e)}", exc_info=True)
+            results = [self._create_error_result(e, s) for s in valid]
+
+        self._save_result(results)
+        return results
+
+    @contextmanager
+    def _recording_failure(self, scenarios, scheduled_for=None):
+        """
+        Write an error result per scenario when the task body dies, timeouts
+        included (django-q raises them as SystemExit inside the task), so the
+        failure is recorded whatever the broker keeps of the Task. Error rows
+        start at the scheduled run time: a retry of the same task upserts the
+        same rows instead of adding new ones.
+        """
+        try:
+            yield
+        except BaseException as e:
+            logger.error(f"Task died for {len(scenarios)} scenarios: {str(e)}")
+            start = parse_datetime(scheduled_for) if scheduled_for else None
+            results = []
+            for scenario in scenarios:
+                if not self._validate_scenario(scenario):
+                    continue
+                result = self._create_error_result(e, scenario)
+                if start:
+                    result['start_time'] = start
+                results.append(result)
+            try:
+                writer = get_result_writer()
+                writer.add_many(results)
+                # Grava já: o worker pode ser reciclado logo depois do timeout
+                writer.flush()
+            except Exception as save_error:
+                logger.error(f"Could not record task failure: {str(save_error)}", exc_info=True)
+            raise
+
+    def _compact(self, results):
+        """Task return value: counts and failed test names only (the full results are in NetworkTestResult)"""
+        results = [r for r in (results if isinstance(results, list) else [results]) if r]
+        failed = [r.get('test_name') for r in results if r.get('success') != NetworkTestResult.escolhas_success.SEM_FALHA]
+        return {'results': len(results), 'ok': len(results) - len(failed), 'failed': failed}
 
     def _validate_scenario(self, scenario):
-        """Validate scenario format before execution"""
-        return isinstance(scenario, (list, tuple)) and len(scenario) == 5
+        """Validate scenario format before execution: 5 fields plus an optional options dict"""
+        if not isinstance(scenario, (list, tuple)):
+            return False
+        return len(scenario) == 5 or (len(scenario) == 6 and isinstance(scenario[5], dict))
 
     def _execute_test(self, scenario):
         """Execute the actual network test"""
-        telnet_host, telnet_port, ping_dest, sw_name, test_name = scenario
+        telnet_host, telnet_port, ping_dest, sw_name, test_name = scenario[:5]
+        options = scenario[5] if len(scenario) > 5 else None
         
         try:
             logger.debug(f"Testing {sw_name} ({telnet_host}:{telnet_port})")
@@ -155,7 +461,8 @@ class NetworkTestScheduler:
                 telnet_port=telnet_port,
                 ping_destination=ping_dest,
                 sw_name=sw_name,
-                repeat=1  
+                repeat=1,
+                options=options,
             )
             
             if isinstance(results, list) and len(results) > 0:
@@ -178,7 +485,7 @@ class NetworkTestScheduler:
             'telnet_host': scenario[0] if len(scenario) > 0 else 'unknown',
             'telnet_port': scenario[1] if len(scenario) > 1 else 0,
             'ping_destination': scenario[2] if len(scenario) > 2 else 'unknown',
-            'test_name': scenario[2] if len(scenario) > 2 else 'unknown',
+            'test_name': scenario[4] if len(scenario) > 4 else 'unknown',
             'sw_name': scenario[3] if len(scenario) > 3 else 'unknown',
             'start_time': timezone.localtime(),
             'end_time': timezone.localtime(),
@@ -187,64 +494,32 @@ class NetworkTestScheduler:
             'statistics': ''
         }
 
-    def _schedule_next(self, scenario):
-        """Schedule next execution using static reference"""
-        schedule(
-            'pingtest.utils.test_runner.NetworkTestScheduler.create_task',
-            scenario,
-            name=f"{self.schedule_name}_{scenario[3]}_{scenario[2]}",
-            schedule_type='C',
-            cron='*/7 * * * *', # repeats every 7 minutes
-            repeats=-1,
-        )
+    def start_scheduler(self):
+        """Schedule every active scenario now and keep the hourly safety-net reconcile"""
+        self._reconcile_schedules_impl()
+        self.schedule_reconcile()
 
-    def _process_scenario(self, scenario):
-        """Actual task processing"""
-        try:
-            logger.info(f"Processing scenario: {scenario}")
-            result = self._execute_test(scenario)
-            self._save_result(result)
-            
-            # Schedule next run after successful execution
-            self._schedule_next(scenario)  
-            
-            return result
-        except Exception as e:
-            logger.error(f"Task failed: {str(e)}", exc_info=True)
-            return self._create_error_result(e, scenario)
-
-
-    def start_scheduler(self, scenarios):
-        """Initialize tasks using static reference"""
-        
-        self._cleanup_existing_schedules()
-        
-        for scenario in scenarios:
-            if self._validate_scenario(scenario):
-                self._schedule_next(scenario)  
-                logger.info(f"Scheduled {scenario[3]}")
-
-
-    def _handle_task_result(self, task):
-        """Handle both success and failure states"""
-        if task.success:
-            logger.info(f"Task completed for {task.result.get('sw_name', 'unknown')}")
-            self._save_result(task.result)
-        else:
-            logger.error(f"Task failed: {task.result}")
-            error_result = self._create_error_result(
-                Exception(task.result),
-                task.args[0] if task.args else []
-            )
-            self._save_result(error_result)
 
     def _cleanup_existing_schedules(self):
         """Remove existing schedules to prevent duplicates"""
         Schedule.objects.filter(name__startswith=self.schedule_name).delete()
+        Schedule.objects.filter(name='scenario_reconcile').delete()
         
     
 
 class CacheManager:
+    """
+    Precomputed dashboard payloads in the shared cache.
+
+    Keys are dropped by the results_saved receiver when new results land;
+    a fresh copy is rebuilt by the first request under a short lock while
+    concurrent requests keep serving the last (stale) copy.
+    """
+    PREFIX = 'dashboard'
+    TTL = 360
+    STALE_TTL = 24 * 3600
+    LOCK_TTL = 30
+
     def schedule_cache_refresh():
         schedule(
             'pingtest.utils.test_runner.CacheManager.refresh_cache',
@@ -255,48 +530,166 @@ class CacheManager:
         )
         
     def refresh_cache():
-        """Force update all results and cache"""
+        """Force rebuild of the index and falha payloads"""
         try:
-            results = NetworkTestResult.objects.order_by('-test_end')[:50]  # Descending
-            cache.set('cached_results', results, 360) 
-            logger.info(f"Cache updated with {len(results)} records")
+            with metrics.timed_task('cache_refresh'):
+                for view in ('index', 'falha'):
+                    CacheManager._rebuild(CacheManager._key(view), CacheManager._builders()[view])
+            logger.info("Dashboard cache refreshed")
         except Exception as e:
             logger.error(f"Cache refresh failed: {str(e)}")
-            cache.set('cached_results', [], 360) 
-        
+
+    def get_cards(view):
+        """Card payload for 'index' or 'falha'"""
+        return CacheManager._get_or_build(CacheManager._key(view), CacheManager._builders()[view])
+
+    def get_individual(test_name):
+        """First history page for teste_individual (later pages are read by cursor, uncached)"""
+        return CacheManager._get_or_build(
+            CacheManager._key('individual', test_name),
+            lambda: dict(zip(('testes', 'next_cursor'), history_page(test_name))),
+        )
+
+    def invalidate(test_names=()):
+        keys = [CacheManager._key('index'), CacheManager._key('falha')]
+        keys += [CacheManager._key('individual', name) for name in test_names]
+        cache.delete_many(keys)
+
+    def stats():
+        names = ('hits', 'stale_hits', 'misses', 'rebuilds', 'rebuild_ms')
+        values = cache.get_many([f"{CacheManager.PREFIX}:stats:{n}" for n in names])
+        stats = {n: values.get(f"{CacheManager.PREFIX}:stats:{n}", 0) for n in names}
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 3) if lookups else 0.0
+        stats['avg_rebuild_ms'] = round(stats['rebuild_ms'] / stats['rebuilds'], 1) if stats['rebuilds'] else 0.0
+        return stats
+
+    def _builders():
+        return {
+            'index': build_cards,
+            'falha': lambda: build_cards(alerting_only=True),
+        }
+
+    def _key(*parts):
+        # Hash free-form test names so they are always valid cache keys
+        return ':'.join([CacheManager.PREFIX] + [
+            hashlib.md5(str(p).encode()).hexdigest() if i else str(p) for i, p in enumerate(parts)
+        ])
+
+    def _get_or_build(key, builder):
+        payload = cache.get(key)
+        if payload is not None:
+            CacheManager._count('hits')
+            return payload
+
+        # Only one request rebuilds; the rest serve the previous copy meanwhile
+        if cache.add(f"{key}:lock", 1, CacheManager.LOCK_TTL):
+            try:
+                CacheManager._count('misses')
+                return CacheManager._rebuild(key, builder)
+            finally:
+                cache.delete(f"{key}:lock")
+
+        stale = cache.get(f"{key}:stale")
+        if stale is not None:
+            CacheManager._count('stale_hits')
+            return stale
+
+        CacheManager._count('misses')
+        return builder()
+
+    def _rebuild(key, builder):
+        started = time.monotonic()
+        payload = builder()
+        cache.set(key, payload, CacheManager.TTL)
+        cache.set(f"{key}:stale", payload, CacheManager.STALE_TTL)
+        CacheManager._count('rebuilds')
+        CacheManager._count('rebuild_ms', int((time.monotonic() - started) * 1000))
+        return payload
+
+    def _count(name, amount=1):
+        key = f"{CacheManager.PREFIX}:stats:{name}"
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            cache.set(key, amount, None)
+
     def _cleanup_existing_cache():
         """Remove existing schedules to prevent duplicates"""
         Schedule.objects.filter(name__startswith='cache_refresh_').delete()
     
     
+class RollupManager:
+    def rollup_results():
+        """Aggregate recent raw results into the 1m/1h/1d rollup tiers"""
+        try:
+            with metrics.timed_task('rollup'):
+                built = run_rollups()
+            return f"Rolled up {sum(built.values())} buckets"
+        except Exception as e:
+            logger.error(f"Rollup failed: {str(e)}", exc_info=True)
+            raise
+
+    def schedule_rollups():
+        """Schedule rollups every 15 minutes (well inside ROLLUP_LOOKBACK_HOURS)"""
+        schedule(
+            'pingtest.utils.test_runner.RollupManager.rollup_results',
+            schedule_type='C',
+            cron='*/15 * * * *',
+            name='db_rollup',
+            repeats=-1,
+        )
+
+
+class AlertManager:
+    def send_alert_digest():
+        """Email the pending alert transitions as one digest once they settle (see alerts.send_digest)"""
+        try:
+            with metrics.timed_task('alerts'):
+                sent = send_digest()
+            return f"Sent {sent} alert transitions" if sent else "No alert digest due"
+        except Exception as e:
+            logger.error(f"Alert digest failed: {str(e)}", exc_info=True)
+            raise
+
+    def schedule_alerts():
+        """Check every minute; the debounce decides when a digest actually goes out"""
+        schedule(
+            'pingtest.utils.test_runner.AlertManager.send_alert_digest',
+            schedule_type='C',
+            cron='* * * * *',
+            name='alert_digest',
+            repeats=-1,
+        )
+
+
 class CleanupManager:
     def cleanup_old_results():
         """Cleanup results older than retention period"""
         try:
-            # Tempo de corte das tabelas
-            cutoff = timezone.now() - timezone.timedelta(hours=18)
+            # Garante que as janelas mais recentes estão agregadas antes de apagar os brutos
+            RollupManager.rollup_results()
 
-            with transaction.atomic():
-                while True:
-                    batch = list(NetworkTestResult.objects.filter(test_start__lt=cutoff)[:1000])
-                    if not batch:
-                        break
-                    NetworkTestResult.objects.filter(id__in=[record.id for record in batch]).delete()
-                    logger.info(f"Deleted a batch of {len(batch)} old records.")
-
-            logger.info("Cleanup completed successfully.")
-            return "Cleaned up old records"
+            # Lotes curtos e independentes (ou DROP PARTITION com CLEANUP_MODE='partition')
+            with metrics.timed_task('cleanup'):
+                stats = cleanup_results()
+            logger.info(f"Cleanup completed successfully: {stats}")
+            return (
+                f"Cleaned up {stats['deleted']} old records ({stats['rows_per_second']} rows/s) "
+                f"and {stats['tasks_deleted']} task records"
+            )
 
         except Exception as e:
             logger.error(f"Cleanup failed: {str(e)}", exc_info=True)
             raise
     
     def schedule_cleanup():
-        """Schedule cleanup every 12 hours"""
+        """Schedule cleanup every hour (small runs, each capped by CLEANUP_MAX_SECONDS)"""
         schedule(
             'pingtest.utils.test_runner.CleanupManager.cleanup_old_results',
             schedule_type='C',
-            cron='0 */6 * * *',  
+            cron='5 * * * *',  
             name='db_cleanup',
             repeats=-1,
         )
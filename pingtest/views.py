@@ -1,103 +1,101 @@
 from django.shortcuts import redirect, render
-from pingtest.models import NetworkTestResult, NetworkTestScenario
+from pingtest.models import NetworkTestScenario
 from .forms import NetworkTestScenarioForm 
+from .utils.test_runner import CacheManager
 from django.contrib.auth.decorators import login_required   
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.utils.text import slugify
+from .utils import metrics
+from .utils.history import history_page, iter_history, stream_csv, stream_json
+from .utils.live_updates import event_stream
 
 @login_required
+@metrics.timed_view
 def index(request):
-    # Get all unique test names
-    test_names = NetworkTestResult.objects.values_list('test_name', flat=True).distinct()
-
-    cards = []
-    for name in test_names:
-        latest = NetworkTestResult.objects.filter(test_name=name).order_by('-test_end').first()
-        latest_failure = NetworkTestResult.objects.filter(test_name=name).exclude(success="SF").order_by('-test_end').first()
-        cards.append({
-            'test_name': name,
-            'latest': latest,
-            'latest_failure': latest_failure,
-        })
-        
-    cards.sort(key=lambda c: c['test_name'])
-
+    cards = CacheManager.get_cards('index')
     return render(request, 'index.html', {'cards': cards})
 
 @login_required
+@metrics.timed_view
 def refresh_results(request):
-    # Get all unique test names
-    test_names = NetworkTestResult.objects.values_list('test_name', flat=True).distinct()
-
-    cards = []
-    for name in test_names:
-        latest = NetworkTestResult.objects.filter(test_name=name).order_by('-test_end').first()
-        latest_failure = NetworkTestResult.objects.filter(test_name=name).exclude(success="SF").order_by('-test_end').first()
-        cards.append({
-            'test_name': name,
-            'latest': latest,
-            'latest_failure': latest_failure,
-        })
-    
-    cards.sort(key=lambda c: c['test_name'])
-
+    cards = CacheManager.get_cards('index')
     return render(request, 'partials/partial_index.html', {'cards': cards})
 
 @login_required
+@metrics.timed_view
 def falha(request): 
-    # Get all unique test names
-    test_names = NetworkTestResult.objects.values_list('test_name', flat=True).distinct()
-
-    cards = []
-    for name in test_names:
-        latest = NetworkTestResult.objects.filter(test_name=name).order_by('-test_end').first()
-        # Get the last 4 results for this test
-        recent_tests = NetworkTestResult.objects.filter(test_name=name).order_by('-test_end')[:4]
-        # Check if any of the last 4 results is not "SF"
-        has_failure = any(t.success != "SF" for t in recent_tests)
-        latest_failure = NetworkTestResult.objects.filter(test_name=name).exclude(success="SF").order_by('-test_end').first()
-        cards.append({
-            'test_name': name,
-            'latest': latest,
-            'latest_failure': latest_failure,
-            'has_failure': has_failure,
-        })
-    
-    cards.sort(key=lambda c: c['test_name'])
-
+    # Só cards com estado de alerta diferente de OK (degradado, fora ou recuperando)
+    cards = CacheManager.get_cards('falha')
     return render(request, 'falha.html', {'cards': cards})   
 
 @login_required
+@metrics.timed_view
 def partial_falha(request): 
-    # Get all unique test names
-    test_names = NetworkTestResult.objects.values_list('test_name', flat=True).distinct()
-
-    cards = []
-    for name in test_names:
-        latest = NetworkTestResult.objects.filter(test_name=name).order_by('-test_end').first()
-        # Get the last 4 results for this test
-        recent_tests = NetworkTestResult.objects.filter(test_name=name).order_by('-test_end')[:4]
-        # Check if any of the last 4 results is not "SF"
-        has_failure = any(t.success != "SF" for t in recent_tests)
-        latest_failure = NetworkTestResult.objects.filter(test_name=name).exclude(success="SF").order_by('-test_end').first()
-        cards.append({
-            'test_name': name,
-            'latest': latest,
-            'latest_failure': latest_failure,
-            'has_failure': has_failure,
-        })
-        
-    cards.sort(key=lambda c: c['test_name'])
-
+    cards = CacheManager.get_cards('falha')
     return render(request, 'partials/partial_falha.html', {'cards': cards})
 
 @login_required
+@metrics.timed_view
 def teste_individual(request, test_name):
-    testes = NetworkTestResult.objects.filter(test_name=test_name).order_by('-test_end')
-    return render(request, 'teste_individual.html', {'testes': testes, 'test_name': test_name })
+    page = CacheManager.get_individual(test_name)
+    return render(request, 'teste_individual.html', {**page, 'test_name': test_name })
 
 @login_required
+@metrics.timed_view
 def partial_individual(request, test_name):
-    testes = NetworkTestResult.objects.filter(test_name=test_name).order_by('-test_end')
-    return render(request, 'partials/partial_individual.html', {'testes': testes,})
+    cursor = request.GET.get('cursor')
+    if not cursor:
+        page = CacheManager.get_individual(test_name)
+        return render(request, 'partials/partial_individual.html', {**page, 'test_name': test_name})
+    # Próximas páginas do scroll infinito: só os cards novos + o próximo gatilho
+    testes, next_cursor = history_page(test_name, cursor)
+    return render(request, 'partials/individual_page.html', {'testes': testes, 'next_cursor': next_cursor, 'test_name': test_name})
+
+@login_required
+def exportar_individual(request, test_name):
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in ('csv', 'json'):
+        raise Http404
+    rows = iter_history(test_name)
+    if fmt == 'json':
+        response = StreamingHttpResponse(stream_json(rows), content_type='application/json')
+    else:
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{slugify(test_name) or "historico"}.{fmt}"'
+    return response
+
+@login_required
+def live_updates(request, view):
+    if view not in ('index', 'falha'):
+        raise Http404
+    if not isinstance(request, ASGIRequest):
+        # Sob WSGI o stream prenderia um worker; 204 faz o navegador voltar ao polling do htmx
+        return HttpResponse(status=204)
+
+    last_id = request.headers.get('Last-Event-ID', '')
+    last_seq = int(last_id) if last_id.isdigit() else None
+    response = StreamingHttpResponse(event_stream(view, last_seq), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse(CacheManager.stats())
+
+def prometheus_metrics(request):
+    token = settings.METRICS_TOKEN
+    bearer = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (token and constant_time_compare(bearer, token)) and not request.user.is_staff:
+        return HttpResponse(status=403)
+    return HttpResponse(
+        metrics.render(metrics.collect_gauges()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
 
 @login_required
 def cadastrar_teste(request): 